@@ -0,0 +1,108 @@
+#
+# This file is protected by Copyright. Please refer to the COPYRIGHT file
+# distributed with this source distribution.
+#
+# This file is part of REDHAWK throughput.
+#
+# REDHAWK throughput is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# REDHAWK throughput is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+import os
+import json
+import time
+import struct
+
+import numpy
+
+from benchmark.tests import TestMonitor
+
+__all__ = ('ColumnarOutput', 'load')
+
+# Columnar files start with a magic string and the length of a JSON header
+# describing the fields and run metadata, followed by fixed-size binary
+# records appended in batches
+_MAGIC = 'RHCOL1\n'
+_LENGTH = struct.Struct('<I')
+
+def _record_type(fields):
+    return numpy.dtype([(str(key), dtype) for key, title, dtype in fields])
+
+class ColumnarOutput(TestMonitor):
+    """
+    Writes samples to an append-only binary file, one per test, with a
+    column for each field. Samples are stored in a pre-allocated batch and
+    written once the batch is full, so that adding a sample does no I/O or
+    string formatting.
+    """
+    def __init__(self, batch_size=1024, **metadata):
+        self.fields = []
+        self.batch_size = batch_size
+        self.metadata = metadata
+        self.file = None
+
+    def add_field(self, key, header=None, dtype='<f8'):
+        if header is None:
+            header = key
+        self.fields.append((key, header, dtype))
+
+    def test_started(self, name, **kw):
+        self.record_type = _record_type(self.fields)
+        self.batch = numpy.zeros(self.batch_size, dtype=self.record_type)
+        self.count = 0
+
+        header = json.dumps({'name': name,
+                             'started': time.time(),
+                             'fields': self.fields,
+                             'metadata': self.metadata})
+        filename = '%s-%d.col' % (name.lower(), os.getpid())
+        self.file = open(filename, 'wb')
+        self.file.write(_MAGIC)
+        self.file.write(_LENGTH.pack(len(header)))
+        self.file.write(header)
+
+    def sample_added(self, **stats):
+        record = self.batch[self.count]
+        for key, title, dtype in self.fields:
+            record[key] = stats[key]
+        self.count += 1
+        if self.count == self.batch_size:
+            self.flush()
+
+    def test_complete(self, **kw):
+        self.flush()
+        self.file.close()
+        self.file = None
+
+    def flush(self):
+        self.batch[:self.count].tofile(self.file)
+        self.file.flush()
+        self.count = 0
+
+
+def load(filename):
+    """
+    Reads a file written by ColumnarOutput, returning its header (test name,
+    start time, fields and metadata) and a dictionary of column arrays.
+    """
+    with open(filename, 'rb') as f:
+        if f.read(len(_MAGIC)) != _MAGIC:
+            raise ValueError("'%s' is not a columnar output file" % filename)
+        length, = _LENGTH.unpack(f.read(_LENGTH.size))
+        header = json.loads(f.read(length))
+        record_type = _record_type(header['fields'])
+        # Ignore a partial record left by a run that was interrupted
+        data = f.read()
+        count = len(data) // record_type.itemsize
+        records = numpy.frombuffer(data, dtype=record_type, count=count)
+    columns = dict((str(key), records[key]) for key, title, dtype in header['fields'])
+    return header, columns
@@ -92,3 +92,46 @@ class NumaPolicy(object):
 
     def next(self):
         return NumaWrapper(self.nodes, self.distance)
+
+class NumaPlacement(object):
+    """
+    Places the writer and reader on specific NUMA nodes, optionally binding
+    (or preferring) each process' memory allocation to a given node. By
+    default, memory is placed on the same node as the process' CPUs; with
+    memory_nodes, a dict of node by role, it can be placed elsewhere (e.g., the
+    writer's memory on the reader's node). The streams identify which process
+    is being launched with the 'role' keyword argument.
+    """
+    MEMORY_POLICIES = ('local', 'membind', 'preferred')
+
+    def __init__(self, writer_node, reader_node, memory='local', memory_nodes=None):
+        if memory not in self.MEMORY_POLICIES:
+            raise ValueError("invalid memory policy '%s'" % memory)
+        self.nodes = {'writer': writer_node, 'reader': reader_node}
+        self.memory = memory
+        self.memory_nodes = dict(self.nodes)
+        if memory_nodes:
+            self.memory_nodes.update(memory_nodes)
+        if memory == 'local' and self.memory_nodes != self.nodes:
+            raise ValueError('local memory policy cannot place memory on another node')
+
+    def __call__(self, command, *args, **kwargs):
+        role = kwargs['role']
+        if isinstance(command, basestring):
+            command = [command]
+        numactl = ['numactl', '--cpunodebind=%d' % self.nodes[role]]
+        if self.memory != 'local':
+            numactl.append('--%s=%d' % (self.memory, self.memory_nodes[role]))
+        return numactl + command
+
+    def label(self):
+        def describe(role):
+            text = '%s %d' % (role, self.nodes[role])
+            if self.memory != 'local':
+                text += ' (memory %d)' % self.memory_nodes[role]
+            return text
+        return '%s, %s' % (describe('writer'), describe('reader'))
+
+    def distance(self):
+        return get_distance(self.nodes['writer'], self.nodes['reader'])
+
@@ -17,18 +17,44 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with this program.  If not, see http://www.gnu.org/licenses/.
 #
+import os
 import itertools
 
-__all__ = ('CpuInfo', 'ProcessInfo')
+__all__ = ('CpuInfo', 'ProcessInfo', 'ProcessSampler', 'ThreadSampler', 'combine')
+
+class StatFile(object):
+    """
+    Keeps a /proc file open so that each read only costs a seek and a read,
+    rather than an open, read and close.
+    """
+    def __init__(self, filename, size=4096):
+        self.fd = os.open(filename, os.O_RDONLY)
+        self.size = size
+
+    def read(self):
+        os.lseek(self.fd, 0, os.SEEK_SET)
+        return os.read(self.fd, self.size)
+
+    def readline(self):
+        data = self.read()
+        return data[:data.find('\n')]
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def __del__(self):
+        self.close()
+
 
 class ProcFile(object):
     def __init__(self, filename):
-        self.__filename = filename
+        self.__file = StatFile(filename)
         self.__last = self.scan()
 
     def scan(self):
-        with open(self.__filename) as f:
-            fields = f.readline().strip().split()
+        fields = self.__file.readline().strip().split()
         result = {}
         for (name, format), value in itertools.izip(self.FIELDS, fields):
             result[name] = format(value)
@@ -141,3 +167,171 @@ class ProcessInfo(ProcFile):
         }
 
         return results
+
+
+class ProcessSampler(object):
+    """
+    Polls /proc/<pid>/stat for any number of processes in a single pass,
+    parsing only the fields used for reporting. Results are in the same form
+    as ProcessInfo.poll(), one per PID.
+    """
+    # Offsets of the fields of interest, counting from the state field that
+    # follows the command name
+    FIELDS = [
+        ('minflt', 7),
+        ('majflt', 9),
+        ('utime', 11),
+        ('stime', 12),
+        ('num_threads', 17),
+        ('rss', 21)
+    ]
+
+    def __init__(self, pids):
+        self.__files = [StatFile('/proc/%d/stat' % pid) for pid in pids]
+        self.__last = self.scan()
+
+    def scan(self):
+        results = []
+        for stat in self.__files:
+            line = stat.read()
+            # The command name may contain spaces or parentheses; the rest of
+            # the fields start after the last closing parenthesis
+            fields = line[line.rfind(')')+2:].split(' ', 22)
+            results.append([int(fields[index]) for name, index in self.FIELDS])
+        return results
+
+    def poll(self):
+        current = self.scan()
+        last = self.__last
+        self.__last = current
+        return [self.format(*values) for values in itertools.izip(current, last)]
+
+    def format(self, current, last):
+        minflt, majflt, utime, stime, threads, rss = current
+        d_utime = utime - last[2]
+        d_stime = stime - last[3]
+        return {
+            'utime': d_utime,
+            'stime': d_stime,
+            'cpu': d_utime+d_stime,
+            'rss': rss,
+            'majflt': majflt - last[1],
+            'minflt': minflt - last[0],
+            'threads': threads
+        }
+
+    def close(self):
+        for stat in self.__files:
+            stat.close()
+
+
+class ThreadSampler(object):
+    """
+    Polls every thread of a process from /proc/<pid>/task/<tid>, returning
+    the CPU time, context switches and scheduler run-queue wait of each
+    thread over the last period. Threads may come and go between polls
+    (e.g., ORB connection threads); new threads are counted from their
+    start.
+
+    Run-queue wait comes from schedstat, which requires a kernel with
+    scheduler statistics; if it is not available, 'run' and 'wait' are None.
+    """
+    def __init__(self, pid):
+        self.path = '/proc/%d/task' % pid
+        self.__threads = {}
+        self.__last = self.scan()
+
+    def _open(self, tid):
+        path = os.path.join(self.path, str(tid))
+        files = [StatFile(os.path.join(path, 'stat')), StatFile(os.path.join(path, 'status'))]
+        try:
+            files.append(StatFile(os.path.join(path, 'schedstat')))
+        except OSError:
+            files.append(None)
+        return files
+
+    def _read(self, files):
+        stat, status, schedstat = files
+        line = stat.read()
+        name = line[line.find('(')+1:line.rfind(')')]
+        fields = line[line.rfind(')')+2:].split(' ', 13)
+        result = {
+            'name': name,
+            'utime': int(fields[11]),
+            'stime': int(fields[12]),
+            'voluntary': 0,
+            'involuntary': 0,
+            'run': None,
+            'wait': None
+        }
+        for line in status.read().split('\n'):
+            if line.startswith('voluntary_ctxt_switches:'):
+                result['voluntary'] = int(line.split()[1])
+            elif line.startswith('nonvoluntary_ctxt_switches:'):
+                result['involuntary'] = int(line.split()[1])
+        if schedstat:
+            # Time on the CPU and time waiting on a run queue, in nanoseconds
+            run, wait = schedstat.read().split()[:2]
+            result['run'] = int(run)
+            result['wait'] = int(wait)
+        return result
+
+    def scan(self):
+        try:
+            tids = [int(tid) for tid in os.listdir(self.path)]
+        except OSError:
+            tids = []
+
+        results = {}
+        for tid in tids:
+            files = self.__threads.get(tid)
+            try:
+                if files is None:
+                    files = self.__threads[tid] = self._open(tid)
+                results[tid] = self._read(files)
+            except (OSError, IOError):
+                # The thread exited while it was being read
+                pass
+
+        # Release the files of threads that have exited
+        for tid in self.__threads.keys():
+            if tid not in results:
+                for stat in self.__threads.pop(tid):
+                    if stat:
+                        stat.close()
+        return results
+
+    def poll(self):
+        current = self.scan()
+        last = self.__last
+        self.__last = current
+        return [self.format(tid, values, last.get(tid)) for tid, values in sorted(current.iteritems())]
+
+    def format(self, tid, current, last):
+        result = {'tid': tid, 'name': current['name']}
+        for key in ('utime', 'stime', 'voluntary', 'involuntary', 'run', 'wait'):
+            value = current[key]
+            if value is not None and last is not None:
+                value -= last[key]
+            result[key] = value
+        result['cpu'] = result['utime'] + result['stime']
+        return result
+
+    def close(self):
+        for files in self.__threads.itervalues():
+            for stat in files:
+                if stat:
+                    stat.close()
+        self.__threads = {}
+
+
+def combine(results):
+    """
+    Combines the results from multiple processes (e.g., every reader in an
+    AggregateStream) into a single set of totals.
+    """
+    totals = dict.fromkeys(results[0].iterkeys(), 0)
+    for result in results:
+        for key, value in result.iteritems():
+            totals[key] += value
+    return totals
@@ -0,0 +1,165 @@
+#
+# This file is protected by Copyright. Please refer to the COPYRIGHT file
+# distributed with this source distribution.
+#
+# This file is part of REDHAWK throughput.
+#
+# REDHAWK throughput is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# REDHAWK throughput is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+import os
+import json
+import time
+import sqlite3
+
+from benchmark import numa
+from benchmark.tests import TestMonitor
+
+__all__ = ('ResultsStore', 'ResultsDatabase', 'host_metadata')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started REAL,
+    label TEXT,
+    host TEXT,
+    kernel TEXT,
+    machine TEXT,
+    numa_nodes INTEGER,
+    numa_distance INTEGER,
+    transport TEXT,
+    options TEXT
+);
+CREATE TABLE IF NOT EXISTS passes (
+    id INTEGER PRIMARY KEY,
+    run INTEGER REFERENCES runs(id),
+    interface TEXT,
+    size INTEGER,
+    rate REAL,
+    rate_ci REAL,
+    rate_min REAL,
+    rate_max REAL,
+    settled INTEGER DEFAULT 1
+);
+CREATE TABLE IF NOT EXISTS samples (
+    pass INTEGER REFERENCES passes(id),
+    time REAL,
+    rate REAL,
+    write_cpu REAL,
+    read_cpu REAL
+);
+CREATE INDEX IF NOT EXISTS passes_by_run ON passes(run, interface, size);
+CREATE INDEX IF NOT EXISTS samples_by_pass ON samples(pass);
+"""
+
+def host_metadata():
+    system, host, kernel, version, machine = os.uname()
+    if numa.is_numa_supported():
+        numa_nodes = len(numa.get_nodes())
+    else:
+        numa_nodes = 1
+    return {'host': host,
+            'kernel': kernel,
+            'machine': machine,
+            'numa_nodes': numa_nodes}
+
+
+class ResultsDatabase(object):
+    def __init__(self, filename):
+        self.connection = sqlite3.connect(filename)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(_SCHEMA)
+        # Databases created before passes recorded whether the transfer size
+        # settled are upgraded in place
+        columns = [row['name'] for row in self.connection.execute('PRAGMA table_info(passes)')]
+        if 'settled' not in columns:
+            with self.connection:
+                self.connection.execute('ALTER TABLE passes ADD COLUMN settled INTEGER DEFAULT 1')
+
+    def close(self):
+        self.connection.close()
+
+    def runs(self):
+        return self.connection.execute('SELECT * FROM runs ORDER BY id').fetchall()
+
+    def find_run(self, key=None):
+        """
+        Finds a run by id or by label (the most recent run with that label).
+        If no key is given, returns the most recent run.
+        """
+        if key is None:
+            query = 'SELECT * FROM runs ORDER BY id DESC LIMIT 1'
+            args = ()
+        elif key.isdigit():
+            query = 'SELECT * FROM runs WHERE id=?'
+            args = (int(key),)
+        else:
+            query = 'SELECT * FROM runs WHERE label=? ORDER BY id DESC LIMIT 1'
+            args = (key,)
+        return self.connection.execute(query, args).fetchone()
+
+    def passes(self, run):
+        # If a size was measured more than once in a run, the last pass wins
+        rows = self.connection.execute('SELECT * FROM passes WHERE run=? ORDER BY id', (run,))
+        return dict(((row['interface'], row['size']), row) for row in rows)
+
+    def samples(self, pass_id):
+        return self.connection.execute('SELECT * FROM samples WHERE pass=? ORDER BY time', (pass_id,)).fetchall()
+
+
+class ResultsStore(TestMonitor):
+    """
+    Records every pass of a test, along with the samples that make it up, in a
+    SQLite database. All of the tests run by one process belong to a single
+    run, which carries host and configuration metadata.
+    """
+    def __init__(self, filename, label=None, transport=None, numa_distance=None, **options):
+        self.database = ResultsDatabase(filename)
+        self.label = label
+        self.transport = transport
+        self.numa_distance = numa_distance
+        self.options = options
+        self.run = None
+
+    def test_started(self, name, **kw):
+        if self.run is None:
+            self.run = self._create_run()
+        self.interface = name
+
+    def pass_started(self, **kw):
+        self.samples = []
+
+    def sample_added(self, **stats):
+        self.samples.append((stats['time'], stats['rate'], stats['write_cpu'], stats['read_cpu']))
+
+    def pass_complete(self, size, rate, rate_ci, rate_min, rate_max, settled=True, **kw):
+        connection = self.database.connection
+        with connection:
+            cursor = connection.execute('INSERT INTO passes (run, interface, size, rate, rate_ci, rate_min, rate_max, '
+                                        'settled) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                                        (self.run, self.interface, size, rate, rate_ci, rate_min, rate_max,
+                                         int(settled)))
+            pass_id = cursor.lastrowid
+            connection.executemany('INSERT INTO samples (pass, time, rate, write_cpu, read_cpu) VALUES (?, ?, ?, ?, ?)',
+                                   ((pass_id,) + sample for sample in self.samples))
+
+    def _create_run(self):
+        metadata = host_metadata()
+        connection = self.database.connection
+        with connection:
+            cursor = connection.execute('INSERT INTO runs (started, label, host, kernel, machine, numa_nodes, '
+                                        'numa_distance, transport, options) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                        (time.time(), self.label, metadata['host'], metadata['kernel'],
+                                         metadata['machine'], metadata['numa_nodes'], self.numa_distance,
+                                         self.transport, json.dumps(self.options, sort_keys=True)))
+        return cursor.lastrowid
@@ -0,0 +1,83 @@
+#
+# This file is protected by Copyright. Please refer to the COPYRIGHT file
+# distributed with this source distribution.
+#
+# This file is part of REDHAWK throughput.
+#
+# REDHAWK throughput is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# REDHAWK throughput is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+import time
+
+import numpy
+
+__all__ = ('RateSampler',)
+
+class RateSampler(object):
+    """
+    Polls a cumulative byte count on an absolute schedule, every poll_time
+    seconds, and computes the rate over each period. The count may be a
+    single total or an array of per-stream totals, in which case the rates
+    are per-stream as well. If given, idle is called before waiting for each
+    poll, to allow the UI to update.
+    """
+    def __init__(self, received, poll_time, idle=None):
+        self.received = received
+        self.poll_time = poll_time
+        self.idle = idle
+        self.start = time.time()
+        self.restart()
+
+    def restart(self):
+        # Measure subsequent samples from the current time and count
+        now = time.time()
+        self.last_time = now
+        self.next = now + self.poll_time
+        self.last_total = self.received()
+
+    def sample(self):
+        """
+        Waits until the next poll time and returns the time, the time elapsed
+        since the previous sample and the rate over that period.
+        """
+        if self.idle:
+            self.idle()
+
+        sleep_time = self.next - time.time()
+        if sleep_time > 0.0:
+            time.sleep(sleep_time)
+
+        now = time.time()
+        elapsed = now - self.last_time
+        self.last_time = now
+        # Keep to an absolute schedule, skipping any missed polls
+        self.next += self.poll_time
+        if self.next < now:
+            self.next = now + self.poll_time
+
+        current_total = self.received()
+        rate = (current_total - self.last_total) / elapsed
+        self.last_total = current_total
+        return now, elapsed, rate
+
+    def measure(self, window, tolerance, callback=None):
+        """
+        Samples until window is stable to within tolerance, adding the total
+        rate of each sample to it. The callback, if given, is called with the
+        time, elapsed time and rate of each sample after it has been added.
+        """
+        while not window.is_stable(tolerance):
+            now, elapsed, rate = self.sample()
+            window.add_sample(numpy.sum(rate))
+            if callback:
+                callback(now, elapsed, rate)
@@ -0,0 +1,202 @@
+#
+# This file is protected by Copyright. Please refer to the COPYRIGHT file
+# distributed with this source distribution.
+#
+# This file is part of REDHAWK throughput.
+#
+# REDHAWK throughput is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# REDHAWK throughput is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+import math
+
+__all__ = ('Averager', 't_critical', 'welch_t', 'is_significant')
+
+# Two-sided 95% critical values of Student's t-distribution, indexed by
+# degrees of freedom
+_T_95 = (None, 12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262,
+         2.228, 2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093,
+         2.086, 2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045,
+         2.042)
+_T_95_LARGE = ((40, 2.021), (60, 2.000), (120, 1.980))
+_Z_95 = 1.960
+
+def t_critical(dof):
+    if dof < len(_T_95):
+        return _T_95[dof]
+    for limit, value in _T_95_LARGE:
+        if dof <= limit:
+            return value
+    return _Z_95
+
+def welch_t(a, b):
+    """
+    Welch's t-test for the difference in means of two independent samples
+    with possibly unequal variances. Returns the t statistic of mean(b) -
+    mean(a) and the effective degrees of freedom.
+    """
+    na = len(a)
+    nb = len(b)
+    mean_a = sum(a) / float(na)
+    mean_b = sum(b) / float(nb)
+    var_a = sum((x - mean_a)**2 for x in a) / (na - 1)
+    var_b = sum((x - mean_b)**2 for x in b) / (nb - 1)
+    se_a = var_a / na
+    se_b = var_b / nb
+    se = se_a + se_b
+    if se == 0.0:
+        if mean_a == mean_b:
+            return 0.0, na + nb - 2
+        return math.copysign(float('inf'), mean_b - mean_a), na + nb - 2
+    dof = se**2 / (se_a**2 / (na - 1) + se_b**2 / (nb - 1))
+    return (mean_b - mean_a) / math.sqrt(se), dof
+
+def is_significant(a, b):
+    """
+    Returns True if the means of a and b differ at the 95% confidence level.
+    """
+    if len(a) < 2 or len(b) < 2:
+        return False
+    t, dof = welch_t(a, b)
+    return abs(t) > t_critical(max(int(dof), 1))
+
+
+class Averager(object):
+    """
+    Running statistics over the most recent samples of a measurement.
+
+    The mean and variance are updated incrementally (Welford's method) as
+    samples enter and leave a bounded ring. Once the minimum number of samples
+    has been collected, samples more than `outlier` standard deviations from
+    the mean are rejected. If a full window of consecutive samples is
+    rejected, the measurement has shifted to a new level; the statistics are
+    restarted from the rejected samples.
+    """
+    # Floor on the standard deviation used for outlier rejection, as a
+    # fraction of the mean, so that a run of identical samples does not
+    # reject every other value
+    MIN_DEVIATION = 0.001
+
+    def __init__(self, window_size, max_samples=None, outlier=3.0):
+        self.window_size = window_size
+        if max_samples is None:
+            max_samples = 10 * window_size
+        self.max_samples = max_samples
+        self.capacity = max(window_size, max_samples // 2)
+        self.outlier = outlier
+        self.reset()
+
+    def reset(self):
+        self.total = 0
+        self.rejected = 0
+        self.pending = []
+        self._clear()
+
+    def _clear(self):
+        self.values = [0.0] * self.capacity
+        self.head = 0
+        self.count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    def add_sample(self, value):
+        self.total += 1
+        if self.is_outlier(value):
+            self.rejected += 1
+            self.pending.append(value)
+            if len(self.pending) >= self.window_size:
+                # The level has shifted; discard the old level and start over
+                # from the samples at the new one
+                pending = self.pending
+                self.rejected -= len(pending)
+                self.pending = []
+                self._clear()
+                for value in pending:
+                    self._append(value)
+            return
+        self.pending = []
+        self._append(value)
+
+    def _append(self, value):
+        # Drop the oldest sample once the ring is full
+        if self.count == self.capacity:
+            self._remove(self.values[self.head])
+        self.values[self.head] = value
+        self.head = (self.head + 1) % self.capacity
+        self._add(value)
+
+    def _add(self, value):
+        self.count += 1
+        delta = value - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (value - self._mean)
+
+    def _remove(self, value):
+        self.count -= 1
+        if self.count == 0:
+            self._mean = 0.0
+            self._m2 = 0.0
+            return
+        delta = value - self._mean
+        self._mean -= delta / self.count
+        self._m2 = max(self._m2 - delta * (value - self._mean), 0.0)
+
+    def is_outlier(self, value):
+        if self.count < self.window_size:
+            return False
+        deviation = max(self.stddev(), self.MIN_DEVIATION * abs(self._mean))
+        return abs(value - self._mean) > self.outlier * deviation
+
+    def is_stable(self, tolerance):
+        """
+        Returns True when the 95% confidence interval of the mean is within
+        `tolerance` (a fraction of the mean), or when the maximum number of
+        samples has been taken.
+        """
+        if self.count < self.window_size:
+            return False
+        elif self.total >= self.max_samples:
+            return True
+        return self.confidence() <= tolerance * abs(self._mean)
+
+    def get_data(self):
+        if self.count < self.capacity:
+            return self.values[:self.count]
+        return self.values[self.head:] + self.values[:self.head]
+
+    def mean(self):
+        return self._mean
+
+    def variance(self):
+        if self.count < 2:
+            return 0.0
+        return self._m2 / (self.count - 1)
+
+    def stddev(self):
+        return math.sqrt(self.variance())
+
+    def confidence(self):
+        """
+        Returns the half-width of the 95% confidence interval of the mean.
+        """
+        if self.count < 2:
+            return float('inf')
+        return t_critical(self.count - 1) * self.stddev() / math.sqrt(self.count)
+
+    def minimum(self):
+        return min(self.get_data())
+
+    def maximum(self):
+        return max(self.get_data())
+
+    def length(self):
+        return self.count
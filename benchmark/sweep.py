@@ -0,0 +1,66 @@
+#
+# This file is protected by Copyright. Please refer to the COPYRIGHT file
+# distributed with this source distribution.
+#
+# This file is part of REDHAWK throughput.
+#
+# REDHAWK throughput is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# REDHAWK throughput is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+import itertools
+
+from benchmark import utils
+
+__all__ = ('parse_parameter', 'parse_value', 'grid', 'describe', 'powers_of_two')
+
+def parse_parameter(text):
+    """
+    Parses a sweep parameter of the form "name=value1,value2,...", returning
+    the name and the list of values as strings.
+    """
+    name, sep, values = text.partition('=')
+    if not sep or not name or not values:
+        raise ValueError("invalid parameter '%s' (expected name=value[,value...])" % text)
+    return name.strip(), [value.strip() for value in values.split(',')]
+
+def parse_value(value):
+    """
+    Expands binary suffixes on numeric values (e.g., "64M" becomes
+    "67108864"); anything else is returned as-is.
+    """
+    if value[:-1].isdigit() and value[-1].upper() in 'KMG':
+        return str(utils.from_binary(value))
+    return value
+
+def grid(parameters):
+    """
+    Returns every combination of the given parameters, a list of (name,
+    values) pairs, as a list of settings. Each setting is a list of (name,
+    value) pairs in the same order as the parameters; the last parameter
+    varies fastest.
+    """
+    names = [name for name, values in parameters]
+    return [zip(names, combination) for combination in itertools.product(*[values for name, values in parameters])]
+
+def describe(settings):
+    return ' '.join('%s=%s' % (name, value) for name, value in settings)
+
+def powers_of_two(maximum):
+    # Powers of two up to the maximum, always including the maximum itself
+    counts = []
+    count = 1
+    while count < maximum:
+        counts.append(count)
+        count *= 2
+    counts.append(maximum)
+    return counts
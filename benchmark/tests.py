@@ -17,6 +17,12 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with this program.  If not, see http://www.gnu.org/licenses/.
 #
+import sys
+import ctypes
+import ctypes.util
+import threading
+import Queue
+
 class TestMonitor(object):
     def test_started(self, **kw):
         pass
@@ -33,38 +39,137 @@ class TestMonitor(object):
     def pass_complete(self, **kw):
         pass
 
+    def pass_skipped(self, **kw):
+        pass
+
+
+# From <sched.h>
+SCHED_FIFO = 1
+
+class sched_param(ctypes.Structure):
+    _fields_ = [('sched_priority', ctypes.c_int)]
+
+def set_realtime_priority(priority):
+    """
+    Moves the calling thread into the SCHED_FIFO real-time class at the given
+    priority. Returns False if it is not permitted (typically, the process
+    lacks CAP_SYS_NICE or an RLIMIT_RTPRIO allowance).
+    """
+    libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    param = sched_param(priority)
+    # On Linux, a pid of 0 applies to the calling thread only
+    return libc.sched_setscheduler(0, SCHED_FIFO, ctypes.byref(param)) == 0
+
 
 class BenchmarkTest(object):
+    # How often the dispatching thread runs idle tasks while waiting for
+    # events from the sampling thread
+    DISPATCH_INTERVAL = 0.05
+
     def __init__(self):
         self.monitors = []
         self.__idle_tasks = []
+        self.__sampler = None
+        self.__events = None
+        self.__aborted = False
+        self.priority = None
 
     def add_monitor(self, monitor):
         self.monitors.append(monitor)
 
-    def test_started(self, **kw):
+    def set_priority(self, priority):
+        # Real-time priority for the sampling thread in execute(), or None to
+        # leave it in the normal scheduling class
+        self.priority = priority
+
+    def execute(self, *args, **kwargs):
+        """
+        Calls run() on a separate sampling thread. Monitor notifications are
+        queued and delivered on the calling thread, along with the idle tasks,
+        so that drawing and writing output do not delay or take time from the
+        sampling loop. Returns once run() has returned and every queued
+        notification has been delivered.
+        """
+        self.__events = Queue.Queue()
+        self.__aborted = False
+        error = []
+
+        def sample():
+            if self.priority is not None and not set_realtime_priority(self.priority):
+                print >>sys.stderr, 'WARNING: unable to set real-time priority %d' % self.priority
+            try:
+                self.run(*args, **kwargs)
+            except:
+                error.append(sys.exc_info())
+            finally:
+                self.__events.put(None)
+
+        self.__sampler = threading.Thread(target=sample, name='sampler')
+        self.__sampler.daemon = True
+        self.__sampler.start()
+        try:
+            while True:
+                self.__run_idle_tasks()
+                try:
+                    event = self.__events.get(timeout=self.DISPATCH_INTERVAL)
+                except Queue.Empty:
+                    continue
+                if event is None:
+                    break
+                self.__notify(*event)
+        except:
+            # Stop the sampling loop at its next idle_tasks() call, so that it
+            # is not left polling streams that the caller is about to tear down
+            self.__aborted = True
+            self.__sampler.join(1.0)
+            raise
+        self.__sampler.join()
+        self.__sampler = None
+
+        if error:
+            exc_type, exc_value, exc_tb = error[0]
+            raise exc_type, exc_value, exc_tb
+
+    def __notify(self, name, kw):
         for monitor in self.monitors:
-            monitor.test_started(**kw)
+            getattr(monitor, name)(**kw)
+
+    def __dispatch(self, name, kw):
+        if threading.current_thread() is self.__sampler:
+            self.__events.put((name, kw))
+        else:
+            self.__notify(name, kw)
+
+    def test_started(self, **kw):
+        self.__dispatch('test_started', kw)
 
     def test_complete(self, **kw):
-        for monitor in self.monitors:
-            monitor.test_complete(**kw)
+        self.__dispatch('test_complete', kw)
 
     def pass_started(self, **kw):
-        for monitor in self.monitors:
-            monitor.pass_started(**kw)
+        self.__dispatch('pass_started', kw)
 
     def pass_complete(self, **kw):
-        for monitor in self.monitors:
-            monitor.pass_complete(**kw)
+        self.__dispatch('pass_complete', kw)
+
+    def pass_skipped(self, **kw):
+        self.__dispatch('pass_skipped', kw)
 
     def sample_added(self, **kw):
-        for monitor in self.monitors:
-            monitor.sample_added(**kw)
+        self.__dispatch('sample_added', kw)
 
     def add_idle_task(self, task):
         self.__idle_tasks.append(task)
 
     def idle_tasks(self):
+        # When sampling from execute(), the idle tasks run on the dispatching
+        # thread instead
+        if threading.current_thread() is self.__sampler:
+            if self.__aborted:
+                raise KeyboardInterrupt()
+            return
+        self.__run_idle_tasks()
+
+    def __run_idle_tasks(self):
         for task in self.__idle_tasks:
             task()
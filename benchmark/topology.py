@@ -0,0 +1,135 @@
+#
+# This file is protected by Copyright. Please refer to the COPYRIGHT file
+# distributed with this source distribution.
+#
+# This file is part of REDHAWK throughput.
+#
+# REDHAWK throughput is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# REDHAWK throughput is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+import os
+
+from benchmark import numa
+
+__all__ = ('Cpu', 'get_topology', 'CLASSES', 'classify', 'find_pairs', 'CpuPlacement')
+
+SYSFS_CPU = '/sys/devices/system/cpu'
+
+def _read(path, default=None):
+    try:
+        with open(path) as f:
+            return f.readline().strip()
+    except IOError:
+        return default
+
+def _read_list(path):
+    line = _read(path)
+    if not line:
+        return []
+    return numa._parse_values(line, ',')
+
+class Cpu(object):
+    def __init__(self, id, package, die, core, siblings, l3):
+        self.id = id
+        self.package = package
+        self.die = die
+        self.core = core
+        # Logical CPUs sharing this CPU's physical core (including itself)
+        self.siblings = siblings
+        # Logical CPUs sharing this CPU's last-level cache (including itself)
+        self.l3 = l3
+
+    def __repr__(self):
+        return 'Cpu(%d, package=%d, die=%d, core=%d)' % (self.id, self.package, self.die, self.core)
+
+def _last_level_cache(path, cpu):
+    # Find the data or unified cache with the highest level; on most systems
+    # this is the L3
+    level = 0
+    shared = frozenset([cpu])
+    cache_path = os.path.join(path, 'cache')
+    if not os.path.isdir(cache_path):
+        return shared
+    for index in sorted(os.listdir(cache_path)):
+        if not index.startswith('index'):
+            continue
+        index_path = os.path.join(cache_path, index)
+        if _read(os.path.join(index_path, 'type')) == 'Instruction':
+            continue
+        index_level = int(_read(os.path.join(index_path, 'level'), 0))
+        if index_level > level:
+            level = index_level
+            shared = frozenset(_read_list(os.path.join(index_path, 'shared_cpu_list')))
+    return shared
+
+def get_topology(root=SYSFS_CPU):
+    cpus = []
+    for cpu in _read_list(os.path.join(root, 'online')):
+        path = os.path.join(root, 'cpu%d' % cpu)
+        topology = os.path.join(path, 'topology')
+        package = int(_read(os.path.join(topology, 'physical_package_id'), 0))
+        # Older kernels do not report dies; treat each package as one die
+        die = int(_read(os.path.join(topology, 'die_id'), 0))
+        core = int(_read(os.path.join(topology, 'core_id'), cpu))
+        siblings = frozenset(_read_list(os.path.join(topology, 'thread_siblings_list')) or [cpu])
+        cpus.append(Cpu(cpu, package, die, core, siblings, _last_level_cache(path, cpu)))
+    return cpus
+
+# Placement classes, from closest to farthest
+CLASSES = ('same-core', 'smt-sibling', 'same-l3', 'cross-llc', 'cross-die', 'cross-socket')
+
+def classify(writer, reader):
+    if writer.id == reader.id:
+        return 'same-core'
+    elif reader.id in writer.siblings:
+        return 'smt-sibling'
+    elif reader.id in writer.l3:
+        return 'same-l3'
+    elif writer.package != reader.package:
+        return 'cross-socket'
+    elif writer.die == reader.die:
+        # Different last-level caches on the same die (e.g., core complexes)
+        return 'cross-llc'
+    else:
+        return 'cross-die'
+
+def find_pairs(cpus):
+    """
+    Returns a dictionary mapping each placement class available on this
+    system to a (writer, reader) pair of CPUs. The first CPU that has a
+    partner in a given class is used, so that results are repeatable.
+    """
+    pairs = {}
+    for writer in cpus:
+        for reader in cpus:
+            name = classify(writer, reader)
+            if name not in pairs:
+                pairs[name] = (writer, reader)
+    return pairs
+
+
+class CpuPlacement(object):
+    """
+    Pins the writer and reader to individual CPUs with taskset, for use
+    wherever a NUMA wrapper is accepted. The streams identify which process
+    is being launched with the 'role' keyword argument.
+    """
+    def __init__(self, name, writer_cpu, reader_cpu):
+        self.name = name
+        self.cpus = {'writer': writer_cpu, 'reader': reader_cpu}
+
+    def __call__(self, command, *args, **kwargs):
+        cpu = self.cpus[kwargs['role']]
+        if isinstance(command, basestring):
+            command = [command]
+        return ['taskset', '-c', str(cpu)] + command
@@ -56,6 +56,9 @@ def time_to_sec(value):
 def to_gbps(value):
     return '%.2f' % (value/(1024**3))
 
+def to_usec(value):
+    return '%.1f' % (value*1e6)
+
 def to_percent(value):
     return '%.1f' % (value*100.0)
 
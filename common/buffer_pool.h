@@ -0,0 +1,82 @@
+/*
+ * This file is protected by Copyright. Please refer to the COPYRIGHT file
+ * distributed with this source distribution.
+ *
+ * This file is part of REDHAWK throughput.
+ *
+ * REDHAWK throughput is free software: you can redistribute it and/or modify it
+ * under the terms of the GNU Lesser General Public License as published by the
+ * Free Software Foundation, either version 3 of the License, or (at your
+ * option) any later version.
+ *
+ * REDHAWK throughput is distributed in the hope that it will be useful, but WITHOUT
+ * ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+ * FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License
+ * for more details.
+ *
+ * You should have received a copy of the GNU Lesser General Public License
+ * along with this program.  If not, see http://www.gnu.org/licenses/.
+ */
+#ifndef BUFFER_POOL_H
+#define BUFFER_POOL_H
+
+#include <cstddef>
+#include <vector>
+
+// Reusable buffers grouped into power-of-two size buckets. Buffers must be
+// returned to the pool from the same thread that allocates them; they are
+// only freed when the pool is destroyed.
+class buffer_pool {
+public:
+    buffer_pool() :
+        _free(sizeof(size_t) * 8)
+    {
+    }
+
+    ~buffer_pool()
+    {
+        for (size_t index = 0; index < _free.size(); ++index) {
+            std::vector<char*>& bucket = _free[index];
+            for (size_t ii = 0; ii < bucket.size(); ++ii) {
+                delete[] bucket[ii];
+            }
+        }
+    }
+
+    char* allocate(size_t size)
+    {
+        size_t index = bucket_index(size);
+        std::vector<char*>& bucket = _free[index];
+        if (bucket.empty()) {
+            return new char[bucket_size(index)];
+        }
+        char* buffer = bucket.back();
+        bucket.pop_back();
+        return buffer;
+    }
+
+    void deallocate(char* buffer, size_t size)
+    {
+        _free[bucket_index(size)].push_back(buffer);
+    }
+
+private:
+    // Index of the smallest power of two that can hold size bytes
+    static size_t bucket_index(size_t size)
+    {
+        size_t index = 0;
+        while (bucket_size(index) < size) {
+            ++index;
+        }
+        return index;
+    }
+
+    static size_t bucket_size(size_t index)
+    {
+        return static_cast<size_t>(1) << index;
+    }
+
+    std::vector<std::vector<char*> > _free;
+};
+
+#endif // BUFFER_POOL_H
@@ -0,0 +1,108 @@
+/*
+ * This file is protected by Copyright. Please refer to the COPYRIGHT file
+ * distributed with this source distribution.
+ *
+ * This file is part of REDHAWK throughput.
+ *
+ * REDHAWK throughput is free software: you can redistribute it and/or modify it
+ * under the terms of the GNU Lesser General Public License as published by the
+ * Free Software Foundation, either version 3 of the License, or (at your
+ * option) any later version.
+ *
+ * REDHAWK throughput is distributed in the hope that it will be useful, but WITHOUT
+ * ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+ * FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License
+ * for more details.
+ *
+ * You should have received a copy of the GNU Lesser General Public License
+ * along with this program.  If not, see http://www.gnu.org/licenses/.
+ */
+#ifndef LATENCY_H
+#define LATENCY_H
+
+#include <string>
+#include <cstring>
+
+#include <inttypes.h>
+#include <time.h>
+#include <fcntl.h>
+#include <unistd.h>
+#include <sys/mman.h>
+
+// One-way latency histogram, shared with the benchmark through a mapped file.
+// The buckets are log-linear in the style of HdrHistogram: values below 128ns
+// are exact, and each power of two above that is split into 64 sub-buckets,
+// for a relative error of less than 1.6%. The layout must match
+// streams/latency.py.
+static const unsigned int LATENCY_SUB_BUCKET_BITS = 7;
+static const size_t LATENCY_SUB_BUCKETS = 1 << LATENCY_SUB_BUCKET_BITS;
+static const size_t LATENCY_BUCKETS = (64 - LATENCY_SUB_BUCKET_BITS + 2) * (LATENCY_SUB_BUCKETS / 2);
+
+struct latency_histogram {
+    volatile uint64_t buckets[LATENCY_BUCKETS];
+};
+
+inline latency_histogram* open_histogram(const std::string& filename)
+{
+    int fd = open(filename.c_str(), O_RDWR);
+    if (fd < 0) {
+        return 0;
+    }
+
+    void* address = mmap(NULL, sizeof(latency_histogram), PROT_READ|PROT_WRITE, MAP_SHARED, fd, 0);
+    close(fd);
+    if (address == MAP_FAILED) {
+        return 0;
+    }
+    return reinterpret_cast<latency_histogram*>(address);
+}
+
+inline void close_histogram(latency_histogram* histogram)
+{
+    munmap(histogram, sizeof(latency_histogram));
+}
+
+inline size_t latency_bucket(uint64_t value)
+{
+    if (value < LATENCY_SUB_BUCKETS) {
+        return value;
+    }
+    unsigned int msb = 63 - __builtin_clzll(value);
+    unsigned int shift = msb - (LATENCY_SUB_BUCKET_BITS - 1);
+    return (shift * (LATENCY_SUB_BUCKETS / 2)) + (value >> shift);
+}
+
+// Readers may record from several threads (e.g., ORB thread pools)
+inline void record_latency(latency_histogram* histogram, uint64_t value)
+{
+    __sync_fetch_and_add(&histogram->buckets[latency_bucket(value)], 1);
+}
+
+inline uint64_t monotonic_now()
+{
+    struct timespec now;
+    clock_gettime(CLOCK_MONOTONIC, &now);
+    return (now.tv_sec * 1000000000ULL) + now.tv_nsec;
+}
+
+// Stores the current monotonic time, in nanoseconds, in the first 8 bytes of
+// a payload; payloads that are too small are left untouched
+inline void stamp_payload(void* payload, size_t size)
+{
+    if (size >= sizeof(uint64_t)) {
+        uint64_t now = monotonic_now();
+        memcpy(payload, &now, sizeof(now));
+    }
+}
+
+// Records the time elapsed since a payload was stamped by the writer
+inline void record_payload_latency(latency_histogram* histogram, const void* payload, size_t size)
+{
+    if (size >= sizeof(uint64_t)) {
+        uint64_t stamp;
+        memcpy(&stamp, payload, sizeof(stamp));
+        record_latency(histogram, monotonic_now() - stamp);
+    }
+}
+
+#endif // LATENCY_H
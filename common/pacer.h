@@ -0,0 +1,103 @@
+/*
+ * This file is protected by Copyright. Please refer to the COPYRIGHT file
+ * distributed with this source distribution.
+ *
+ * This file is part of REDHAWK throughput.
+ *
+ * REDHAWK throughput is free software: you can redistribute it and/or modify it
+ * under the terms of the GNU Lesser General Public License as published by the
+ * Free Software Foundation, either version 3 of the License, or (at your
+ * option) any later version.
+ *
+ * REDHAWK throughput is distributed in the hope that it will be useful, but WITHOUT
+ * ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+ * FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License
+ * for more details.
+ *
+ * You should have received a copy of the GNU Lesser General Public License
+ * along with this program.  If not, see http://www.gnu.org/licenses/.
+ */
+#ifndef PACER_H
+#define PACER_H
+
+#include <algorithm>
+
+#include <inttypes.h>
+#include <time.h>
+
+// Token bucket that limits a writer to a target rate in bytes per second.
+// Tokens accrue continuously at the target rate; each packet consumes its
+// size in tokens, and the writer sleeps whenever the balance goes negative.
+// Credit saved up while the writer is blocked elsewhere is capped at
+// PACER_BURST_TIME worth of data (or one packet), so that a stall is not
+// followed by an unpaced burst.
+static const double PACER_BURST_TIME = 0.01;
+
+class token_bucket {
+public:
+    token_bucket() :
+        _rate(0.0),
+        _tokens(0.0),
+        _last(0)
+    {
+    }
+
+    // Sets the target rate in bytes per second; zero or less disables pacing
+    void set_rate(double rate)
+    {
+        if (rate != _rate) {
+            _rate = rate;
+            _tokens = 0.0;
+            _last = now();
+        }
+    }
+
+    double rate() const
+    {
+        return _rate;
+    }
+
+    // Accounts for a packet of the given size, sleeping as long as needed to
+    // keep to the target rate
+    void consume(size_t bytes)
+    {
+        if (_rate <= 0.0) {
+            return;
+        }
+
+        uint64_t current = now();
+        double burst = std::max(_rate * PACER_BURST_TIME, static_cast<double>(bytes));
+        _tokens = std::min(_tokens + (current - _last) * 1e-9 * _rate, burst);
+        _last = current;
+
+        _tokens -= bytes;
+        if (_tokens < 0.0) {
+            // The deficit is carried forward, so oversleeping is made up for
+            // on the next packet
+            sleep_ns(static_cast<uint64_t>(-_tokens / _rate * 1e9));
+        }
+    }
+
+private:
+    static uint64_t now()
+    {
+        struct timespec ts;
+        clock_gettime(CLOCK_MONOTONIC, &ts);
+        return (ts.tv_sec * 1000000000ULL) + ts.tv_nsec;
+    }
+
+    static void sleep_ns(uint64_t delay)
+    {
+        struct timespec ts;
+        ts.tv_sec = delay / 1000000000ULL;
+        ts.tv_nsec = delay % 1000000000ULL;
+        while (nanosleep(&ts, &ts) != 0) {
+        }
+    }
+
+    double _rate;
+    double _tokens;
+    uint64_t _last;
+};
+
+#endif // PACER_H
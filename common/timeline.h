@@ -0,0 +1,154 @@
+/*
+ * This file is protected by Copyright. Please refer to the COPYRIGHT file
+ * distributed with this source distribution.
+ *
+ * This file is part of REDHAWK throughput.
+ *
+ * REDHAWK throughput is free software: you can redistribute it and/or modify it
+ * under the terms of the GNU Lesser General Public License as published by the
+ * Free Software Foundation, either version 3 of the License, or (at your
+ * option) any later version.
+ *
+ * REDHAWK throughput is distributed in the hope that it will be useful, but WITHOUT
+ * ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+ * FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License
+ * for more details.
+ *
+ * You should have received a copy of the GNU Lesser General Public License
+ * along with this program.  If not, see http://www.gnu.org/licenses/.
+ */
+#ifndef TIMELINE_H
+#define TIMELINE_H
+
+#include <string>
+
+#include <inttypes.h>
+#include <pthread.h>
+#include <time.h>
+#include <fcntl.h>
+#include <unistd.h>
+#include <sys/mman.h>
+
+// Timeline of (time, cumulative bytes) samples, shared with the benchmark
+// through a mapped file so that short stalls can be seen without polling the
+// reader remotely. The file holds a header followed by a ring of entries; the
+// header's count is the total number of entries ever written, so the most
+// recent entry is at index (count - 1) % capacity. The layout must match
+// streams/timeline.py.
+struct timeline_entry {
+    uint64_t time;
+    uint64_t bytes;
+};
+
+struct timeline_header {
+    volatile uint64_t count;
+    uint64_t capacity;
+};
+
+// Records a byte counter from a background thread at a fixed period (1ms by
+// default), on an absolute schedule so that the sample times do not drift.
+// The counter is only read, so the data path is not slowed down.
+template <class T>
+class timeline_recorder {
+public:
+    timeline_recorder(const std::string& filename, const volatile T* counter, uint64_t period_ns=1000000) :
+        _header(0),
+        _entries(0),
+        _size(0),
+        _capacity(0),
+        _counter(counter),
+        _period(period_ns),
+        _running(false)
+    {
+        int fd = open(filename.c_str(), O_RDWR);
+        if (fd < 0) {
+            return;
+        }
+        off_t size = lseek(fd, 0, SEEK_END);
+        if (size < (off_t) sizeof(timeline_header)) {
+            close(fd);
+            return;
+        }
+        void* address = mmap(NULL, size, PROT_READ|PROT_WRITE, MAP_SHARED, fd, 0);
+        close(fd);
+        if (address == MAP_FAILED) {
+            return;
+        }
+        _size = size;
+        _header = reinterpret_cast<timeline_header*>(address);
+        _entries = reinterpret_cast<timeline_entry*>(_header + 1);
+
+        // Refuse a ring that does not fit in the file; the capacity is read
+        // once, so the recording thread never trusts the shared copy
+        uint64_t max_capacity = (_size - sizeof(timeline_header)) / sizeof(timeline_entry);
+        if (_header->capacity == 0 || _header->capacity > max_capacity) {
+            return;
+        }
+        _capacity = _header->capacity;
+
+        _running = true;
+        if (pthread_create(&_thread, NULL, &timeline_recorder::thread_start, this) != 0) {
+            _running = false;
+        }
+    }
+
+    ~timeline_recorder()
+    {
+        if (_running) {
+            _running = false;
+            pthread_join(_thread, NULL);
+        }
+        if (_header) {
+            munmap(_header, _size);
+        }
+    }
+
+    bool is_open() const
+    {
+        return _running;
+    }
+
+private:
+    void thread_run()
+    {
+        struct timespec next;
+        clock_gettime(CLOCK_MONOTONIC, &next);
+        while (_running) {
+            // Record the actual time rather than the scheduled time, so that
+            // late wakeups show up as jitter
+            struct timespec now;
+            clock_gettime(CLOCK_MONOTONIC, &now);
+            timeline_entry& entry = _entries[_header->count % _capacity];
+            entry.time = (now.tv_sec * 1000000000ULL) + now.tv_nsec;
+            entry.bytes = *_counter;
+            // Publish the entry only once it is complete
+            __sync_synchronize();
+            _header->count++;
+
+            next.tv_nsec += _period;
+            while (next.tv_nsec >= 1000000000L) {
+                next.tv_nsec -= 1000000000L;
+                next.tv_sec++;
+            }
+            clock_nanosleep(CLOCK_MONOTONIC, TIMER_ABSTIME, &next, NULL);
+        }
+    }
+
+    static void* thread_start(void* arg)
+    {
+        timeline_recorder* recorder = reinterpret_cast<timeline_recorder*>(arg);
+        recorder->thread_run();
+        return 0;
+    }
+
+    timeline_header* _header;
+    timeline_entry* _entries;
+    size_t _size;
+    uint64_t _capacity;
+    const volatile T* _counter;
+    uint64_t _period;
+    volatile bool _running;
+    pthread_t _thread;
+};
+
+#endif // TIMELINE_H
@@ -17,9 +17,84 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with this program.  If not, see http://www.gnu.org/licenses/.
 #
+import sys
+import time
+import threading
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+
+class _Launcher(object):
+    """
+    Creates streams on the launch pool's threads. Once abandoned, any stream
+    that finishes launching afterwards is terminated on its pool thread
+    instead of being handed back.
+    """
+    def __init__(self, factory, data_format):
+        self.factory = factory
+        self.data_format = data_format
+        self.lock = threading.Lock()
+        self.started = []
+        self.abandoned = False
+
+    def __call__(self, numa_policy):
+        stream = self.factory.create(self.data_format, numa_policy)
+        with self.lock:
+            if not self.abandoned:
+                self.started.append(stream)
+                return stream
+        stream.terminate()
+        return None
+
+    def abandon(self):
+        # Returns the streams that have started so far; the caller is
+        # responsible for terminating them
+        with self.lock:
+            self.abandoned = True
+            return list(self.started)
+
+
 class AggregateStream(object):
-    def __init__(self, factory, data_format, numa_policy, count):
-        self.streams = [factory.create(data_format, numa_policy.next()) for ii in xrange(count)]
+    """
+    Runs several streams of the same kind in parallel. Creating a stream
+    mostly waits on its processes to start up and connect, so the streams are
+    launched (and terminated) concurrently, by up to workers threads [one per
+    stream]; interfaces that cannot launch concurrently serialize internally.
+    Waits up to timeout seconds for each stream in turn to start; the time
+    taken to launch all of them is available as setup_time.
+    """
+    def __init__(self, factory, data_format, numa_policy, count, workers=None, timeout=60.0):
+        if workers is None:
+            workers = count
+        self.workers = max(min(workers, count), 1)
+
+        # Assign placements up front, in order, as the NUMA policy is not
+        # thread-safe
+        policies = [numa_policy.next() for ii in xrange(count)]
+
+        start = time.time()
+        launcher = _Launcher(factory, data_format)
+        pool = ThreadPool(self.workers)
+        pending = [pool.apply_async(launcher, (policy,)) for policy in policies]
+        pool.close()
+
+        self.streams = []
+        try:
+            for index, result in enumerate(pending):
+                try:
+                    self.streams.append(result.get(timeout))
+                except multiprocessing.TimeoutError:
+                    raise RuntimeError('stream %d did not start within %g seconds' % (index, timeout))
+        except:
+            # Tear down the streams that have started without waiting on the
+            # rest; launches still in progress terminate their streams when
+            # (and if) they finish. A launch that never returns cannot be
+            # reclaimed, so its pool thread is left behind.
+            error = sys.exc_info()
+            self.streams = launcher.abandon()
+            self.terminate()
+            raise error[0], error[1], error[2]
+        pool.join()
+        self.setup_time = time.time() - start
 
     def start(self):
         for stream in self.streams:
@@ -29,13 +104,42 @@ class AggregateStream(object):
         for stream in self.streams:
             stream.stop()
 
+    def get_readers(self):
+        return [stream.get_reader() for stream in self.streams]
+
+    def get_writers(self):
+        return [stream.get_writer() for stream in self.streams]
+
     def received(self):
-        return sum(stream.received() for stream in self.streams)
+        return sum(self.received_by_stream())
+
+    def received_by_stream(self):
+        return [stream.received() for stream in self.streams]
+
+    def latency(self):
+        histograms = [stream.latency() for stream in self.streams]
+        if any(histogram is None for histogram in histograms):
+            return None
+        return sum(histograms)
 
     def transfer_size(self, length):
         for stream in self.streams:
             stream.transfer_size(length)
 
-    def terminate(self):
+    def size_acknowledged(self):
+        return all(stream.size_acknowledged() for stream in self.streams)
+
+    def target_rate(self, rate):
+        # The offered load is split evenly across the streams
         for stream in self.streams:
-            stream.terminate()
+            stream.target_rate(rate / len(self.streams))
+
+    def terminate(self):
+        if not self.streams:
+            return
+        pool = ThreadPool(min(self.workers, len(self.streams)))
+        try:
+            pool.map(lambda stream: stream.terminate(), self.streams, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
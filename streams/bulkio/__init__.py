@@ -18,14 +18,28 @@
 # along with this program.  If not, see http://www.gnu.org/licenses/.
 #
 import os
+import threading
 
-__all__ = ('factory')
+from streams.latency import LatencyHistogram
+from streams.timeline import Timeline
+from streams.formats import sample_size, sample_count, packet_size
+
+__all__ = ('factory', 'default_config')
 
 PATH = os.path.dirname(__file__)
 
+# The sandbox keeps its components in shared, unsynchronized state, so
+# launching and releasing components must not overlap, even when several
+# streams are created from different threads
+_sandbox_lock = threading.Lock()
+
+def default_config(transport):
+    return os.path.join(PATH, 'config/omniORB-%s.cfg' % transport)
+
 class NumaLauncher(object):
-    def __init__(self, policy):
+    def __init__(self, policy, role):
         self.policy = policy
+        self.role = role
 
     def isInteractive(self):
         return False
@@ -37,16 +51,34 @@ class NumaLauncher(object):
         return False
 
     def wrap(self, command, arguments):
-        command = self.policy([command] + arguments)
+        command = self.policy([command] + arguments, role=self.role)
         return command[0], command[1:]
 
 
 class BulkioStream(object):
-    def __init__(self, format, numa_policy):
-        launcher = NumaLauncher(numa_policy)
-        self.writer = sb.launch(os.path.join(PATH, 'writer/writer.spd.xml'), debugger=launcher)
-        self.reader = sb.launch(os.path.join(PATH, 'reader/reader.spd.xml'), debugger=launcher)
-        self.writer.connect(self.reader)
+    def __init__(self, format, numa_policy, latency, timeline):
+        self.format = format
+        self.expected_size = None
+        writer_props = {'data_format': format}
+        reader_props = {'data_format': format}
+        if latency:
+            self.histogram = LatencyHistogram()
+            reader_props['latency_file'] = self.histogram.filename
+        else:
+            self.histogram = None
+        if timeline:
+            self._timeline = Timeline()
+            reader_props['timeline_file'] = self._timeline.filename
+        else:
+            self._timeline = None
+
+        with _sandbox_lock:
+            self.writer = sb.launch(os.path.join(PATH, 'writer/writer.spd.xml'), properties=writer_props,
+                                    debugger=NumaLauncher(numa_policy, 'writer'))
+            self.reader = sb.launch(os.path.join(PATH, 'reader/reader.spd.xml'), properties=reader_props,
+                                    debugger=NumaLauncher(numa_policy, 'reader'))
+            port = 'data%s' % format.capitalize()
+            self.writer.connect(self.reader, usesPortName=port+'_out', providesPortName=port+'_in')
 
     def start(self):
         sb.start()
@@ -61,27 +93,50 @@ class BulkioStream(object):
         return self.writer._process.pid()
 
     def transfer_size(self, size):
-        self.writer.transfer_length = size
+        self.writer.transfer_length = sample_count(self.format, size)
+        self.expected_size = packet_size(self.format, size)
+
+    def size_acknowledged(self):
+        return int(self.reader.received_size) == self.expected_size
+
+    def target_rate(self, rate):
+        self.writer.target_rate = float(rate)
 
     def received(self):
         return int(self.reader.received)
 
+    def latency(self):
+        if self.histogram is None:
+            return None
+        return self.histogram.snapshot()
+
+    def timeline(self):
+        return self._timeline
+
     def terminate(self):
-        self.writer.releaseObject()
-        self.reader.releaseObject()
+        with _sandbox_lock:
+            self.writer.releaseObject()
+            self.reader.releaseObject()
 
 class BulkioStreamFactory(object):
-    def __init__(self, transport):
-        configfile = 'config/omniORB-%s.cfg' % transport
-        os.environ['OMNIORB_CONFIG'] = os.path.join(PATH, configfile)
+    def __init__(self, transport, latency=False, config=None, timeline=False):
+        # Components read the ORB configuration from the environment when
+        # they are launched
+        if config is None:
+            config = default_config(transport)
+        os.environ['OMNIORB_CONFIG'] = config
         from ossie.utils import sb
         globals()['sb'] = sb
+        self.latency = latency
+        self.timeline = timeline
 
     def create(self, format, numa_policy):
-        return BulkioStream(format, numa_policy)
+        # Reject unknown formats before launching any processes
+        sample_size(format)
+        return BulkioStream(format, numa_policy, self.latency, self.timeline)
 
     def cleanup(self):
         pass
 
-def factory(transport):
-    return BulkioStreamFactory(transport)
+def factory(transport, latency=False, config=None, timeline=False):
+    return BulkioStreamFactory(transport, latency, config, timeline)
@@ -31,7 +31,9 @@
 PREPARE_LOGGING(reader_i)
 
 reader_i::reader_i(const char *uuid, const char *label) :
-    reader_base(uuid, label)
+    reader_base(uuid, label),
+    histogram(0),
+    timeline(0)
 {
     // Avoid placing constructor code here. Instead, use the "constructor" function.
 
@@ -39,6 +41,10 @@ reader_i::reader_i(const char *uuid, const char *label) :
 
 reader_i::~reader_i()
 {
+    if (histogram) {
+        close_histogram(histogram);
+    }
+    delete timeline;
 }
 
 void reader_i::constructor()
@@ -46,6 +52,36 @@ void reader_i::constructor()
     /***********************************************************************************
      This is the RH constructor. All properties are properly initialized before this function is called 
     ***********************************************************************************/
+    latencyFileChanged(std::string(), latency_file);
+    addPropertyListener(latency_file, this, &reader_i::latencyFileChanged);
+    timelineFileChanged(std::string(), timeline_file);
+    addPropertyListener(timeline_file, this, &reader_i::timelineFileChanged);
+}
+
+void reader_i::latencyFileChanged(const std::string& oldValue, const std::string& newValue)
+{
+    if (histogram) {
+        close_histogram(histogram);
+        histogram = 0;
+    }
+    if (!newValue.empty()) {
+        histogram = open_histogram(newValue);
+        if (!histogram) {
+            LOG_ERROR(reader_i, "Unable to open latency histogram " << newValue);
+        }
+    }
+}
+
+void reader_i::timelineFileChanged(const std::string& oldValue, const std::string& newValue)
+{
+    delete timeline;
+    timeline = 0;
+    if (!newValue.empty()) {
+        timeline = new timeline_recorder<CORBA::ULongLong>(newValue, &received);
+        if (!timeline->is_open()) {
+            LOG_ERROR(reader_i, "Unable to open timeline " << newValue);
+        }
+    }
 }
 
 /***********************************************************************************************
@@ -218,14 +254,39 @@ void reader_i::constructor()
 ************************************************************************************************/
 int reader_i::serviceFunction()
 {
-    bulkio::InOctetStream stream = dataOctet_in->getCurrentStream();
+    if (data_format == "short") {
+        return readPacket<bulkio::ShortDataBlock, bulkio::InShortStream>(dataShort_in);
+    } else if (data_format == "float") {
+        return readPacket<bulkio::FloatDataBlock, bulkio::InFloatStream>(dataFloat_in);
+    } else {
+        return readPacket<bulkio::OctetDataBlock, bulkio::InOctetStream>(dataOctet_in);
+    }
+}
+
+template <class Block, class Stream, class Port>
+int reader_i::readPacket(Port* port)
+{
+    Stream stream = port->getCurrentStream();
     if (!stream) {
         return NOOP;
     }
-    bulkio::OctetDataBlock block = stream.read();
+    Block block = stream.read();
     if (!block) {
         return NOOP;
     }
-    received += block.size();
+    received_size = block.size() * sizeof(*block.data());
+    received += received_size;
+
+    if (histogram) {
+        // BulkIO timestamps are wall clock time; the writer stamps each packet
+        // with the current time
+        BULKIO::PrecisionUTCTime now = bulkio::time::utils::now();
+        const BULKIO::PrecisionUTCTime& start = block.getStartTime();
+        double elapsed = (now.twsec - start.twsec) + (now.tfsec - start.tfsec);
+        if (elapsed < 0.0) {
+            elapsed = 0.0;
+        }
+        record_latency(histogram, static_cast<uint64_t>(elapsed * 1e9));
+    }
     return NORMAL;
 }
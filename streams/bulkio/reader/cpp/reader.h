@@ -22,6 +22,9 @@
 
 #include "reader_base.h"
 
+#include <latency.h>
+#include <timeline.h>
+
 class reader_i : public reader_base
 {
     ENABLE_LOGGING
@@ -32,6 +35,16 @@ class reader_i : public reader_base
         void constructor();
 
         int serviceFunction();
+
+    private:
+        template <class Block, class Stream, class Port>
+        int readPacket(Port* port);
+
+        void latencyFileChanged(const std::string& oldValue, const std::string& newValue);
+        void timelineFileChanged(const std::string& oldValue, const std::string& newValue);
+
+        latency_histogram* histogram;
+        timeline_recorder<CORBA::ULongLong>* timeline;
 };
 
 #endif // READER_I_IMPL_H
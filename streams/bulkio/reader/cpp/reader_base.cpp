@@ -37,12 +37,20 @@ reader_base::reader_base(const char *uuid, const char *label) :
 
     dataOctet_in = new bulkio::InOctetPort("dataOctet_in");
     addPort("dataOctet_in", dataOctet_in);
+    dataShort_in = new bulkio::InShortPort("dataShort_in");
+    addPort("dataShort_in", dataShort_in);
+    dataFloat_in = new bulkio::InFloatPort("dataFloat_in");
+    addPort("dataFloat_in", dataFloat_in);
 }
 
 reader_base::~reader_base()
 {
     delete dataOctet_in;
     dataOctet_in = 0;
+    delete dataShort_in;
+    dataShort_in = 0;
+    delete dataFloat_in;
+    dataFloat_in = 0;
 }
 
 /*******************************************************************************************
@@ -86,6 +94,40 @@ void reader_base::loadProperties()
                 "external",
                 "property");
 
+    addProperty(received_size,
+                0,
+                "received_size",
+                "",
+                "readonly",
+                "bytes",
+                "external",
+                "property");
+
+    addProperty(latency_file,
+                "latency_file",
+                "",
+                "readwrite",
+                "",
+                "external",
+                "property");
+
+    addProperty(timeline_file,
+                "timeline_file",
+                "",
+                "readwrite",
+                "",
+                "external",
+                "property");
+
+    addProperty(data_format,
+                "octet",
+                "data_format",
+                "",
+                "readwrite",
+                "",
+                "external",
+                "property");
+
 }
 
 
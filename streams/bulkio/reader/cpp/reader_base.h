@@ -44,10 +44,22 @@ class reader_base : public Component, protected ThreadedComponent
         // Member variables exposed as properties
         /// Property: received
         CORBA::ULongLong received;
+        /// Property: received_size
+        CORBA::ULong received_size;
+        /// Property: latency_file
+        std::string latency_file;
+        /// Property: timeline_file
+        std::string timeline_file;
+        /// Property: data_format
+        std::string data_format;
 
         // Ports
         /// Port: dataOctet_in
         bulkio::InOctetPort *dataOctet_in;
+        /// Port: dataShort_in
+        bulkio::InShortPort *dataShort_in;
+        /// Port: dataFloat_in
+        bulkio::InFloatPort *dataFloat_in;
 
     private:
 };
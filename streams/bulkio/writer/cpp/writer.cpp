@@ -46,8 +46,12 @@ void writer_i::constructor()
     /***********************************************************************************
      This is the RH constructor. All properties are properly initialized before this function is called 
     ***********************************************************************************/
-    stream = dataOctet_out->createStream("test_stream");
-    stream.blocking(true);
+    octetStream = dataOctet_out->createStream("test_stream");
+    octetStream.blocking(true);
+    shortStream = dataShort_out->createStream("test_stream");
+    shortStream.blocking(true);
+    floatStream = dataFloat_out->createStream("test_stream");
+    floatStream.blocking(true);
 }
 
 /***********************************************************************************************
@@ -219,6 +223,20 @@ void writer_i::constructor()
 
 ************************************************************************************************/
 int writer_i::serviceFunction()
+{
+    if (data_format == "short") {
+        writePacket(shortStream, shortBuffer);
+    } else if (data_format == "float") {
+        writePacket(floatStream, floatBuffer);
+    } else {
+        writePacket(octetStream, octetBuffer);
+    }
+
+    return NORMAL;
+}
+
+template <class Stream, class Sample>
+void writer_i::writePacket(Stream& stream, std::vector<Sample>& buffer)
 {
     size_t buffer_size = transfer_length;
     if (buffer.size() != buffer_size) {
@@ -227,6 +245,7 @@ int writer_i::serviceFunction()
 
     stream.write(buffer, bulkio::time::utils::now());
 
-    return NORMAL;
+    pacer.set_rate(target_rate);
+    pacer.consume(buffer.size() * sizeof(Sample));
 }
 
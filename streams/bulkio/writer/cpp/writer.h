@@ -22,6 +22,8 @@
 
 #include "writer_base.h"
 
+#include <pacer.h>
+
 class writer_i : public writer_base
 {
     ENABLE_LOGGING
@@ -34,8 +36,16 @@ class writer_i : public writer_base
         int serviceFunction();
 
     private:
-        std::vector<CORBA::Octet> buffer;
-        bulkio::OutOctetStream stream;
+        template <class Stream, class Sample>
+        void writePacket(Stream& stream, std::vector<Sample>& buffer);
+
+        std::vector<CORBA::Octet> octetBuffer;
+        std::vector<CORBA::Short> shortBuffer;
+        std::vector<CORBA::Float> floatBuffer;
+        bulkio::OutOctetStream octetStream;
+        bulkio::OutShortStream shortStream;
+        bulkio::OutFloatStream floatStream;
+        token_bucket pacer;
 };
 
 #endif // WRITER_I_IMPL_H
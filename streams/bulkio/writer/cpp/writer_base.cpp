@@ -37,12 +37,20 @@ writer_base::writer_base(const char *uuid, const char *label) :
 
     dataOctet_out = new bulkio::OutOctetPort("dataOctet_out");
     addPort("dataOctet_out", dataOctet_out);
+    dataShort_out = new bulkio::OutShortPort("dataShort_out");
+    addPort("dataShort_out", dataShort_out);
+    dataFloat_out = new bulkio::OutFloatPort("dataFloat_out");
+    addPort("dataFloat_out", dataFloat_out);
 }
 
 writer_base::~writer_base()
 {
     delete dataOctet_out;
     dataOctet_out = 0;
+    delete dataShort_out;
+    dataShort_out = 0;
+    delete dataFloat_out;
+    dataFloat_out = 0;
 }
 
 /*******************************************************************************************
@@ -86,6 +94,24 @@ void writer_base::loadProperties()
                 "external",
                 "property");
 
+    addProperty(data_format,
+                "octet",
+                "data_format",
+                "",
+                "readwrite",
+                "",
+                "external",
+                "property");
+
+    addProperty(target_rate,
+                0.0,
+                "target_rate",
+                "",
+                "readwrite",
+                "bytes/s",
+                "external",
+                "property");
+
 }
 
 
@@ -44,10 +44,18 @@ class writer_base : public Component, protected ThreadedComponent
         // Member variables exposed as properties
         /// Property: transfer_length
         CORBA::ULong transfer_length;
+        /// Property: data_format
+        std::string data_format;
+        /// Property: target_rate
+        double target_rate;
 
         // Ports
         /// Port: dataOctet_out
         bulkio::OutOctetPort *dataOctet_out;
+        /// Port: dataShort_out
+        bulkio::OutShortPort *dataShort_out;
+        /// Port: dataFloat_out
+        bulkio::OutFloatPort *dataFloat_out;
 
     private:
 };
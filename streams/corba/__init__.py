@@ -21,21 +21,52 @@ import subprocess
 import omniORB
 
 import rawdata
+from streams.latency import LatencyHistogram
+from streams.timeline import Timeline
+from streams.formats import sample_size, sample_count, packet_size
 
-__all__ = ('factory')
+__all__ = ('factory', 'PUSH_MODES', 'CONNECTION_MODES', 'SERVER_MODES')
+
+# Writer push operations: "twoway" waits for each push to complete before
+# sending the next packet, "oneway" sends without waiting for a reply
+PUSH_MODES = ('twoway', 'oneway')
+
+# Whether multiple pusher threads share one GIOP connection to the reader or
+# each open their own
+CONNECTION_MODES = ('shared', 'separate')
+
+# Reader ORB threading model: a dedicated thread per connection, or a pool of
+# threads servicing all connections
+SERVER_MODES = ('connection', 'pool')
 
 class CorbaStream(object):
-    def __init__(self, orbargs, orb, format, numa_policy):
-        reader_args = numa_policy(['streams/corba/reader'] + orbargs)
+    def __init__(self, reader_args, writer_args, orb, format, numa_policy, latency, timeline):
+        reader_opts = []
+        writer_opts = []
+        if latency:
+            self.histogram = LatencyHistogram()
+            reader_opts += ['-l', self.histogram.filename]
+            writer_opts += ['-l']
+        else:
+            self.histogram = None
+        if timeline:
+            self._timeline = Timeline()
+            reader_opts += ['-T', self._timeline.filename]
+        else:
+            self._timeline = None
+
+        reader_args = numa_policy(['streams/corba/reader'] + reader_args + reader_opts, role='reader')
         self.reader_proc = subprocess.Popen(reader_args, stdout=subprocess.PIPE)
         ior = self.reader_proc.stdout.readline().rstrip()
         self.reader = orb.string_to_object(ior)
 
-        writer_args = numa_policy(['streams/corba/writer'] + orbargs)
+        writer_args = numa_policy(['streams/corba/writer'] + writer_args + writer_opts, role='writer')
         self.writer_proc = subprocess.Popen(writer_args, stdout=subprocess.PIPE)
         ior = self.writer_proc.stdout.readline().rstrip()
         self.writer = orb.string_to_object(ior)
 
+        self.format = format
+        self.expected_size = None
         self.writer.connect(self.reader, format)
 
     def start(self):
@@ -51,11 +82,26 @@ class CorbaStream(object):
         return self.writer_proc.pid
 
     def transfer_size(self, size):
-        self.writer.transfer_length(size)
+        self.writer.transfer_length(sample_count(self.format, size))
+        self.expected_size = packet_size(self.format, size)
+
+    def size_acknowledged(self):
+        return self.reader.received_size() == self.expected_size
+
+    def target_rate(self, rate):
+        self.writer.target_rate(float(rate))
 
     def received(self):
         return self.reader.received()
 
+    def latency(self):
+        if self.histogram is None:
+            return None
+        return self.histogram.snapshot()
+
+    def timeline(self):
+        return self._timeline
+
     def terminate(self):
         self.reader_proc.terminate()
         self.writer_proc.terminate()
@@ -65,19 +111,62 @@ class CorbaStream(object):
         self.reader_proc.wait()
 
 class CorbaStreamFactory(object):
-    def __init__(self, transport):
+    def __init__(self, transport, latency=False, push='twoway', threads=1, connections='separate',
+                 server='connection', pool_size=None, orbargs=None, timeline=False):
+        if push not in PUSH_MODES:
+            raise ValueError("invalid push mode '%s'" % push)
+        if connections not in CONNECTION_MODES:
+            raise ValueError("invalid connection mode '%s'" % connections)
+        if server not in SERVER_MODES:
+            raise ValueError("invalid server mode '%s'" % server)
         if transport == 'unix':
             self.orbargs = ['-ORBendPoint', 'giop:unix:']
         else:
             self.orbargs = ['-ORBendPoint', 'giop:tcp::']
         self.orbargs += [ '-ORBgiopMaxMsgSize', str(50*1024*1024)]
         self.orb = omniORB.CORBA.ORB_init()
+        self.latency = latency
+        self.timeline = timeline
+
+        self.reader_args = self.orbargs[:]
+        if server == 'pool':
+            self.reader_args += ['-ORBthreadPerConnectionPolicy', '0']
+            if pool_size is not None:
+                self.reader_args += ['-ORBmaxServerThreadPoolSize', str(pool_size)]
+        else:
+            self.reader_args += ['-ORBthreadPerConnectionPolicy', '1']
+
+        # With one call per connection, the writer's ORB opens a new
+        # connection for each concurrent call, up to the per-server limit;
+        # otherwise, concurrent calls are interleaved on a single connection
+        self.writer_args = self.orbargs[:]
+        if connections == 'shared':
+            self.writer_args += ['-ORBoneCallPerConnection', '0',
+                                 '-ORBmaxGIOPConnectionPerServer', '1']
+        else:
+            self.writer_args += ['-ORBoneCallPerConnection', '1',
+                                 '-ORBmaxGIOPConnectionPerServer', str(max(threads, 5))]
+
+        # Additional ORB arguments come after the defaults, overriding them
+        if orbargs:
+            self.reader_args += orbargs
+            self.writer_args += orbargs
+
+        if push == 'oneway':
+            self.writer_args += ['-o']
+        if threads > 1:
+            self.writer_args += ['-n', str(threads)]
 
     def create(self, data_format, numa_policy):
-        return CorbaStream(self.orbargs, self.orb, data_format, numa_policy)
+        # Reject unknown formats before launching any processes
+        sample_size(data_format)
+        return CorbaStream(self.reader_args, self.writer_args, self.orb, data_format, numa_policy, self.latency,
+                           self.timeline)
 
     def cleanup(self):
         self.orb.destroy()
 
-def factory(transport):
-    return CorbaStreamFactory(transport)
+def factory(transport, latency=False, push='twoway', threads=1, connections='separate', server='connection',
+            pool_size=None, orbargs=None, timeline=False):
+    return CorbaStreamFactory(transport, latency, push, threads, connections, server, pool_size, orbargs,
+                              timeline)
@@ -20,57 +20,134 @@
 #include <iostream>
 #include <deque>
 
+#include <unistd.h>
+
 #include <omniORB4/CORBA.h>
 
 #include <threaded_deleter.h>
+#include <latency.h>
+#include <timeline.h>
 
 #include "rawdata.h"
 
 class Reader : public virtual POA_rawdata::reader {
 public:
-    Reader() :
-        _received(0)
+    Reader(latency_histogram* histogram, const std::string& timeline_file) :
+        _histogram(histogram),
+        _timeline(0),
+        _received(0),
+        _received_size(0)
     {
+        if (!timeline_file.empty()) {
+            _timeline = new timeline_recorder<size_t>(timeline_file, &_received);
+            if (!_timeline->is_open()) {
+                std::cerr << "Unable to open timeline " << timeline_file << std::endl;
+                exit(1);
+            }
+        }
     }
 
     void push_octet(const rawdata::octet_sequence& data)
     {
-        _received += data.length();
+        record(data);
+        add_received(data.length());
         _deleter.deallocate_array(const_cast<rawdata::octet_sequence&>(data).get_buffer(1));
     }
 
     void push_short(const rawdata::short_sequence& data)
     {
-        _received += data.length() * sizeof(CORBA::Short);
+        record(data);
+        add_received(data.length() * sizeof(CORBA::Short));
         _deleter.deallocate_array(const_cast<rawdata::short_sequence&>(data).get_buffer(1));
     }
 
     void push_float(const rawdata::float_sequence& data)
     {
-        _received += data.length() * sizeof(CORBA::Float);
+        record(data);
+        add_received(data.length() * sizeof(CORBA::Float));
         _deleter.deallocate_array(const_cast<rawdata::float_sequence&>(data).get_buffer(1));
     }
 
+    void push_octet_oneway(const rawdata::octet_sequence& data)
+    {
+        push_octet(data);
+    }
+
+    void push_short_oneway(const rawdata::short_sequence& data)
+    {
+        push_short(data);
+    }
+
+    void push_float_oneway(const rawdata::float_sequence& data)
+    {
+        push_float(data);
+    }
+
     CORBA::LongLong received()
     {
         return _received;
     }
 
+    CORBA::Long received_size()
+    {
+        return _received_size;
+    }
+
 private:
+    // Pushes may be dispatched concurrently when the writer has multiple
+    // connections or the ORB uses a thread pool
+    void add_received(size_t count)
+    {
+        __sync_fetch_and_add(&_received, count);
+        _received_size = count;
+    }
+
+    template <class Sequence>
+    void record(const Sequence& data)
+    {
+        if (_histogram) {
+            record_payload_latency(_histogram, data.get_buffer(), data.length() * sizeof(data[0]));
+        }
+    }
+
+    latency_histogram* _histogram;
+    timeline_recorder<size_t>* _timeline;
     threaded_deleter _deleter;
-    size_t _received;
+    volatile size_t _received;
+    volatile CORBA::Long _received_size;
 };
 
 int main (int argc, char* argv[])
 {
     CORBA::ORB_var orb = CORBA::ORB_init(argc, argv);
 
+    // ORB_init() removes the ORB arguments, leaving the reader's options
+    latency_histogram* histogram = 0;
+    std::string timeline_file;
+    int opt;
+    while ((opt = getopt(argc, argv, "l:T:")) != -1) {
+        switch (opt) {
+        case 'l':
+            histogram = open_histogram(optarg);
+            if (!histogram) {
+                perror("open_histogram");
+                exit(1);
+            }
+            break;
+        case 'T':
+            timeline_file = optarg;
+            break;
+        default:
+            exit(1);
+        }
+    }
+
     CORBA::Object_var obj = orb->resolve_initial_references("RootPOA");
     PortableServer::POA_var root_poa = PortableServer::POA::_narrow(obj);
     PortableServer::POAManager_var manager = root_poa->the_POAManager();
     manager->activate();
 
-    Reader* reader = new Reader();
+    Reader* reader = new Reader(histogram, timeline_file);
     PortableServer::ObjectId_var oid = root_poa->activate_object(reader);
     rawdata::reader_var ref = reader->_this();
     CORBA::String_var ior = orb->object_to_string(ref);
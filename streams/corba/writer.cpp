@@ -18,19 +18,31 @@
  * along with this program.  If not, see http://www.gnu.org/licenses/.
  */
 #include <iostream>
+#include <vector>
+#include <cstdlib>
+
+#include <unistd.h>
 
 #include <omniORB4/CORBA.h>
 
+#include <latency.h>
+#include <pacer.h>
+
 #include "rawdata.h"
 
 class Writer : public virtual POA_rawdata::writer {
 public:
-    Writer() :
-        _thread(0),
+    Writer(bool timestamps, bool oneway, int threads) :
         _running(true),
-        _length(1024)
+        _timestamps(timestamps),
+        _oneway(oneway),
+        _length(1024),
+        _target_rate(0.0)
     {
-        _thread = new omni_thread(&Writer::thread_start, this);
+        // Each thread pushes independently to the same reader object
+        for (int index = 0; index < threads; ++index) {
+            _threads.push_back(new omni_thread(&Writer::thread_start, this));
+        }
     }
 
     void connect(rawdata::reader_ptr reader, const char* format)
@@ -44,9 +56,16 @@ public:
         _length = length;
     }
 
+    void target_rate(CORBA::Double rate)
+    {
+        _target_rate = rate;
+    }
+
     void start()
     {
-        _thread->start();
+        for (size_t index = 0; index < _threads.size(); ++index) {
+            _threads[index]->start();
+        }
     }
 
     void stop()
@@ -55,8 +74,25 @@ public:
     }
 
 private:
+    template <class Sequence>
+    void stamp(Sequence& data)
+    {
+        if (_timestamps) {
+            stamp_payload(data.get_buffer(), data.length() * sizeof(data[0]));
+        }
+    }
+
+    // Each pusher thread sends its share of the target rate
+    template <class Sequence>
+    void pace(token_bucket& pacer, const Sequence& data)
+    {
+        pacer.set_rate(_target_rate / _threads.size());
+        pacer.consume(data.length() * sizeof(data[0]));
+    }
+
     void thread_run()
     {
+        token_bucket pacer;
         if (_format == "float") {
             rawdata::float_sequence data;
             data.length(_length);
@@ -64,7 +100,13 @@ private:
                 if (data.length() != _length) {
                     data.length(_length);
                 }
-                _reader->push_float(data);
+                stamp(data);
+                if (_oneway) {
+                    _reader->push_float_oneway(data);
+                } else {
+                    _reader->push_float(data);
+                }
+                pace(pacer, data);
             }
         } else if (_format == "short") {
             rawdata::short_sequence data;
@@ -73,7 +115,13 @@ private:
                 if (data.length() != _length) {
                     data.length(_length);
                 }
-                _reader->push_short(data);
+                stamp(data);
+                if (_oneway) {
+                    _reader->push_short_oneway(data);
+                } else {
+                    _reader->push_short(data);
+                }
+                pace(pacer, data);
             }
         } else {
             rawdata::octet_sequence data;
@@ -82,7 +130,13 @@ private:
                 if (data.length() != _length) {
                     data.length(_length);
                 }
-                _reader->push_octet(data);
+                stamp(data);
+                if (_oneway) {
+                    _reader->push_octet_oneway(data);
+                } else {
+                    _reader->push_octet(data);
+                }
+                pace(pacer, data);
             }
         }
     }
@@ -94,23 +148,51 @@ private:
         return 0;
     }
 
-    omni_thread* _thread;
+    std::vector<omni_thread*> _threads;
     rawdata::reader_var _reader;
     volatile bool _running;
+    bool _timestamps;
+    bool _oneway;
     std::string _format;
     int _length;
+    volatile double _target_rate;
 };
 
 int main (int argc, char* argv[])
 {
     CORBA::ORB_var orb = CORBA::ORB_init(argc, argv);
 
+    // ORB_init() removes the ORB arguments, leaving the writer's options
+    bool timestamps = false;
+    bool oneway = false;
+    int threads = 1;
+    int opt;
+    while ((opt = getopt(argc, argv, "lon:")) != -1) {
+        switch (opt) {
+        case 'l':
+            timestamps = true;
+            break;
+        case 'o':
+            oneway = true;
+            break;
+        case 'n':
+            threads = atoi(optarg);
+            if (threads < 1) {
+                std::cerr << "invalid thread count " << optarg << std::endl;
+                exit(1);
+            }
+            break;
+        default:
+            exit(1);
+        }
+    }
+
     CORBA::Object_var obj = orb->resolve_initial_references("RootPOA");
     PortableServer::POA_var root_poa = PortableServer::POA::_narrow(obj);
     PortableServer::POAManager_var manager = root_poa->the_POAManager();
     manager->activate();
 
-    Writer* writer = new Writer();
+    Writer* writer = new Writer(timestamps, oneway, threads);
     PortableServer::ObjectId_var oid = root_poa->activate_object(writer);
     rawdata::writer_var ref = writer->_this();
     CORBA::String_var ior = orb->object_to_string(ref);
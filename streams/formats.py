@@ -0,0 +1,44 @@
+#
+# This file is protected by Copyright. Please refer to the COPYRIGHT file
+# distributed with this source distribution.
+#
+# This file is part of REDHAWK throughput.
+#
+# REDHAWK throughput is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# REDHAWK throughput is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+
+__all__ = ('FORMATS', 'sample_size', 'sample_count', 'packet_size')
+
+# Size in bytes of a single sample of each data format
+FORMATS = {
+    'octet': 1,
+    'short': 2,
+    'float': 4,
+}
+
+def sample_size(format):
+    try:
+        return FORMATS[format]
+    except KeyError:
+        raise ValueError("invalid format '%s'" % format)
+
+def sample_count(format, size):
+    # Transfer sizes are given in bytes; interfaces that transfer typed
+    # sequences take a number of samples
+    return size // sample_size(format)
+
+def packet_size(format, size):
+    # Actual size in bytes of the packets sent for a transfer size, rounded
+    # down to a whole number of samples
+    return sample_count(format, size) * sample_size(format)
@@ -0,0 +1,84 @@
+#
+# This file is protected by Copyright. Please refer to the COPYRIGHT file
+# distributed with this source distribution.
+#
+# This file is part of REDHAWK throughput.
+#
+# REDHAWK throughput is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# REDHAWK throughput is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+import os
+import mmap
+import tempfile
+
+import numpy
+
+__all__ = ('LatencyHistogram', 'percentile', 'maximum')
+
+# Must match the bucket layout in common/latency.h
+SUB_BUCKET_BITS = 7
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+BUCKETS = (64 - SUB_BUCKET_BITS + 2) * (SUB_BUCKETS // 2)
+
+def _bucket_limits():
+    # Highest value (in nanoseconds) that falls into each bucket
+    index = numpy.arange(BUCKETS, dtype=numpy.uint64)
+    shift = numpy.maximum(index // (SUB_BUCKETS//2), 1) - 1
+    base = numpy.where(index < SUB_BUCKETS, index, (index % (SUB_BUCKETS//2)) + (SUB_BUCKETS//2))
+    lower = base << shift
+    return lower + (numpy.uint64(1) << shift) - 1
+
+_LIMITS = _bucket_limits()
+
+class LatencyHistogram(object):
+    """
+    Latency histogram filled in by a stream's reader process through a shared
+    file. Counts are cumulative; take the difference of two snapshots to get
+    the distribution over an interval.
+    """
+    def __init__(self):
+        size = BUCKETS * 8
+        fd, self.filename = tempfile.mkstemp()
+        os.ftruncate(fd, size)
+        self.buf = mmap.mmap(fd, size, mmap.MAP_SHARED, mmap.PROT_READ|mmap.PROT_WRITE)
+        os.close(fd)
+        self.buckets = numpy.frombuffer(self.buf, dtype=numpy.uint64)
+
+    def snapshot(self):
+        return self.buckets.copy()
+
+    def __del__(self):
+        os.unlink(self.filename)
+
+
+def percentile(counts, percent):
+    """
+    Returns the latency, in seconds, below which the given percentage of the
+    recorded values fall, or NaN if there are no values.
+    """
+    total = counts.sum()
+    if total == 0:
+        return float('nan')
+    target = numpy.ceil(total * percent / 100.0)
+    index = numpy.searchsorted(numpy.cumsum(counts), target)
+    return _LIMITS[index] * 1e-9
+
+def maximum(counts):
+    """
+    Returns the largest recorded latency, in seconds, or NaN if there are no
+    values.
+    """
+    index = numpy.flatnonzero(counts)
+    if len(index) == 0:
+        return float('nan')
+    return _LIMITS[index[-1]] * 1e-9
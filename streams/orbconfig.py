@@ -0,0 +1,58 @@
+#
+# This file is protected by Copyright. Please refer to the COPYRIGHT file
+# distributed with this source distribution.
+#
+# This file is part of REDHAWK throughput.
+#
+# REDHAWK throughput is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# REDHAWK throughput is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+import os
+import tempfile
+
+__all__ = ('OrbConfig',)
+
+class OrbConfig(object):
+    """
+    omniORB configuration generated from a list of (name, value) settings,
+    usable either as a configuration file (via OMNIORB_CONFIG) or as ORB
+    command line arguments. When a base configuration file is given, its
+    entries are copied into the generated file, except for those overridden
+    by the settings.
+    """
+    def __init__(self, settings, base=None):
+        self.settings = list(settings)
+        overrides = set(name for name, value in self.settings)
+
+        lines = []
+        if base:
+            with open(base) as f:
+                for line in f:
+                    name = line.split('=', 1)[0].strip()
+                    if name not in overrides:
+                        lines.append(line.rstrip('\n'))
+        for name, value in self.settings:
+            lines.append('%s = %s' % (name, value))
+
+        fd, self.filename = tempfile.mkstemp(suffix='.cfg')
+        with os.fdopen(fd, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+
+    def orbargs(self):
+        args = []
+        for name, value in self.settings:
+            args += ['-ORB'+name, str(value)]
+        return args
+
+    def __del__(self):
+        os.unlink(self.filename)
@@ -24,32 +24,64 @@ import mmap
 import tempfile
 import ctypes
 
+from streams.latency import LatencyHistogram
+from streams.timeline import Timeline
+from streams.formats import sample_size, packet_size
+
 __all__ = ('factory')
 
 class control(object):
+    # Must match the layout of struct control in control.h
+    SIZE = 24
+
     def __init__(self, transfer_size):
         fd, self.filename = tempfile.mkstemp()
-        os.ftruncate(fd, 12)
-        self.buf = mmap.mmap(fd, 12, mmap.MAP_SHARED, mmap.PROT_WRITE)
+        os.ftruncate(fd, self.SIZE)
+        self.buf = mmap.mmap(fd, self.SIZE, mmap.MAP_SHARED, mmap.PROT_WRITE)
         os.close(fd)
         self.total_bytes = ctypes.c_uint64.from_buffer(self.buf)
         self.total_bytes.value = 0
         self.transfer_size = ctypes.c_uint32.from_buffer(self.buf, 8)
         self.transfer_size.value = transfer_size
+        self.received_size = ctypes.c_uint32.from_buffer(self.buf, 12)
+        self.received_size.value = 0
+        self.target_rate = ctypes.c_uint64.from_buffer(self.buf, 16)
+        self.target_rate.value = 0
 
     def __del__(self):
         os.unlink(self.filename)
 
 
 class RawStream(object):
-    def __init__(self, transport, numa_policy):
+    def __init__(self, transport, format, numa_policy, writer_options, reader_options, latency, timeline):
+        self.format = format
+        self.expected_size = None
+        if latency:
+            self.histogram = LatencyHistogram()
+            writer_options = writer_options + ['-l']
+            reader_options = reader_options + ['-l', self.histogram.filename]
+        else:
+            self.histogram = None
+        if timeline:
+            self._timeline = Timeline()
+            reader_options = reader_options + ['-T', self._timeline.filename]
+        else:
+            self._timeline = None
+
         self.writer_control = control(16384)
-        writer_args = numa_policy(['streams/raw/writer', transport, self.writer_control.filename])
+        writer_args = numa_policy(['streams/raw/writer'] + writer_options + [transport, self.writer_control.filename],
+                                  role='writer')
         self.writer_proc = subprocess.Popen(writer_args, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
         writer_addr = self.writer_proc.stdout.readline().rstrip()
+        # For shared memory, the address is the name of the ring
+        if transport == 'shm':
+            self.shm_name = writer_addr
+        else:
+            self.shm_name = None
 
         self.reader_control = control(16384)
-        reader_args = numa_policy(['streams/raw/reader', transport, writer_addr, self.reader_control.filename])
+        reader_args = numa_policy(['streams/raw/reader'] + reader_options + [transport, writer_addr, self.reader_control.filename],
+                                  role='reader')
         self.reader_proc = subprocess.Popen(reader_args)
 
     def start(self):
@@ -67,27 +99,99 @@ class RawStream(object):
     def transfer_size(self, size):
         self.writer_control.transfer_size.value = size
         self.reader_control.transfer_size.value = size
+        self.expected_size = packet_size(self.format, size)
+
+    def size_acknowledged(self):
+        # True once the reader has received a packet of the current transfer
+        # size; everything sent before the change has been received by then
+        return self.reader_control.received_size.value == self.expected_size
+
+    def target_rate(self, rate):
+        # Bytes per second; zero sends as fast as possible
+        self.writer_control.target_rate.value = int(rate)
 
     def received(self):
         return self.reader_control.total_bytes.value
 
+    def latency(self):
+        if self.histogram is None:
+            return None
+        return self.histogram.snapshot()
+
+    def timeline(self):
+        return self._timeline
+
+    def exited(self):
+        # Describes the processes that have exited on their own (e.g., when
+        # the kernel refuses a socket option), or returns an empty list
+        return ['%s exited with status %d' % (name, proc.returncode)
+                for name, proc in (('writer', self.writer_proc), ('reader', self.reader_proc))
+                if proc.poll() is not None]
+
     def terminate(self):
         # Assuming stop() was already called, the reader and writer should have
-        # already exited
-        self.writer_proc.kill()
-        self.reader_proc.kill()
+        # already exited; a process that exited() has seen is already reaped
+        # and cannot be signalled
+        for proc in (self.writer_proc, self.reader_proc):
+            if proc.returncode is None:
+                proc.kill()
         self.writer_proc.wait()
         self.reader_proc.wait()
 
+        # The reader unlinks the ring once it has mapped it, but if either
+        # process died before then, the segment would otherwise be left in
+        # /dev/shm
+        if self.shm_name:
+            try:
+                os.unlink('/dev/shm' + self.shm_name)
+            except OSError:
+                pass
+
 class RawStreamFactory(object):
-    def __init__(self, transport):
+    FRAMINGS = ('packet', 'vector', 'batch')
+    ALLOCATORS = ('new', 'pool')
+    # Socket options, applied to both ends of the connection; see
+    # streams/raw/sockopt.h. Zero (or False) leaves the kernel default.
+    SOCKET_OPTIONS = ('sndbuf', 'rcvbuf', 'nodelay', 'busy_poll', 'zerocopy')
+
+    def __init__(self, transport, framing='packet', batch=16, allocator='new', latency=False, sockopts=None,
+                 timeline=False):
+        if framing not in self.FRAMINGS:
+            raise ValueError("invalid framing '%s'" % framing)
+        if allocator not in self.ALLOCATORS:
+            raise ValueError("invalid allocator '%s'" % allocator)
         self.transport = transport
+        self.writer_options = ['-f', framing, '-b', str(batch)]
+        self.writer_options += self._socket_options(transport, framing, sockopts or {})
+        self.reader_options = self.writer_options + ['-a', allocator]
+        self.latency = latency
+        self.timeline = timeline
+
+    def _socket_options(self, transport, framing, sockopts):
+        options = []
+        for name, value in sorted(sockopts.iteritems()):
+            if name not in self.SOCKET_OPTIONS:
+                raise ValueError("invalid socket option '%s'" % name)
+            if not value:
+                continue
+            if transport == 'shm':
+                raise ValueError("socket option '%s' does not apply to shared memory" % name)
+            if name == 'zerocopy' and (transport != 'tcp' or framing != 'packet'):
+                raise ValueError('zero-copy sends require TCP with packet framing')
+            options += ['-o', '%s=%d' % (name, int(value))]
+        return options
 
     def create(self, format, numa_policy):
-        return RawStream(self.transport, numa_policy)
+        # The writer sends typed samples, rounding the transfer size down to a
+        # whole number of samples
+        sample_size(format)
+        writer_options = self.writer_options + ['-F', format]
+        return RawStream(self.transport, format, numa_policy, writer_options, self.reader_options, self.latency,
+                         self.timeline)
 
     def cleanup(self):
         pass
 
-def factory(transport):
-    return RawStreamFactory(transport)
+def factory(transport, framing='packet', batch=16, allocator='new', latency=False, sockopts=None,
+            timeline=False):
+    return RawStreamFactory(transport, framing, batch, allocator, latency, sockopts, timeline)
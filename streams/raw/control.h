@@ -27,6 +27,10 @@
 struct control {
     volatile uint64_t total_bytes;
     volatile uint32_t transfer_size;
+    // Size of the last complete packet received (reader only)
+    volatile uint32_t received_size;
+    // Writer pacing in bytes per second; zero sends as fast as possible
+    volatile uint64_t target_rate;
 };
 
 control* open_control(const std::string& filename);
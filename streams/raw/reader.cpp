@@ -24,6 +24,7 @@
 #include <cstdio>
 #include <cstring>
 #include <deque>
+#include <algorithm>
 #include <unistd.h>
 
 #include <sys/socket.h>
@@ -34,16 +35,24 @@
 #include <omnithread.h>
 
 #include <threaded_deleter.h>
+#include <buffer_pool.h>
+#include <latency.h>
+#include <timeline.h>
 
 #include "control.h"
+#include "ring.h"
+#include "sockopt.h"
 
-int connect_unix(const std::string& address)
+int connect_unix(const std::string& address, const socket_options& options)
 {
     int fd = socket(AF_UNIX, SOCK_STREAM, 0);
     if (fd < 0) {
         perror("socket");
         return -1;
     }
+    if (!apply_socket_options(fd, options, false)) {
+        return -1;
+    }
 
     struct sockaddr_un writer;
     writer.sun_family = AF_UNIX;
@@ -59,13 +68,18 @@ int connect_unix(const std::string& address)
     return fd;
 }
 
-int connect_tcp(const std::string& address)
+int connect_tcp(const std::string& address, const socket_options& options)
 {
     int fd = socket(AF_INET, SOCK_STREAM, 0);
     if (fd < 0) {
         perror("socket");
         return -1;
     }
+    // Set before connecting so that the receive buffer size is reflected in
+    // the negotiated window scale
+    if (!apply_socket_options(fd, options, true)) {
+        return -1;
+    }
 
     struct sockaddr_in server;
     memset(&server, 0, sizeof(sockaddr_in));
@@ -81,12 +95,12 @@ int connect_tcp(const std::string& address)
     return fd;
 }
 
-int connect(const std::string& protocol, const std::string& address)
+int connect(const std::string& protocol, const std::string& address, const socket_options& options)
 {
     if (protocol == "unix") {
-        return connect_unix(address);
+        return connect_unix(address, options);
     } else if (protocol == "tcp") {
-        return connect_tcp(address);
+        return connect_tcp(address, options);
     } else {
         std::cerr << "Unknown protocol '" << protocol << "'" << std::endl;
         return -1;
@@ -110,38 +124,299 @@ size_t read_buffer(int fd, char* buffer, size_t count)
     return bytes_read;
 }
 
-int main(int argc, const char* argv[])
+class input {
+public:
+    virtual ~input()
+    {
+    }
+
+    // Reads exactly count bytes, unless the writer has closed the connection
+    virtual size_t read(void* data, size_t count) = 0;
+
+    virtual void close() = 0;
+};
+
+// Reads directly from the socket, one system call per length or payload
+class packet_input : public input {
+public:
+    packet_input(int fd) :
+        _fd(fd)
+    {
+    }
+
+    size_t read(void* data, size_t count)
+    {
+        return read_buffer(_fd, static_cast<char*>(data), count);
+    }
+
+    void close()
+    {
+        ::close(_fd);
+    }
+
+private:
+    int _fd;
+};
+
+// Reads from the socket through a staging buffer, so that the lengths and
+// payloads of several small packets are received with a single system call.
+// Payloads at least as large as the staging buffer bypass it.
+class staged_input : public input {
+public:
+    staged_input(int fd, size_t capacity) :
+        _fd(fd),
+        _buffer(capacity),
+        _pos(0),
+        _end(0)
+    {
+    }
+
+    size_t read(void* data, size_t count)
+    {
+        char* dest = static_cast<char*>(data);
+        size_t bytes_read = 0;
+        while (bytes_read < count) {
+            if (_pos == _end) {
+                size_t remaining = count - bytes_read;
+                if (remaining >= _buffer.size()) {
+                    return bytes_read + read_buffer(_fd, dest + bytes_read, remaining);
+                }
+                if (!fill()) {
+                    break;
+                }
+            }
+            size_t pass = std::min(count - bytes_read, _end - _pos);
+            memcpy(dest + bytes_read, &_buffer[_pos], pass);
+            _pos += pass;
+            bytes_read += pass;
+        }
+        return bytes_read;
+    }
+
+    void close()
+    {
+        ::close(_fd);
+    }
+
+private:
+    bool fill()
+    {
+        ssize_t pass = ::read(_fd, &_buffer[0], _buffer.size());
+        if (pass <= 0) {
+            if (pass < 0) {
+                perror("read");
+            }
+            return false;
+        }
+        _pos = 0;
+        _end = pass;
+        return true;
+    }
+
+    int _fd;
+    std::vector<char> _buffer;
+    size_t _pos;
+    size_t _end;
+};
+
+class ring_input : public input {
+public:
+    ring_input(ring* buffer) :
+        _buffer(buffer)
+    {
+    }
+
+    size_t read(void* data, size_t count)
+    {
+        return ring_read(_buffer, data, count);
+    }
+
+    void close()
+    {
+        close_ring(_buffer);
+    }
+
+private:
+    ring* _buffer;
+};
+
+class packet_allocator {
+public:
+    virtual ~packet_allocator()
+    {
+    }
+
+    virtual char* allocate(size_t size) = 0;
+    virtual void deallocate(char* buffer, size_t size) = 0;
+};
+
+// Original behavior: a new buffer for every packet, freed on another thread
+class deferred_allocator : public packet_allocator {
+public:
+    char* allocate(size_t size)
+    {
+        return new char[size];
+    }
+
+    void deallocate(char* buffer, size_t /*unused*/)
+    {
+        _deleter.deallocate_array(buffer);
+    }
+
+private:
+    threaded_deleter _deleter;
+};
+
+// Buffers are recycled through a size-bucketed pool on the reading thread
+class pooled_allocator : public packet_allocator {
+public:
+    char* allocate(size_t size)
+    {
+        return _pool.allocate(size);
+    }
+
+    void deallocate(char* buffer, size_t size)
+    {
+        _pool.deallocate(buffer, size);
+    }
+
+private:
+    buffer_pool _pool;
+};
+
+// Staging space per packet in a batch, sized for the small end of the
+// transfer size sweep
+static const size_t STAGING_PACKET_SIZE = 64*1024;
+
+int main(int argc, char* argv[])
 {
-    if (argc < 4) {
+    std::string framing = "packet";
+    size_t batch = 16;
+    std::string allocation = "new";
+    std::string histogram_file;
+    std::string timeline_file;
+    socket_options options;
+
+    int opt;
+    while ((opt = getopt(argc, argv, "f:b:a:l:T:o:")) != -1) {
+        switch (opt) {
+        case 'f':
+            framing = optarg;
+            break;
+        case 'b':
+            batch = atoi(optarg);
+            break;
+        case 'a':
+            allocation = optarg;
+            break;
+        case 'l':
+            histogram_file = optarg;
+            break;
+        case 'T':
+            timeline_file = optarg;
+            break;
+        case 'o':
+            if (!parse_socket_option(options, optarg)) {
+                std::cerr << "Invalid socket option '" << optarg << "'" << std::endl;
+                exit(1);
+            }
+            break;
+        default:
+            exit(1);
+        }
+    }
+
+    if ((argc - optind) < 3) {
         exit(1);
     }
 
-    int fd = connect(argv[1], argv[2]);
-    if (fd < 0) {
+    const std::string protocol = argv[optind];
+    input* in;
+    if (protocol == "shm") {
+        ring* shm = open_ring(argv[optind+1]);
+        if (!shm) {
+            exit(1);
+        }
+        in = new ring_input(shm);
+    } else {
+        int fd = connect(protocol, argv[optind+1], options);
+        if (fd < 0) {
+            exit(1);
+        }
+
+        // recvmmsg() does not preserve packet boundaries on a stream socket,
+        // so batched framing is received with large reads instead
+        if (framing == "packet") {
+            in = new packet_input(fd);
+        } else if ((framing == "vector") || (framing == "batch")) {
+            in = new staged_input(fd, batch * STAGING_PACKET_SIZE);
+        } else {
+            std::cerr << "Unknown framing '" << framing << "'" << std::endl;
+            exit(1);
+        }
+    }
+
+    packet_allocator* allocator;
+    if (allocation == "new") {
+        allocator = new deferred_allocator();
+    } else if (allocation == "pool") {
+        allocator = new pooled_allocator();
+    } else {
+        std::cerr << "Unknown allocator '" << allocation << "'" << std::endl;
         exit(1);
     }
 
-    threaded_deleter deleter;
+    control* state = open_control(argv[optind+2]);
+
+    latency_histogram* histogram = 0;
+    if (!histogram_file.empty()) {
+        histogram = open_histogram(histogram_file);
+        if (!histogram) {
+            perror("open_histogram");
+            exit(1);
+        }
+    }
 
-    control* state = open_control(argv[3]);
+    timeline_recorder<uint64_t>* timeline = 0;
+    if (!timeline_file.empty()) {
+        timeline = new timeline_recorder<uint64_t>(timeline_file, &state->total_bytes);
+        if (!timeline->is_open()) {
+            std::cerr << "Unable to open timeline " << timeline_file << std::endl;
+            exit(1);
+        }
+    }
 
-    ssize_t count = 0;
     while (true) {
         size_t buffer_size = 0;
-        if (read(fd, &buffer_size, sizeof(buffer_size)) < sizeof(buffer_size)) {
+        if (in->read(&buffer_size, sizeof(buffer_size)) < sizeof(buffer_size)) {
             break;
         }
 
-        char* buffer = new char[buffer_size];
-        size_t pass = read_buffer(fd, buffer, buffer_size);
-        deleter.deallocate_array(buffer);
+        char* buffer = allocator->allocate(buffer_size);
+        size_t pass = in->read(buffer, buffer_size);
+        if (histogram && (pass == buffer_size)) {
+            record_payload_latency(histogram, buffer, buffer_size);
+        }
+        allocator->deallocate(buffer, buffer_size);
         if (pass == 0) {
             break;
         }
         state->total_bytes += pass;
+        if (pass == buffer_size) {
+            state->received_size = buffer_size;
+        }
     }
 
-    close(fd);
+    in->close();
+    delete in;
+
+    delete allocator;
+
+    delete timeline;
+
+    if (histogram) {
+        close_histogram(histogram);
+    }
 
     return 0;
 }
@@ -0,0 +1,226 @@
+/*
+ * This file is protected by Copyright. Please refer to the COPYRIGHT file
+ * distributed with this source distribution.
+ *
+ * This file is part of REDHAWK throughput.
+ *
+ * REDHAWK throughput is free software: you can redistribute it and/or modify it
+ * under the terms of the GNU Lesser General Public License as published by the
+ * Free Software Foundation, either version 3 of the License, or (at your
+ * option) any later version.
+ *
+ * REDHAWK throughput is distributed in the hope that it will be useful, but WITHOUT
+ * ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+ * FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License
+ * for more details.
+ *
+ * You should have received a copy of the GNU Lesser General Public License
+ * along with this program.  If not, see http://www.gnu.org/licenses/.
+ */
+#include <sys/mman.h>
+#include <sys/types.h>
+#include <sys/stat.h>
+#include <fcntl.h>
+#include <unistd.h>
+#include <sched.h>
+#include <signal.h>
+#include <cstdio>
+#include <cstring>
+#include <algorithm>
+#include "ring.h"
+
+static inline char* ring_data(ring* buffer)
+{
+    return reinterpret_cast<char*>(buffer) + sizeof(ring);
+}
+
+// Number of times to yield while waiting before checking that the peer is
+// still alive
+static const unsigned LIVENESS_INTERVAL = 1024;
+
+// A process that has exited but not yet been reaped still exists as a zombie,
+// so check its state rather than just its existence
+static bool process_alive(pid_t pid)
+{
+    char path[64];
+    snprintf(path, sizeof(path), "/proc/%d/stat", pid);
+    FILE* file = fopen(path, "r");
+    if (!file) {
+        return false;
+    }
+    char buf[512];
+    size_t count = fread(buf, 1, sizeof(buf) - 1, file);
+    fclose(file);
+    buf[count] = '\0';
+    const char* end = strrchr(buf, ')');
+    if (!end || end[1] != ' ') {
+        return false;
+    }
+    return (end[2] != 'Z') && (end[2] != 'X');
+}
+
+// Called while waiting on the peer; returns false if the wait should end
+static bool keep_waiting(pid_t peer, unsigned& spins, const volatile bool* running)
+{
+    if (running && !*running) {
+        return false;
+    }
+    if (++spins % LIVENESS_INTERVAL == 0) {
+        // The reader's PID is not known until it opens the ring
+        if (peer && !process_alive(peer)) {
+            return false;
+        }
+    }
+    // Give up the CPU in case the peer is sharing a core
+    sched_yield();
+    return true;
+}
+
+static ring* map_ring(int fd, size_t size)
+{
+    void* address = mmap(NULL, size, PROT_READ|PROT_WRITE, MAP_SHARED, fd, 0);
+    close(fd);
+    if (address == MAP_FAILED) {
+        perror("mmap");
+        return 0;
+    }
+    return reinterpret_cast<ring*>(address);
+}
+
+ring* create_ring(const std::string& name, size_t capacity)
+{
+    int fd = shm_open(name.c_str(), O_RDWR|O_CREAT|O_EXCL, 0600);
+    if (fd < 0) {
+        perror("shm_open");
+        return 0;
+    }
+
+    size_t size = sizeof(ring) + capacity;
+    if (ftruncate(fd, size) < 0) {
+        perror("ftruncate");
+        close(fd);
+        return 0;
+    }
+
+    ring* buffer = map_ring(fd, size);
+    if (buffer) {
+        buffer->head = 0;
+        buffer->tail = 0;
+        buffer->closed = 0;
+        buffer->capacity = capacity;
+        buffer->writer_pid = getpid();
+        buffer->reader_pid = 0;
+    }
+    return buffer;
+}
+
+ring* open_ring(const std::string& name)
+{
+    int fd = shm_open(name.c_str(), O_RDWR, 0);
+    if (fd < 0) {
+        perror("shm_open");
+        return 0;
+    }
+
+    struct stat status;
+    if (fstat(fd, &status) < 0) {
+        perror("fstat");
+        close(fd);
+        return 0;
+    }
+    ring* buffer = map_ring(fd, status.st_size);
+    if (buffer) {
+        buffer->reader_pid = getpid();
+        shm_unlink(name.c_str());
+    }
+    return buffer;
+}
+
+void close_ring(ring* buffer)
+{
+    munmap(buffer, sizeof(ring) + buffer->capacity);
+}
+
+size_t ring_write(ring* buffer, const void* data, size_t count, const volatile bool* running)
+{
+    const char* source = static_cast<const char*>(data);
+    const uint64_t capacity = buffer->capacity;
+    uint64_t head = buffer->head;
+    size_t written = 0;
+    unsigned spins = 0;
+    while (written < count) {
+        uint64_t tail = buffer->tail;
+        size_t space = capacity - (head - tail);
+        if (space == 0) {
+            // The reader has not caught up
+            if (!keep_waiting(buffer->reader_pid, spins, running)) {
+                break;
+            }
+            continue;
+        }
+
+        // Do not copy into the ring until the reader's tail has been observed
+        __sync_synchronize();
+
+        size_t offset = head % capacity;
+        size_t pass = std::min(count - written, std::min(space, capacity - offset));
+        memcpy(ring_data(buffer) + offset, source + written, pass);
+
+        // Publish the data before advancing the head
+        __sync_synchronize();
+        head += pass;
+        buffer->head = head;
+        written += pass;
+    }
+    return written;
+}
+
+size_t ring_read(ring* buffer, void* data, size_t count, const volatile bool* running)
+{
+    char* dest = static_cast<char*>(data);
+    const uint64_t capacity = buffer->capacity;
+    uint64_t tail = buffer->tail;
+    size_t bytes_read = 0;
+    unsigned spins = 0;
+    while (bytes_read < count) {
+        uint64_t head = buffer->head;
+        size_t available = head - tail;
+        if (available == 0) {
+            // Only treat the ring as closed once it has been drained; check
+            // the head again after reading the flag, in case the writer
+            // published more data before closing
+            if (buffer->closed) {
+                __sync_synchronize();
+                if (buffer->head == tail) {
+                    break;
+                }
+                continue;
+            }
+            // The writer may have died without closing the ring
+            if (!keep_waiting(buffer->writer_pid, spins, running)) {
+                break;
+            }
+            continue;
+        }
+
+        // Do not read from the ring until the writer's head has been observed
+        __sync_synchronize();
+
+        size_t offset = tail % capacity;
+        size_t pass = std::min(count - bytes_read, std::min(available, capacity - offset));
+        memcpy(dest + bytes_read, ring_data(buffer) + offset, pass);
+
+        // Finish reading the data before releasing the space to the writer
+        __sync_synchronize();
+        tail += pass;
+        buffer->tail = tail;
+        bytes_read += pass;
+    }
+    return bytes_read;
+}
+
+void ring_shutdown(ring* buffer)
+{
+    __sync_synchronize();
+    buffer->closed = 1;
+}
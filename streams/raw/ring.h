@@ -0,0 +1,57 @@
+/*
+ * This file is protected by Copyright. Please refer to the COPYRIGHT file
+ * distributed with this source distribution.
+ *
+ * This file is part of REDHAWK throughput.
+ *
+ * REDHAWK throughput is free software: you can redistribute it and/or modify it
+ * under the terms of the GNU Lesser General Public License as published by the
+ * Free Software Foundation, either version 3 of the License, or (at your
+ * option) any later version.
+ *
+ * REDHAWK throughput is distributed in the hope that it will be useful, but WITHOUT
+ * ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+ * FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License
+ * for more details.
+ *
+ * You should have received a copy of the GNU Lesser General Public License
+ * along with this program.  If not, see http://www.gnu.org/licenses/.
+ */
+#ifndef RING_H
+#define RING_H
+
+#include <string>
+
+#include <inttypes.h>
+
+// Single-producer/single-consumer byte ring in a shared memory segment. The
+// head and tail are free-running byte counters, each on its own cache line so
+// that the writer and reader do not contend for the same line. Each side
+// records its process ID so that the other can stop waiting if it dies.
+struct ring {
+    volatile uint64_t head;
+    char _pad0[56];
+    volatile uint64_t tail;
+    char _pad1[56];
+    volatile uint32_t closed;
+    uint32_t capacity;
+    volatile int32_t writer_pid;
+    volatile int32_t reader_pid;
+    char _pad2[48];
+};
+
+ring* create_ring(const std::string& name, size_t capacity);
+
+// Maps an existing ring as the reader. Once both sides have it mapped, the
+// name is no longer needed; it is unlinked so that the segment does not
+// outlive the processes, however they exit.
+ring* open_ring(const std::string& name);
+void close_ring(ring* buffer);
+
+// Both return early, with a short count, if the peer process exits or
+// *running becomes false (if given) while waiting.
+size_t ring_write(ring* buffer, const void* data, size_t count, const volatile bool* running=0);
+size_t ring_read(ring* buffer, void* data, size_t count, const volatile bool* running=0);
+void ring_shutdown(ring* buffer);
+
+#endif // RING_H
@@ -0,0 +1,113 @@
+/*
+ * This file is protected by Copyright. Please refer to the COPYRIGHT file
+ * distributed with this source distribution.
+ *
+ * This file is part of REDHAWK throughput.
+ *
+ * REDHAWK throughput is free software: you can redistribute it and/or modify it
+ * under the terms of the GNU Lesser General Public License as published by the
+ * Free Software Foundation, either version 3 of the License, or (at your
+ * option) any later version.
+ *
+ * REDHAWK throughput is distributed in the hope that it will be useful, but WITHOUT
+ * ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+ * FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License
+ * for more details.
+ *
+ * You should have received a copy of the GNU Lesser General Public License
+ * along with this program.  If not, see http://www.gnu.org/licenses/.
+ */
+#include <cstdio>
+#include <cstdlib>
+
+#include <sys/socket.h>
+#include <netinet/in.h>
+#include <netinet/tcp.h>
+
+#include "sockopt.h"
+
+// Older C libraries may not define the newer socket options
+#ifndef SO_BUSY_POLL
+#define SO_BUSY_POLL 46
+#endif
+#ifndef SO_ZEROCOPY
+#define SO_ZEROCOPY 60
+#endif
+
+static bool parse_int(const std::string& value, int& result)
+{
+    char* end;
+    long parsed = strtol(value.c_str(), &end, 10);
+    if (value.empty() || (*end != '\0') || (parsed < 0)) {
+        return false;
+    }
+    result = parsed;
+    return true;
+}
+
+static bool parse_flag(const std::string& value, bool& result)
+{
+    if (value.empty() || (value == "1")) {
+        result = true;
+    } else if (value == "0") {
+        result = false;
+    } else {
+        return false;
+    }
+    return true;
+}
+
+bool parse_socket_option(socket_options& options, const std::string& text)
+{
+    std::string::size_type isep = text.find('=');
+    const std::string name = text.substr(0, isep);
+    std::string value;
+    if (isep != std::string::npos) {
+        value = text.substr(isep+1);
+    }
+
+    if (name == "sndbuf") {
+        return parse_int(value, options.send_buffer);
+    } else if (name == "rcvbuf") {
+        return parse_int(value, options.receive_buffer);
+    } else if (name == "nodelay") {
+        return parse_flag(value, options.nodelay);
+    } else if (name == "busy_poll") {
+        return parse_int(value, options.busy_poll);
+    } else if (name == "zerocopy") {
+        return parse_flag(value, options.zerocopy);
+    }
+    return false;
+}
+
+static bool set_option(int fd, int level, int name, int value, const char* label)
+{
+    if (setsockopt(fd, level, name, &value, sizeof(value)) < 0) {
+        perror(label);
+        return false;
+    }
+    return true;
+}
+
+bool apply_socket_options(int fd, const socket_options& options, bool tcp)
+{
+    if (options.send_buffer && !set_option(fd, SOL_SOCKET, SO_SNDBUF, options.send_buffer, "SO_SNDBUF")) {
+        return false;
+    }
+    if (options.receive_buffer && !set_option(fd, SOL_SOCKET, SO_RCVBUF, options.receive_buffer, "SO_RCVBUF")) {
+        return false;
+    }
+    if (options.busy_poll && !set_option(fd, SOL_SOCKET, SO_BUSY_POLL, options.busy_poll, "SO_BUSY_POLL")) {
+        return false;
+    }
+    // TCP_NODELAY and zero-copy sends have no meaning on Unix sockets
+    if (tcp) {
+        if (options.nodelay && !set_option(fd, IPPROTO_TCP, TCP_NODELAY, 1, "TCP_NODELAY")) {
+            return false;
+        }
+        if (options.zerocopy && !set_option(fd, SOL_SOCKET, SO_ZEROCOPY, 1, "SO_ZEROCOPY")) {
+            return false;
+        }
+    }
+    return true;
+}
@@ -0,0 +1,58 @@
+/*
+ * This file is protected by Copyright. Please refer to the COPYRIGHT file
+ * distributed with this source distribution.
+ *
+ * This file is part of REDHAWK throughput.
+ *
+ * REDHAWK throughput is free software: you can redistribute it and/or modify it
+ * under the terms of the GNU Lesser General Public License as published by the
+ * Free Software Foundation, either version 3 of the License, or (at your
+ * option) any later version.
+ *
+ * REDHAWK throughput is distributed in the hope that it will be useful, but WITHOUT
+ * ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+ * FITNESS FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License
+ * for more details.
+ *
+ * You should have received a copy of the GNU Lesser General Public License
+ * along with this program.  If not, see http://www.gnu.org/licenses/.
+ */
+#ifndef SOCKOPT_H
+#define SOCKOPT_H
+
+#include <string>
+
+// Socket tuning shared by the raw writer and reader. Options are given on the
+// command line as "name=value" (or just "name" for flags):
+//   sndbuf=<bytes>      SO_SNDBUF
+//   rcvbuf=<bytes>      SO_RCVBUF
+//   nodelay[=0|1]       TCP_NODELAY (TCP only)
+//   busy_poll=<usec>    SO_BUSY_POLL
+//   zerocopy[=0|1]      SO_ZEROCOPY, sending payloads with MSG_ZEROCOPY (TCP
+//                       writer only)
+// Zero (the default) leaves the kernel's setting unchanged.
+struct socket_options {
+    socket_options() :
+        send_buffer(0),
+        receive_buffer(0),
+        nodelay(false),
+        busy_poll(0),
+        zerocopy(false)
+    {
+    }
+
+    int send_buffer;
+    int receive_buffer;
+    bool nodelay;
+    int busy_poll;
+    bool zerocopy;
+};
+
+// Parses a single option into options, returning false if it is not valid
+bool parse_socket_option(socket_options& options, const std::string& text);
+
+// Applies the options to a socket, returning false (after printing the error)
+// if any of them could not be set
+bool apply_socket_options(int fd, const socket_options& options, bool tcp);
+
+#endif // SOCKOPT_H
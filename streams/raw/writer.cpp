@@ -18,18 +18,35 @@
  * along with this program.  If not, see http://www.gnu.org/licenses/.
  */
 #include <iostream>
+#include <string>
 #include <vector>
+#include <deque>
 #include <cstdlib>
 #include <cstdio>
+#include <cstring>
+#include <cerrno>
 
 #include <signal.h>
 #include <unistd.h>
+#include <poll.h>
 #include <sys/socket.h>
 #include <netinet/in.h>
 #include <arpa/inet.h>
 #include <sys/un.h>
+#include <sys/uio.h>
+#include <sys/mman.h>
+#include <linux/errqueue.h>
+
+#include <latency.h>
+#include <pacer.h>
 
 #include "control.h"
+#include "ring.h"
+#include "sockopt.h"
+
+#ifndef MSG_ZEROCOPY
+#define MSG_ZEROCOPY 0x4000000
+#endif
 
 static volatile bool running = true;
 
@@ -38,9 +55,526 @@ static void sigint_received(int /*unused*/)
     running = false;
 }
 
-int main(int argc, const char* argv[])
+static const size_t RING_CAPACITY = 8*1024*1024;
+
+// Writes an entire I/O vector, resuming after short writes. Returns false if
+// the socket was closed or the write was interrupted.
+static bool writev_all(int fd, struct iovec* iov, int count)
+{
+    while (count > 0) {
+        ssize_t pass = writev(fd, iov, count);
+        if (pass < 0) {
+            if (errno != EINTR) {
+                perror("writev");
+            }
+            return false;
+        }
+        while ((count > 0) && (static_cast<size_t>(pass) >= iov->iov_len)) {
+            pass -= iov->iov_len;
+            ++iov;
+            --count;
+        }
+        if (count > 0) {
+            iov->iov_base = static_cast<char*>(iov->iov_base) + pass;
+            iov->iov_len -= pass;
+        }
+    }
+    return true;
+}
+
+class output {
+public:
+    virtual ~output()
+    {
+    }
+
+    // Returns a buffer of the given size for the next payload, or null if the
+    // caller should provide its own. Outputs that send asynchronously from
+    // the payload use this to avoid it being modified while still in use.
+    virtual char* buffer(size_t /*unused*/)
+    {
+        return 0;
+    }
+
+    // Sends one or more packets with the given payload, returning the number
+    // of payload bytes sent
+    virtual size_t send(const char* data, size_t size) = 0;
+
+    virtual void close() = 0;
+};
+
+// Original framing: one write for the length and one for the payload
+class packet_output : public output {
+public:
+    packet_output(int fd) :
+        _fd(fd)
+    {
+    }
+
+    size_t send(const char* data, size_t size)
+    {
+        write(_fd, &size, sizeof(size));
+        ssize_t pass = write(_fd, data, size);
+        if (pass < 0) {
+            return 0;
+        }
+        return pass;
+    }
+
+    void close()
+    {
+        ::close(_fd);
+    }
+
+private:
+    int _fd;
+};
+
+// Coalesces the length and payload into a single writev() per packet
+class vector_output : public output {
+public:
+    vector_output(int fd) :
+        _fd(fd)
+    {
+    }
+
+    size_t send(const char* data, size_t size)
+    {
+        struct iovec iov[2];
+        iov[0].iov_base = &size;
+        iov[0].iov_len = sizeof(size);
+        iov[1].iov_base = const_cast<char*>(data);
+        iov[1].iov_len = size;
+        if (!writev_all(_fd, iov, 2)) {
+            return 0;
+        }
+        return size;
+    }
+
+    void close()
+    {
+        ::close(_fd);
+    }
+
+private:
+    int _fd;
+};
+
+// Sends several packets per system call with sendmmsg(). On a stream socket
+// any message may be sent partially; it is completed with writev() so that
+// the framing is preserved, and the rest of the batch is dropped (every
+// packet is identical, so the next batch simply picks up from there).
+class batch_output : public output {
+public:
+    batch_output(int fd, size_t batch) :
+        _fd(fd),
+        _size(0),
+        _iov(batch * 2),
+        _messages(batch)
+    {
+        memset(&_messages[0], 0, sizeof(struct mmsghdr) * batch);
+    }
+
+    size_t send(const char* data, size_t size)
+    {
+        if ((size != _size) || (data != _iov[1].iov_base)) {
+            prepare(data, size);
+        }
+
+        int sent = sendmmsg(_fd, &_messages[0], _messages.size(), 0);
+        if (sent < 0) {
+            if (errno != EINTR) {
+                perror("sendmmsg");
+            }
+            return 0;
+        }
+
+        const size_t frame = sizeof(_size) + size;
+        size_t total = 0;
+        for (int ii = 0; ii < sent; ++ii) {
+            size_t pass = _messages[ii].msg_len;
+            if (pass < frame) {
+                if (!finish(data, size, pass)) {
+                    return total;
+                }
+                return total + size;
+            }
+            total += size;
+        }
+        return total;
+    }
+
+    void close()
+    {
+        ::close(_fd);
+    }
+
+private:
+    void prepare(const char* data, size_t size)
+    {
+        _size = size;
+        for (size_t ii = 0; ii < _messages.size(); ++ii) {
+            struct iovec* iov = &_iov[ii*2];
+            iov[0].iov_base = &_size;
+            iov[0].iov_len = sizeof(_size);
+            iov[1].iov_base = const_cast<char*>(data);
+            iov[1].iov_len = size;
+            _messages[ii].msg_hdr.msg_iov = iov;
+            _messages[ii].msg_hdr.msg_iovlen = 2;
+        }
+    }
+
+    bool finish(const char* data, size_t size, size_t sent)
+    {
+        struct iovec iov[2];
+        iov[0].iov_base = &_size;
+        iov[0].iov_len = sizeof(_size);
+        iov[1].iov_base = const_cast<char*>(data);
+        iov[1].iov_len = size;
+        int index = 0;
+        if (sent >= sizeof(_size)) {
+            sent -= sizeof(_size);
+            index = 1;
+        }
+        iov[index].iov_base = static_cast<char*>(iov[index].iov_base) + sent;
+        iov[index].iov_len -= sent;
+        return writev_all(_fd, &iov[index], 2 - index);
+    }
+
+    int _fd;
+    size_t _size;
+    std::vector<struct iovec> _iov;
+    std::vector<struct mmsghdr> _messages;
+};
+
+// Packet framing with payloads sent by MSG_ZEROCOPY. The kernel pins the
+// payload pages instead of copying them, posting a completion to the socket
+// error queue once each send is done with them. Until then the payload must
+// not change, so each packet is built in its own buffer from buffer(), which
+// is only reused once the completions for all of its sends have arrived. On
+// loopback the kernel still copies the data, but later, so this mainly
+// measures the notification cost.
+class zerocopy_output : public output {
+public:
+    zerocopy_output(int fd) :
+        _fd(fd),
+        _next_id(0),
+        _completed(0),
+        _current(0)
+    {
+    }
+
+    ~zerocopy_output()
+    {
+        delete _current;
+        for (size_t index = 0; index < _free.size(); ++index) {
+            delete _free[index];
+        }
+        for (size_t index = 0; index < _pending.size(); ++index) {
+            delete _pending[index].first;
+        }
+    }
+
+    char* buffer(size_t size)
+    {
+        if (!_current) {
+            drain_completions();
+            while (_free.empty() && (_pending.size() >= MAX_PENDING)) {
+                if (!wait_completions()) {
+                    break;
+                }
+            }
+            if (_free.empty()) {
+                _current = new std::vector<char>();
+            } else {
+                _current = _free.back();
+                _free.pop_back();
+            }
+        }
+        _current->resize(size);
+        return &(*_current)[0];
+    }
+
+    size_t send(const char* data, size_t size)
+    {
+        write(_fd, &size, sizeof(size));
+        size_t sent = 0;
+        bool zerocopy = false;
+        while (sent < size) {
+            ssize_t pass = ::send(_fd, data + sent, size - sent, MSG_ZEROCOPY);
+            if (pass < 0) {
+                // Out of option memory for pinned pages; wait for some of
+                // the outstanding sends to complete
+                if ((errno == ENOBUFS) && wait_completions()) {
+                    continue;
+                }
+                if (errno != EINTR) {
+                    perror("send");
+                }
+                break;
+            }
+            // Every successful zero-copy send is assigned the next
+            // notification ID, starting from zero
+            ++_next_id;
+            zerocopy = true;
+            sent += pass;
+        }
+        release(zerocopy);
+        drain_completions();
+        return sent;
+    }
+
+    void close()
+    {
+        ::close(_fd);
+    }
+
+private:
+    // Buffers in flight before waiting for completions instead of allocating
+    // another one
+    static const size_t MAX_PENDING = 64;
+
+    typedef std::pair<std::vector<char>*, uint32_t> pending_buffer;
+
+    void release(bool zerocopy)
+    {
+        // The buffer stays pending until the notification for the last send
+        // from it arrives
+        if (_current) {
+            if (zerocopy) {
+                _pending.push_back(pending_buffer(_current, _next_id));
+            } else {
+                _free.push_back(_current);
+            }
+            _current = 0;
+        }
+    }
+
+    bool wait_completions()
+    {
+        struct pollfd pfd;
+        pfd.fd = _fd;
+        pfd.events = 0;
+        if (poll(&pfd, 1, -1) < 0) {
+            return false;
+        }
+        return drain_completions();
+    }
+
+    // Reads all available completions, returning true if any arrived
+    bool drain_completions()
+    {
+        bool received = false;
+        char control[128];
+        struct msghdr msg;
+        memset(&msg, 0, sizeof(msg));
+        while (true) {
+            msg.msg_control = control;
+            msg.msg_controllen = sizeof(control);
+            if (recvmsg(_fd, &msg, MSG_ERRQUEUE|MSG_DONTWAIT) < 0) {
+                break;
+            }
+            for (struct cmsghdr* cmsg = CMSG_FIRSTHDR(&msg); cmsg; cmsg = CMSG_NXTHDR(&msg, cmsg)) {
+                const struct sock_extended_err* err = reinterpret_cast<struct sock_extended_err*>(CMSG_DATA(cmsg));
+                if (err->ee_origin != SO_EE_ORIGIN_ZEROCOPY) {
+                    continue;
+                }
+                // Each completion covers an inclusive range of IDs; TCP
+                // completes sends in order, so everything up to the end of
+                // the range is done
+                uint32_t end = err->ee_data + 1;
+                if ((int32_t)(end - _completed) > 0) {
+                    _completed = end;
+                }
+                received = true;
+            }
+        }
+
+        while (!_pending.empty() && ((int32_t)(_completed - _pending.front().second) >= 0)) {
+            _free.push_back(_pending.front().first);
+            _pending.pop_front();
+        }
+        return received;
+    }
+
+    int _fd;
+    uint32_t _next_id;
+    uint32_t _completed;
+    std::vector<char>* _current;
+    std::vector<std::vector<char>*> _free;
+    std::deque<pending_buffer> _pending;
+};
+
+class ring_output : public output {
+public:
+    ring_output(ring* buffer, const std::string& name) :
+        _buffer(buffer),
+        _name(name)
+    {
+    }
+
+    size_t send(const char* data, size_t size)
+    {
+        if (ring_write(_buffer, &size, sizeof(size), &running) < sizeof(size)) {
+            return 0;
+        }
+        return ring_write(_buffer, data, size, &running);
+    }
+
+    void close()
+    {
+        // Mark the ring closed so the reader knows no more data is coming.
+        // The reader unlinks the name once it has mapped the ring; unlink it
+        // here too in case the reader never attached.
+        ring_shutdown(_buffer);
+        close_ring(_buffer);
+        shm_unlink(_name.c_str());
+    }
+
+private:
+    ring* _buffer;
+    std::string _name;
+};
+
+int listen_unix()
+{
+    int sockfd = socket(AF_UNIX, SOCK_STREAM, 0);
+    if (sockfd < 0) {
+        perror("socket");
+        return -1;
+    }
+
+    struct sockaddr_un server;
+    server.sun_family = AF_UNIX;
+    snprintf(server.sun_path, sizeof(server.sun_path), "@writer-%d", getpid());
+    socklen_t len = strlen(server.sun_path) + sizeof(server.sun_family);
+    std::string address = server.sun_path;
+    server.sun_path[0] = '\0';
+    bind(sockfd, (struct sockaddr*)&server, len);
+
+    // Only publish the address once connections can be accepted
+    listen(sockfd, 1);
+    std::cout << address << std::endl;
+    return sockfd;
+}
+
+int listen_tcp()
+{
+    int sockfd = socket(AF_INET, SOCK_STREAM, 0);
+    if (sockfd < 0) {
+        perror("socket");
+        return -1;
+    }
+
+    struct sockaddr_in server;
+    memset(&server, 0, sizeof(sockaddr_in));
+    server.sin_family = AF_INET;
+    server.sin_port = 0;
+    server.sin_addr.s_addr = htonl(INADDR_LOOPBACK);
+    if (bind(sockfd, (struct sockaddr*)&server, sizeof(server)) < 0) {
+        perror("bind");
+        return -1;
+    }
+
+    socklen_t len = sizeof(server);
+    if (getsockname(sockfd, (struct sockaddr*)&server, &len) < 0) {
+        perror("getsockname");
+        return -1;
+    }
+
+    listen(sockfd, 1);
+    std::cout << inet_ntoa(server.sin_addr) << ":" << server.sin_port << std::endl;
+    return sockfd;
+}
+
+ring* create_shm(std::string& name)
+{
+    char buf[64];
+    snprintf(buf, sizeof(buf), "/writer-%d", getpid());
+    name = buf;
+    ring* buffer = create_ring(name, RING_CAPACITY);
+    if (buffer) {
+        std::cout << name << std::endl;
+    }
+    return buffer;
+}
+
+// Sends packets of typed samples until interrupted. The transfer size is in
+// bytes, rounded down to a whole number of samples. If the control block has a
+// target rate, packets are paced to that rate.
+template <class T>
+void write_samples(control* state, output* out, bool timestamps)
 {
-    if (argc < 3) {
+    std::vector<T> buffer;
+    token_bucket pacer;
+    while (running) {
+        size_t buffer_size = state->transfer_size / sizeof(T);
+        const size_t bytes = buffer_size * sizeof(T);
+        char* data = out->buffer(bytes);
+        if (!data) {
+            if (buffer_size != buffer.size()) {
+                buffer.resize(buffer_size);
+            }
+            data = reinterpret_cast<char*>(&buffer[0]);
+        }
+        if (timestamps) {
+            // With batch framing every packet in a batch carries the same
+            // timestamp
+            stamp_payload(data, bytes);
+        }
+        // Pace by what was actually sent, which covers every packet in a
+        // batch
+        size_t sent = out->send(data, bytes);
+        if (sent == 0) {
+            // The reader has gone away, or the send was interrupted
+            break;
+        }
+        state->total_bytes += sent;
+        pacer.set_rate(state->target_rate);
+        pacer.consume(sent);
+    }
+}
+
+int main(int argc, char* argv[])
+{
+    std::string framing = "packet";
+    std::string format = "octet";
+    size_t batch = 16;
+    bool timestamps = false;
+    socket_options options;
+
+    int opt;
+    while ((opt = getopt(argc, argv, "f:b:F:lo:")) != -1) {
+        switch (opt) {
+        case 'f':
+            framing = optarg;
+            break;
+        case 'b':
+            batch = atoi(optarg);
+            break;
+        case 'F':
+            format = optarg;
+            break;
+        case 'l':
+            timestamps = true;
+            break;
+        case 'o':
+            if (!parse_socket_option(options, optarg)) {
+                std::cerr << "Invalid socket option '" << optarg << "'" << std::endl;
+                exit(1);
+            }
+            break;
+        default:
+            exit(1);
+        }
+    }
+
+    if ((argc - optind) < 2) {
+        exit(1);
+    }
+
+    if ((format != "octet") && (format != "short") && (format != "float")) {
+        std::cerr << "Unknown format '" << format << "'" << std::endl;
         exit(1);
     }
 
@@ -51,76 +585,78 @@ int main(int argc, const char* argv[])
     sigemptyset(&sa.sa_mask);
     sigaction(SIGINT, &sa, NULL);
 
-    int sockfd;
-    if (strcmp(argv[1], "unix") == 0) {
-        sockfd = socket(AF_UNIX, SOCK_STREAM, 0);
+    const std::string protocol = argv[optind];
+    int sockfd = -1;
+    ring* shm = 0;
+    std::string shm_name;
+    if (protocol == "unix") {
+        sockfd = listen_unix();
         if (sockfd < 0) {
-            perror("socket");
             exit(1);
         }
-
-        struct sockaddr_un server;
-        server.sun_family = AF_UNIX;
-        snprintf(server.sun_path, sizeof(server.sun_path), "@writer-%d", getpid());
-        socklen_t len = strlen(server.sun_path) + sizeof(server.sun_family);
-        std::cout << server.sun_path << std::endl;
-        server.sun_path[0] = '\0';
-        bind(sockfd, (struct sockaddr*)&server, len);
-    } else if (strcmp(argv[1], "tcp") == 0) {
-        sockfd = socket(AF_INET, SOCK_STREAM, 0);
+    } else if (protocol == "tcp") {
+        sockfd = listen_tcp();
         if (sockfd < 0) {
-            perror("socket");
             exit(1);
         }
-
-        struct sockaddr_in server;
-        memset(&server, 0, sizeof(sockaddr_in));
-        server.sin_family = AF_INET;
-        server.sin_port = 0;
-        server.sin_addr.s_addr = htonl(INADDR_LOOPBACK);
-        if (bind(sockfd, (struct sockaddr*)&server, sizeof(server)) < 0) {
-            perror("bind");
+    } else if (protocol == "shm") {
+        shm = create_shm(shm_name);
+        if (!shm) {
             exit(1);
         }
-
-        socklen_t len = sizeof(server);
-        if (getsockname(sockfd, (struct sockaddr*)&server, &len) < 0) {
-            perror("getsockname");
-            exit(1);
-        }
-
-        std::cout << inet_ntoa(server.sin_addr) << ":" << server.sin_port << std::endl;
     } else {
-        std::cerr << "Unknown protocol '" << argv[1] << "'" << std::endl;
+        std::cerr << "Unknown protocol '" << protocol << "'" << std::endl;
         exit(1);
     }
 
-    listen(sockfd, 1);
+    control* state = open_control(argv[optind+1]);
 
-    control* state = open_control(argv[2]);
+    // Framing only applies to sockets; the shared memory ring has no system
+    // call overhead to amortize
+    output* out;
+    if (shm) {
+        out = new ring_output(shm, shm_name);
+    } else {
+        int fd = accept(sockfd, NULL, NULL);
+        if (fd < 0) {
+            exit(1);
+        }
+        if (!apply_socket_options(fd, options, protocol == "tcp")) {
+            exit(1);
+        }
 
-    int fd = accept(sockfd, NULL, NULL);
-    if (fd < 0) {
-        exit(1);
+        if (options.zerocopy && (protocol == "tcp")) {
+            if (framing != "packet") {
+                std::cerr << "Zero-copy sends require packet framing" << std::endl;
+                exit(1);
+            }
+            out = new zerocopy_output(fd);
+        } else if (framing == "packet") {
+            out = new packet_output(fd);
+        } else if (framing == "vector") {
+            out = new vector_output(fd);
+        } else if (framing == "batch") {
+            out = new batch_output(fd, batch);
+        } else {
+            std::cerr << "Unknown framing '" << framing << "'" << std::endl;
+            exit(1);
+        }
     }
 
-    std::vector<char> buffer;
-
     char temp;
     std::cin.get(temp);
 
-    while (running) {
-        size_t buffer_size = state->transfer_size;
-        if (buffer_size != buffer.size()) {
-            buffer.resize(buffer_size);
-        }
-        write(fd, &buffer_size, sizeof(buffer_size));
-        ssize_t pass = write(fd, &buffer[0], buffer.size());
-        state->total_bytes += pass;
+    if (format == "short") {
+        write_samples<int16_t>(state, out, timestamps);
+    } else if (format == "float") {
+        write_samples<float>(state, out, timestamps);
+    } else {
+        write_samples<uint8_t>(state, out, timestamps);
     }
 
-    // Close the socket so the reader knows no more data is coming
-    close(fd);
+    // Close the connection so the reader knows no more data is coming
+    out->close();
+    delete out;
 
     close_control(state);
 
@@ -0,0 +1,96 @@
+#
+# This file is protected by Copyright. Please refer to the COPYRIGHT file
+# distributed with this source distribution.
+#
+# This file is part of REDHAWK throughput.
+#
+# REDHAWK throughput is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# REDHAWK throughput is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+#
+import os
+import mmap
+import tempfile
+
+import numpy
+
+__all__ = ('Timeline', 'analyze')
+
+# Must match the layout in common/timeline.h
+HEADER_SIZE = 16
+ENTRY_DTYPE = numpy.dtype([('time', numpy.uint64), ('bytes', numpy.uint64)])
+
+class Timeline(object):
+    """
+    Ring of (time, cumulative bytes) samples recorded by a stream's reader
+    process every millisecond, through a shared file. read() returns the
+    samples recorded since the last call.
+    """
+    def __init__(self, capacity=65536):
+        size = HEADER_SIZE + capacity * ENTRY_DTYPE.itemsize
+        fd, self.filename = tempfile.mkstemp()
+        os.ftruncate(fd, size)
+        self.buf = mmap.mmap(fd, size, mmap.MAP_SHARED, mmap.PROT_READ|mmap.PROT_WRITE)
+        os.close(fd)
+        self.header = numpy.frombuffer(self.buf, dtype=numpy.uint64, count=2)
+        self.header[1] = capacity
+        self.entries = numpy.frombuffer(self.buf, dtype=ENTRY_DTYPE, offset=HEADER_SIZE)
+        self.capacity = capacity
+        self.last = 0
+
+    def read(self):
+        count = int(self.header[0])
+        # If the reader has lapped us, the oldest samples are lost; leave a
+        # margin for an entry that may be being overwritten as we copy
+        first = max(self.last, count - self.capacity + 1)
+        self.last = count
+        indices = numpy.arange(first, count) % self.capacity
+        return self.entries[indices]
+
+    def __del__(self):
+        os.unlink(self.filename)
+
+
+def analyze(entries, stall_time=0.01, stall_factor=10.0):
+    """
+    Summarizes a series of timeline samples: the distribution of the rate
+    between samples, the jitter in the sampling interval, and stalls, where no
+    bytes arrived for longer than the greater of stall_time seconds and
+    stall_factor times the median time between arrivals (large packets
+    naturally arrive far apart).
+    """
+    stats = {'timeline_samples': len(entries)}
+    if len(entries) < 2:
+        return stats
+
+    times = entries['time'].astype(float) * 1e-9
+    totals = entries['bytes'].astype(float)
+    intervals = numpy.diff(times)
+    rates = numpy.diff(totals) / intervals
+    stats['rate_p1'], stats['rate_p50'], stats['rate_p99'] = numpy.percentile(rates, [1.0, 50.0, 99.0])
+    stats['interval_jitter'] = intervals.std()
+    stats['interval_max'] = intervals.max()
+
+    # Time between successive samples in which the byte count advanced
+    arrivals = times[1:][numpy.diff(totals) > 0]
+    if len(arrivals) < 2:
+        stats['longest_gap'] = times[-1] - times[0]
+        stats['stall_count'] = 1
+        stats['stall_total'] = stats['longest_gap']
+        return stats
+    gaps = numpy.diff(arrivals)
+    threshold = max(stall_time, stall_factor * numpy.median(gaps))
+    stalls = gaps[gaps > threshold]
+    stats['longest_gap'] = gaps.max()
+    stats['stall_count'] = len(stalls)
+    stats['stall_total'] = stalls.sum()
+    return stats
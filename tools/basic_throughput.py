@@ -29,15 +29,21 @@ if __name__ == '__main__':
     transfer_size = 1024
     interface = 'raw'
     transport = 'unix'
+    framing = 'packet'
+    batch = 16
+    allocator = 'new'
     time_period = 10.0
     numa_distance = None
     data_format = 'octet'
     count = 1
+    launch_workers = None
 
-    opts, args = getopt.getopt(sys.argv[1:], 'n:s:t:', ['transport=', 'interface=', 'numa-distance=', 'format='])
+    opts, args = getopt.getopt(sys.argv[1:], 'n:s:t:j:', ['transport=', 'interface=', 'numa-distance=', 'format=', 'framing=', 'batch=', 'allocator='])
     for key, value in opts:
         if key == '-n':
             count = int(value)
+        elif key == '-j':
+            launch_workers = int(value)
         elif key == '-s':
             transfer_size = utils.from_binary(value)
         elif key == '-t':
@@ -50,11 +56,17 @@ if __name__ == '__main__':
             interface = value
         elif key == '--format':
             data_format = value
+        elif key == '--framing':
+            framing = value
+        elif key == '--batch':
+            batch = int(value)
+        elif key == '--allocator':
+            allocator = value
 
     numa_policy = numa.NumaPolicy(numa_distance)
 
     if interface == 'raw':
-        factory = raw.factory(transport)
+        factory = raw.factory(transport, framing, batch, allocator)
     elif interface == 'corba':
         factory = corba.factory(transport)
     elif interface == 'bulkio':
@@ -62,7 +74,8 @@ if __name__ == '__main__':
     else:
         raise SystemExit('No interface '+interface)
 
-    streams = AggregateStream(factory, data_format, numa_policy, count)
+    streams = AggregateStream(factory, data_format, numa_policy, count, launch_workers)
+    print 'Setup:', streams.setup_time, 'sec'
     streams.transfer_size(transfer_size)
 
     start = time.time()
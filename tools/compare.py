@@ -0,0 +1,198 @@
+#!/usr/bin/python
+#
+# This file is protected by Copyright. Please refer to the COPYRIGHT file
+# distributed with this source distribution.
+#
+# This file is part of REDHAWK throughput.
+#
+# REDHAWK throughput is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# REDHAWK throughput is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+
+import sys
+import time
+import json
+import getopt
+
+from benchmark import utils
+from benchmark.results import ResultsDatabase
+from benchmark.stats import is_significant
+
+usage = """Usage: %s [options] [baseline [candidate]]
+Compares a candidate run against a baseline run, flagging statistically
+significant (95%% confidence) throughput and CPU cost regressions for each
+interface and transfer size. Runs may be given by id or label; by default, the
+candidate is the most recent run. Runs recorded with a different configuration
+(host, transport, formats, framing, etc.) are not compared unless forced.
+Options:
+\t-f <file>\t\tResults database [results.db]
+\t-l, --list\t\tList the stored runs
+\t--force\t\t\tCompare runs even if their configurations differ
+\t--threshold=<n>\t\tIgnore changes smaller than this fraction of the
+\t\t\t\tbaseline [0.02]
+\t--all\t\t\tShow every comparison, not only the changes""" % sys.argv[0]
+
+def _rate(sample):
+    return sample['rate']
+
+def _cpu_cost(key):
+    # CPU usage normalized by throughput, so that a faster run is not flagged
+    # for using more CPU
+    def cost(sample):
+        gbps = sample['rate'] / (1024**3)
+        if gbps <= 0.0:
+            return None
+        return sample[key] / gbps
+    return cost
+
+# Each metric is computed per sample; the flag indicates whether larger values
+# are better
+METRICS = (
+    ('rate(GBps)', _rate, True),
+    ('write cpu(%/GBps)', _cpu_cost('write_cpu'), False),
+    ('read cpu(%/GBps)', _cpu_cost('read_cpu'), False),
+)
+
+# Run metadata and recorded options that must match for two runs to be
+# comparable; the kernel is deliberately left out, since comparing kernels is
+# a common reason to compare runs
+RUN_FIELDS = ('host', 'machine', 'numa_nodes', 'numa_distance', 'transport')
+OPTION_FIELDS = ('test', 'formats', 'framing', 'batch', 'allocator', 'corba_push')
+
+def config_differences(baseline, candidate):
+    differences = []
+    for field in RUN_FIELDS:
+        if baseline[field] != candidate[field]:
+            differences.append((field, baseline[field], candidate[field]))
+    baseline_options = json.loads(baseline['options'])
+    candidate_options = json.loads(candidate['options'])
+    for field in OPTION_FIELDS:
+        if baseline_options.get(field) != candidate_options.get(field):
+            differences.append((field, baseline_options.get(field), candidate_options.get(field)))
+    return differences
+
+def describe_run(run):
+    started = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(run['started']))
+    label = run['label'] or '-'
+    return 'run %d [%s] %s %s %s kernel %s, %d NUMA node(s), distance %s, transport %s' % (
+        run['id'], label, started, run['host'], run['machine'], run['kernel'],
+        run['numa_nodes'], run['numa_distance'], run['transport'])
+
+def format_value(name, value):
+    if name.startswith('rate'):
+        return utils.to_gbps(value)
+    return '%.2f' % value
+
+def compare(database, baseline, candidate, threshold, show_all):
+    baseline_passes = database.passes(baseline['id'])
+    candidate_passes = database.passes(candidate['id'])
+
+    print '%-16s %8s %-18s %10s %10s %8s' % ('interface', 'size', 'metric', 'baseline', 'candidate', 'change')
+    regressions = 0
+    for key in sorted(set(baseline_passes) & set(candidate_passes)):
+        interface, size = key
+        before = database.samples(baseline_passes[key]['id'])
+        after = database.samples(candidate_passes[key]['id'])
+        # A pass whose transfer size was never acknowledged may mix sizes
+        unsettled = not (baseline_passes[key]['settled'] and candidate_passes[key]['settled'])
+        for name, metric, higher_is_better in METRICS:
+            a = [value for value in (metric(sample) for sample in before) if value is not None]
+            b = [value for value in (metric(sample) for sample in after) if value is not None]
+            if not a or not b:
+                continue
+            mean_a = sum(a) / len(a)
+            mean_b = sum(b) / len(b)
+            if mean_a == 0.0:
+                continue
+            change = (mean_b - mean_a) / mean_a
+
+            status = ''
+            if abs(change) >= threshold and is_significant(a, b):
+                if (change > 0.0) == higher_is_better:
+                    status = 'improved'
+                else:
+                    status = 'REGRESSION'
+                    regressions += 1
+            elif not show_all:
+                continue
+            if unsettled:
+                status += ' (unsettled)'
+            print '%-16s %8s %-18s %10s %10s %+7.1f%% %s' % (interface, utils.to_binary(size), name,
+                                                            format_value(name, mean_a),
+                                                            format_value(name, mean_b),
+                                                            change * 100.0, status)
+
+    missing = set(baseline_passes) - set(candidate_passes)
+    if missing:
+        print 'Not measured in candidate:', ', '.join('%s %s' % (interface, utils.to_binary(size))
+                                                     for interface, size in sorted(missing))
+    return regressions
+
+
+if __name__ == '__main__':
+    filename = 'results.db'
+    list_runs = False
+    threshold = 0.02
+    show_all = False
+    force = False
+
+    opts, args = getopt.getopt(sys.argv[1:], 'hf:l', ['help', 'list', 'threshold=', 'all', 'force'])
+    for key, value in opts:
+        if key in ('-h', '--help'):
+            raise SystemExit(usage)
+        elif key == '-f':
+            filename = value
+        elif key in ('-l', '--list'):
+            list_runs = True
+        elif key == '--threshold':
+            threshold = float(value)
+        elif key == '--all':
+            show_all = True
+        elif key == '--force':
+            force = True
+
+    database = ResultsDatabase(filename)
+
+    if list_runs:
+        for run in database.runs():
+            print describe_run(run)
+            options = json.loads(run['options'])
+            if options:
+                print '    ' + ', '.join('%s=%s' % item for item in sorted(options.iteritems()))
+        raise SystemExit(0)
+
+    if not args:
+        raise SystemExit(usage)
+
+    baseline = database.find_run(args[0])
+    if baseline is None:
+        raise SystemExit("No run '%s'" % args[0])
+    if len(args) > 1:
+        candidate = database.find_run(args[1])
+        if candidate is None:
+            raise SystemExit("No run '%s'" % args[1])
+    else:
+        candidate = database.find_run()
+
+    print 'Baseline: ', describe_run(baseline)
+    print 'Candidate:', describe_run(candidate)
+
+    differences = config_differences(baseline, candidate)
+    for field, before, after in differences:
+        print 'WARNING: %s differs: %s vs. %s' % (field, before, after)
+    if differences and not force:
+        raise SystemExit('Runs have different configurations; use --force to compare anyway')
+
+    regressions = compare(database, baseline, candidate, threshold, show_all)
+    if regressions:
+        print '%d regression(s)' % regressions
+        sys.exit(1)
@@ -0,0 +1,333 @@
+#!/usr/bin/python
+#
+# This file is protected by Copyright. Please refer to the COPYRIGHT file
+# distributed with this source distribution.
+#
+# This file is part of REDHAWK throughput.
+#
+# REDHAWK throughput is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# REDHAWK throughput is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+
+import sys
+import time
+import getopt
+import multiprocessing
+
+from streams import raw, corba, bulkio, latency
+from benchmark import utils, numa
+from benchmark.stats import Averager
+from benchmark.procinfo import CpuInfo, ProcessSampler
+from benchmark.tests import TestMonitor, BenchmarkTest
+from benchmark.sampling import RateSampler
+
+usage = """Usage: %s [options]
+Measures CPU usage, page faults and delivered rate with the writer paced to
+a series of offered loads, after first measuring the saturation rate. A load
+is sustainable if the delivered rate keeps up with the offered rate; the
+maximum sustainable rate is then refined by bisection.
+Options:
+\t-s <size>\t\tTransfer size [1M]
+\t-t <time>\t\tTime between samples, in seconds [0.25]
+\t-w <num>\t\tMinimum number of samples per measurement [5]
+\t-m <num>\t\tMaximum number of samples per measurement [10x minimum]
+\t-d <fraction>\t\tStop when the 95%% confidence interval of the mean is
+\t\t\t\twithin this fraction of the mean [0.05]
+\t--rate=<rates>\t\tComma-separated offered loads in bytes per second,
+\t\t\t\twith optional binary suffixes (e.g., 400M)
+\t--load=<fractions>\tComma-separated offered loads as fractions of the
+\t\t\t\tsaturation rate [0.25,0.5,0.75,0.9,1.0 if no rates]
+\t--shortfall=<fraction>\tLargest fraction of the offered load that may go
+\t\t\t\tundelivered for the load to be sustainable [0.02]
+\t--search-tolerance=<n>\tResolution of the maximum sustainable rate search,
+\t\t\t\tas a fraction of the rate [0.02]
+\t--no-search\t\tDo not search for the maximum sustainable rate
+\t--settle=<time>\t\tTime to discard after each change in the offered
+\t\t\t\tload, in seconds [0.5]
+\t--latency\t\tMeasure one-way packet latency
+\t--interface=<name>\tInterface to measure ["raw", "corba", "bulkio"];
+\t\t\t\tmay be given more than once [all]
+\t--transport=<type>\tTransport type ["unix" (default), "tcp", "shm"]
+\t--format=<format>\tData format ["octet" (default), "short", "float"]
+\t--numa-distance=<n>\tNumber of NUMA hops between components, if
+\t\t\t\tsupported""" % sys.argv[0]
+
+class OfferedLoadDisplay(TestMonitor):
+    def test_started(self, name, measure_latency=False, **kw):
+        self.measure_latency = measure_latency
+        self.saturation = None
+        print 'Measuring', name
+        line = '%12s %6s %12s %10s %10s %10s %10s %10s' % ('offered', 'load', 'rate(GBps)', 'ci(GBps)',
+                                                           'write cpu', 'read cpu', 'majflt/s', 'minflt/s')
+        if self.measure_latency:
+            line += ' %10s %10s' % ('p50(us)', 'p99(us)')
+        print line
+
+    def pass_started(self, offered, **kw):
+        if offered:
+            sys.stdout.write('%12s' % utils.to_gbps(offered))
+        else:
+            sys.stdout.write('%12s' % 'max')
+        sys.stdout.flush()
+
+    def pass_complete(self, offered, rate, rate_ci, write_cpu, read_cpu, majflt, minflt, sustainable, **kw):
+        if not offered:
+            self.saturation = rate
+            load = '%6s' % '-'
+        elif self.saturation:
+            load = '%5.0f%%' % (offered * 100.0 / self.saturation)
+        else:
+            load = '%6s' % 'n/a'
+        line = ' %s %12s %10s %9.1f%% %9.1f%% %10.1f %10.1f' % (load, utils.to_gbps(rate), utils.to_gbps(rate_ci),
+                                                              write_cpu, read_cpu, majflt, minflt)
+        if self.measure_latency:
+            line += ' %10s %10s' % (utils.to_usec(kw['latency_p50']), utils.to_usec(kw['latency_p99']))
+        if not sustainable:
+            line += ' BACKLOG'
+        print line
+
+    def test_complete(self, max_sustainable=None, **kw):
+        if max_sustainable is None:
+            print 'No sustainable load found'
+        else:
+            print 'Maximum sustainable rate: %s GBps' % utils.to_gbps(max_sustainable)
+
+
+class OfferedLoadTest(BenchmarkTest):
+    def __init__(self, transfer_size, poll_time, window_size, tolerance, max_samples=None, shortfall=0.02,
+                 search_tolerance=None, settle_time=0.5):
+        BenchmarkTest.__init__(self)
+        self.transfer_size = transfer_size
+        self.poll_time = poll_time
+        self.window_size = window_size
+        self.tolerance = tolerance
+        self.max_samples = max_samples
+        self.shortfall = shortfall
+        self.search_tolerance = search_tolerance
+        self.settle_time = settle_time
+        self.num_cpus = multiprocessing.cpu_count()
+
+    def run(self, name, stream, rates, fractions, measure_latency=False):
+        self.stream = stream
+        self.window = Averager(self.window_size, self.max_samples)
+        self.process_stats = ProcessSampler([stream.get_reader(), stream.get_writer()])
+        self.cpu_info = CpuInfo()
+
+        self.test_started(name=name, measure_latency=measure_latency)
+
+        stream.transfer_size(self.transfer_size)
+        stream.start()
+
+        self.sampler = RateSampler(stream.received, self.poll_time, self.idle_tasks)
+
+        # Unpaced first, to find the saturation rate that fractional loads
+        # are relative to
+        saturation = self.measure(0)
+        offered = sorted(set(rates + [fraction * saturation for fraction in fractions]))
+
+        results = {}
+        for load in offered:
+            results[load] = self.is_sustainable(load, self.measure(load))
+
+        max_sustainable = None
+        sustained = [load for load in offered if results[load]]
+        if sustained:
+            max_sustainable = max(sustained)
+        if self.search_tolerance is not None and offered:
+            max_sustainable = self.search(max_sustainable, offered, results, saturation)
+
+        stream.stop()
+        self.process_stats.close()
+
+        self.test_complete(max_sustainable=max_sustainable)
+
+    def search(self, lower, offered, results, saturation):
+        # Bisect between the highest sustainable load and the lowest load
+        # above it that was not sustainable (or the saturation rate, if every
+        # load was sustainable)
+        failed = [load for load in offered if not results[load] and (lower is None or load > lower)]
+        if failed:
+            upper = min(failed)
+        else:
+            upper = saturation
+        if lower is None:
+            lower = 0.0
+        while (upper - lower) > (self.search_tolerance * upper):
+            load = (lower + upper) / 2.0
+            if self.is_sustainable(load, self.measure(load)):
+                lower = load
+            else:
+                upper = load
+        if lower > 0.0:
+            return lower
+        return None
+
+    def is_sustainable(self, offered, rate):
+        # The writer is throttled by the reader, so a load that cannot be
+        # sustained shows up as a shortfall in the delivered rate
+        return rate >= offered * (1.0 - self.shortfall)
+
+    def settle(self):
+        # The pacer's token balance and whatever is already queued between the
+        # writer and reader take a while to adjust to a new offered load;
+        # discard that period, so that no sample mixes the two rates
+        deadline = time.time() + self.settle_time
+        while time.time() < deadline:
+            self.idle_tasks()
+            time.sleep(0.01)
+
+        # Restart the byte count and CPU accounting from here
+        self.sampler.restart()
+        self.process_stats.poll()
+        self.cpu_info.poll()
+
+    def measure(self, offered):
+        stream = self.stream
+        window = self.window
+
+        self.pass_started(offered=offered)
+
+        stream.target_rate(offered)
+        self.settle()
+
+        window.reset()
+        write_cpu = []
+        read_cpu = []
+        majflt = 0
+        minflt = 0
+        start = self.sampler.last_time
+        pass_latency = stream.latency()
+
+        while not window.is_stable(self.tolerance):
+            now, elapsed, rate = self.sampler.sample()
+            window.add_sample(rate)
+
+            reader, writer = self.process_stats.poll()
+            system = self.cpu_info.poll()
+            sys_cpu = self.num_cpus * 100.0 / sum(system.values())
+            write_cpu.append(writer['cpu'] * sys_cpu)
+            read_cpu.append(reader['cpu'] * sys_cpu)
+            majflt += reader['majflt'] + writer['majflt']
+            minflt += reader['minflt'] + writer['minflt']
+
+            self.sample_added(time=now-start, offered=offered, rate=rate)
+
+        duration = self.sampler.last_time - start
+        stats = {}
+        if pass_latency is not None:
+            counts = stream.latency() - pass_latency
+            stats['latency_p50'] = latency.percentile(counts, 50.0)
+            stats['latency_p99'] = latency.percentile(counts, 99.0)
+
+        self.pass_complete(offered=offered,
+                           rate=window.mean(),
+                           rate_ci=window.confidence(),
+                           rate_min=window.minimum(),
+                           rate_max=window.maximum(),
+                           write_cpu=sum(write_cpu) / len(write_cpu),
+                           read_cpu=sum(read_cpu) / len(read_cpu),
+                           majflt=majflt / duration,
+                           minflt=minflt / duration,
+                           sustainable=self.is_sustainable(offered, window.mean()),
+                           **stats)
+
+        return window.mean()
+
+
+if __name__ == '__main__':
+    transfer_size = 1024*1024
+    poll_time = 0.25
+    window_size = 5
+    tolerance = 0.05
+    max_samples = None
+    rates = []
+    fractions = []
+    shortfall = 0.02
+    search_tolerance = 0.02
+    settle_time = 0.5
+    measure_latency = False
+    interfaces = []
+    transport = 'unix'
+    data_format = 'octet'
+    numa_distance = None
+
+    opts, args = getopt.getopt(sys.argv[1:], 'hs:t:w:m:d:', ['help', 'rate=', 'load=', 'shortfall=',
+                                                             'search-tolerance=', 'no-search', 'settle=', 'latency',
+                                                             'interface=', 'transport=', 'format=',
+                                                             'numa-distance='])
+    for key, value in opts:
+        if key in ('-h', '--help'):
+            raise SystemExit(usage)
+        elif key == '-s':
+            transfer_size = utils.from_binary(value)
+        elif key == '-t':
+            poll_time = float(value)
+        elif key == '-w':
+            window_size = int(value)
+        elif key == '-m':
+            max_samples = int(value)
+        elif key == '-d':
+            tolerance = float(value)
+        elif key == '--rate':
+            rates += [float(utils.from_binary(rate)) for rate in value.split(',')]
+        elif key == '--load':
+            fractions += [float(fraction) for fraction in value.split(',')]
+        elif key == '--shortfall':
+            shortfall = float(value)
+        elif key == '--search-tolerance':
+            search_tolerance = float(value)
+        elif key == '--no-search':
+            search_tolerance = None
+        elif key == '--settle':
+            settle_time = float(value)
+        elif key == '--latency':
+            measure_latency = True
+        elif key == '--interface':
+            interfaces.append(value)
+        elif key == '--transport':
+            transport = value
+        elif key == '--format':
+            data_format = value
+        elif key == '--numa-distance':
+            numa_distance = int(value)
+
+    if not rates and not fractions:
+        fractions = [0.25, 0.5, 0.75, 0.9, 1.0]
+    if not interfaces:
+        interfaces = ['raw', 'corba', 'bulkio']
+
+    # The ORB has no shared memory transport
+    if transport == 'shm':
+        orb_transport = 'unix'
+    else:
+        orb_transport = transport
+
+    test = OfferedLoadTest(transfer_size, poll_time, window_size, tolerance, max_samples, shortfall, search_tolerance,
+                           settle_time)
+    test.add_monitor(OfferedLoadDisplay())
+
+    for interface in interfaces:
+        if interface == 'raw':
+            factory = raw.factory(transport, latency=measure_latency)
+        elif interface == 'corba':
+            factory = corba.factory(orb_transport, measure_latency)
+        elif interface == 'bulkio':
+            factory = bulkio.factory(orb_transport, measure_latency)
+        else:
+            raise SystemExit('No interface '+interface)
+
+        numa_policy = numa.NumaPolicy(numa_distance)
+        stream = factory.create(data_format, numa_policy.next())
+        try:
+            test.execute(interface, stream, rates, fractions, measure_latency)
+        finally:
+            stream.terminate()
@@ -0,0 +1,253 @@
+#!/usr/bin/python
+#
+# This file is protected by Copyright. Please refer to the COPYRIGHT file
+# distributed with this source distribution.
+#
+# This file is part of REDHAWK throughput.
+#
+# REDHAWK throughput is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# REDHAWK throughput is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+
+import sys
+import getopt
+import multiprocessing
+
+from streams import corba, bulkio
+from streams.orbconfig import OrbConfig
+from benchmark import utils, numa, sweep
+from benchmark.stats import Averager
+from benchmark.sampling import RateSampler
+from benchmark.procinfo import CpuInfo, ProcessSampler
+from benchmark.tests import TestMonitor, BenchmarkTest
+
+usage = """Usage: %s [options]
+Measures CORBA and BulkIO throughput and CPU usage with an omniORB
+configuration generated for every combination of the swept parameters. Each
+parameter is given as an omniORB configuration name and a comma-separated
+list of values, with optional binary suffixes (e.g., K, M), for example:
+\t--param=giopMaxMsgSize=2M,64M --param=oneCallPerConnection=0,1
+Options:
+\t-s <size>\t\tTransfer size [1M]
+\t-t <time>\t\tTime between samples, in seconds [0.25]
+\t-w <num>\t\tMinimum number of samples per measurement [5]
+\t-m <num>\t\tMaximum number of samples per measurement [10x minimum]
+\t-d <fraction>\t\tStop when the 95%% confidence interval of the mean is
+\t\t\t\twithin this fraction of the mean [0.05]
+\t--param=<name>=<values>\tParameter to sweep; may be given more than once
+\t\t\t\t[giopMaxMsgSize=256K,2M,16M,64M]; configurations with a
+\t\t\t\tmaximum message size too small for the transfer size
+\t\t\t\tare reported as unsupported
+\t--interface=<name>\tInterface to measure ["corba", "bulkio"]; may be
+\t\t\t\tgiven more than once [all]
+\t--transport=<type>\tTransport type ["unix" (default), "tcp"]
+\t--format=<format>\tData format ["octet" (default), "short", "float"]
+\t--pushers=<num>\t\tNumber of CORBA pusher threads [1]
+\t--numa-distance=<n>\tNumber of NUMA hops between components, if
+\t\t\t\tsupported""" % sys.argv[0]
+
+# Allowance for everything in a GIOP message besides the data itself
+GIOP_OVERHEAD = 64*1024
+
+class SweepDisplay(TestMonitor):
+    def test_started(self, name, **kw):
+        self.results = []
+        print 'Measuring', name
+        print '%-48s %12s %10s %10s %10s %14s' % ('settings', 'rate(GBps)', 'ci(GBps)', 'write cpu', 'read cpu',
+                                                 'cpu/GBps')
+
+    def pass_started(self, settings, **kw):
+        sys.stdout.write('%-48s' % sweep.describe(settings))
+        sys.stdout.flush()
+
+    def pass_skipped(self, settings, reason, **kw):
+        print ' unsupported: %s' % reason
+
+    def pass_complete(self, settings, rate, rate_ci, write_cpu, read_cpu, **kw):
+        gbps = rate / (1024**3)
+        if gbps > 0.0:
+            cost = '%13.1f%%' % ((write_cpu + read_cpu) / gbps)
+        else:
+            cost = '%14s' % 'n/a'
+        print ' %12s %10s %9.1f%% %9.1f%% %s' % (utils.to_gbps(rate), utils.to_gbps(rate_ci), write_cpu, read_cpu,
+                                                cost)
+        self.results.append((rate, settings))
+
+    def test_complete(self, **kw):
+        if not self.results:
+            return
+        rate, settings = max(self.results)
+        print 'Best: %s (%s GBps)' % (sweep.describe(settings), utils.to_gbps(rate))
+
+
+class OrbSweepTest(BenchmarkTest):
+    def __init__(self, transfer_size, poll_time, window_size, tolerance, max_samples=None):
+        BenchmarkTest.__init__(self)
+        self.transfer_size = transfer_size
+        self.poll_time = poll_time
+        self.window_size = window_size
+        self.tolerance = tolerance
+        self.max_samples = max_samples
+        self.num_cpus = multiprocessing.cpu_count()
+
+    def run(self, name, create_factory, data_format, grid, numa_distance):
+        self.test_started(name=name)
+
+        for settings in grid:
+            self.pass_started(settings=settings)
+            reason = self.unsupported(settings)
+            if reason:
+                self.pass_skipped(settings=settings, reason=reason)
+                continue
+            factory = None
+            stream = None
+            try:
+                factory = create_factory(settings)
+                stream = factory.create(data_format, numa.NumaPolicy(numa_distance).next())
+                self.measure(settings, stream)
+            except Exception, exc:
+                # A configuration the ORB cannot run with (e.g., processes
+                # that fail to start or return an IOR, or the writer failing
+                # with MARSHAL) should not abort the rest of the sweep
+                self.pass_skipped(settings=settings, reason='%s: %s' % (exc.__class__.__name__, exc))
+            finally:
+                if stream is not None:
+                    stream.terminate()
+                if factory is not None:
+                    factory.cleanup()
+
+        self.test_complete()
+
+    def unsupported(self, settings):
+        # Every transfer must fit in a single GIOP message, along with the
+        # GIOP and request headers (and, for BulkIO, the SRI and timestamp)
+        for name, value in settings:
+            if name == 'giopMaxMsgSize' and int(value) < self.transfer_size + GIOP_OVERHEAD:
+                return 'giopMaxMsgSize %s is too small for %s transfers' % (
+                    utils.to_binary(int(value)), utils.to_binary(self.transfer_size))
+        return None
+
+    def measure(self, settings, stream):
+        window = Averager(self.window_size, self.max_samples)
+        cpu_info = CpuInfo()
+        process_stats = ProcessSampler([stream.get_reader(), stream.get_writer()])
+        write_cpu = []
+        read_cpu = []
+
+        stream.transfer_size(self.transfer_size)
+        stream.start()
+
+        sampler = RateSampler(stream.received, self.poll_time, self.idle_tasks)
+
+        def sample_added(now, elapsed, rate):
+            reader, writer = process_stats.poll()
+            system = cpu_info.poll()
+            sys_cpu = self.num_cpus * 100.0 / sum(system.values())
+            write_cpu.append(writer['cpu'] * sys_cpu)
+            read_cpu.append(reader['cpu'] * sys_cpu)
+
+            self.sample_added(time=now-sampler.start, settings=settings, rate=rate)
+
+        try:
+            sampler.measure(window, self.tolerance, sample_added)
+            stream.stop()
+        finally:
+            process_stats.close()
+
+        self.pass_complete(settings=settings,
+                           rate=window.mean(),
+                           rate_ci=window.confidence(),
+                           rate_min=window.minimum(),
+                           rate_max=window.maximum(),
+                           write_cpu=sum(write_cpu) / len(write_cpu),
+                           read_cpu=sum(read_cpu) / len(read_cpu))
+
+
+if __name__ == '__main__':
+    transfer_size = 1024*1024
+    poll_time = 0.25
+    window_size = 5
+    tolerance = 0.05
+    max_samples = None
+    parameters = []
+    interfaces = []
+    transport = 'unix'
+    data_format = 'octet'
+    pushers = 1
+    numa_distance = None
+
+    opts, args = getopt.getopt(sys.argv[1:], 'hs:t:w:m:d:', ['help', 'param=', 'interface=', 'transport=', 'format=',
+                                                             'pushers=', 'numa-distance='])
+    for key, value in opts:
+        if key in ('-h', '--help'):
+            raise SystemExit(usage)
+        elif key == '-s':
+            transfer_size = utils.from_binary(value)
+        elif key == '-t':
+            poll_time = float(value)
+        elif key == '-w':
+            window_size = int(value)
+        elif key == '-m':
+            max_samples = int(value)
+        elif key == '-d':
+            tolerance = float(value)
+        elif key == '--param':
+            try:
+                name, values = sweep.parse_parameter(value)
+            except ValueError, exc:
+                raise SystemExit(str(exc))
+            parameters.append((name, [sweep.parse_value(v) for v in values]))
+        elif key == '--interface':
+            interfaces.append(value)
+        elif key == '--transport':
+            transport = value
+        elif key == '--format':
+            data_format = value
+        elif key == '--pushers':
+            pushers = int(value)
+        elif key == '--numa-distance':
+            numa_distance = int(value)
+
+    if not parameters:
+        parameters = [('giopMaxMsgSize', [sweep.parse_value(v) for v in ('256K', '2M', '16M', '64M')])]
+    if not interfaces:
+        interfaces = ['corba', 'bulkio']
+
+    grid = sweep.grid(parameters)
+    print '%d ORB configurations' % len(grid)
+
+    test = OrbSweepTest(transfer_size, poll_time, window_size, tolerance, max_samples)
+    test.add_monitor(SweepDisplay())
+
+    # Keep each generated configuration alive until the stream using it has
+    # been torn down
+    configs = []
+
+    def corba_factory(settings):
+        config = OrbConfig(settings)
+        configs.append(config)
+        return corba.factory(transport, threads=pushers, orbargs=config.orbargs())
+
+    def bulkio_factory(settings):
+        config = OrbConfig(settings, bulkio.default_config(transport))
+        configs.append(config)
+        return bulkio.factory(transport, config=config.filename)
+
+    for interface in interfaces:
+        if interface == 'corba':
+            create_factory = corba_factory
+        elif interface == 'bulkio':
+            create_factory = bulkio_factory
+        else:
+            raise SystemExit('No interface '+interface)
+
+        test.run(interface, create_factory, data_format, grid, numa_distance)
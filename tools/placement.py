@@ -0,0 +1,254 @@
+#!/usr/bin/python
+#
+# This file is protected by Copyright. Please refer to the COPYRIGHT file
+# distributed with this source distribution.
+#
+# This file is part of REDHAWK throughput.
+#
+# REDHAWK throughput is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# REDHAWK throughput is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+
+import sys
+import getopt
+
+from streams import raw, corba, bulkio
+from benchmark import utils, numa, topology
+from benchmark.stats import Averager
+from benchmark.sampling import RateSampler
+from benchmark.tests import TestMonitor, BenchmarkTest
+
+usage = """Usage: %s [options]
+Measures throughput with the writer and reader placed on every pair of NUMA
+nodes, reporting a matrix of throughput and node distance per interface. With
+--topology, the writer and reader are instead pinned to pairs of CPUs in each
+topology class found on this system (same core, SMT sibling, same L3,
+different L3 on the same die, cross-die and cross-socket).
+Options:
+\t-s <size>\t\tTransfer size [1M]
+\t-t <time>\t\tTime between samples, in seconds [0.25]
+\t-w <num>\t\tMinimum number of samples per measurement [5]
+\t-m <num>\t\tMaximum number of samples per measurement [10x minimum]
+\t-d <fraction>\t\tStop when the 95%% confidence interval of the mean is
+\t\t\t\twithin this fraction of the mean [0.05]
+\t--interface=<name>\tInterface to measure ["raw", "corba", "bulkio"];
+\t\t\t\tmay be given more than once [all]
+\t--transport=<type>\tTransport type ["unix" (default), "tcp"]
+\t--format=<format>\tData format ["octet" (default), "short", "float"]
+\t--memory=<policy>\tMemory placement ["local" (default), "membind",
+\t\t\t\t"preferred"]; may be given more than once
+\t--memory-node=<node>\tNode to place each process' memory on with the
+\t\t\t\t"membind" and "preferred" policies: "own" (default),
+\t\t\t\t"peer" (the other process' node), "writer" or
+\t\t\t\t"reader"; may be given more than once
+\t--topology\t\tMeasure CPU topology classes instead of NUMA nodes""" % sys.argv[0]
+
+# Memory node for each role, by writer and reader CPU node
+MEMORY_NODES = {
+    'own': lambda writer, reader: {'writer': writer, 'reader': reader},
+    'peer': lambda writer, reader: {'writer': reader, 'reader': writer},
+    'writer': lambda writer, reader: {'writer': writer, 'reader': writer},
+    'reader': lambda writer, reader: {'writer': reader, 'reader': reader},
+    }
+
+
+class MatrixDisplay(TestMonitor):
+    def test_started(self, name, nodes, **kw):
+        print 'Measuring', name
+        self.nodes = nodes
+        self.results = {}
+
+    def pass_started(self, placement, **kw):
+        sys.stdout.write(placement.label())
+        sys.stdout.flush()
+
+    def sample_added(self, **kw):
+        sys.stdout.write('.')
+        sys.stdout.flush()
+
+    def pass_complete(self, placement, rate, rate_ci, **kw):
+        print ' %s+/-%s GBps' % (utils.to_gbps(rate), utils.to_gbps(rate_ci))
+        key = (placement.nodes['writer'], placement.nodes['reader'])
+        self.results[key] = (rate, placement.distance())
+
+    def test_complete(self, **kw):
+        # Rows are writer nodes, columns are reader nodes; each cell shows
+        # throughput in GBps and the node distance
+        print '%-14s' % 'writer\\reader' + ''.join('%14d' % node for node in self.nodes)
+        for writer in self.nodes:
+            cells = []
+            for reader in self.nodes:
+                rate, distance = self.results[(writer, reader)]
+                cells.append('%14s' % ('%s (%d)' % (utils.to_gbps(rate), distance)))
+            print '%-14d' % writer + ''.join(cells)
+
+
+class TopologyDisplay(TestMonitor):
+    def test_started(self, name, **kw):
+        print 'Measuring', name
+        self.results = []
+
+    def pass_started(self, placement, **kw):
+        sys.stdout.write(placement.name)
+        sys.stdout.flush()
+
+    def sample_added(self, **kw):
+        sys.stdout.write('.')
+        sys.stdout.flush()
+
+    def pass_complete(self, placement, rate, rate_ci, **kw):
+        print ' %s+/-%s GBps' % (utils.to_gbps(rate), utils.to_gbps(rate_ci))
+        self.results.append((placement, rate, rate_ci))
+
+    def test_complete(self, **kw):
+        print '%-14s %8s %8s %12s %10s' % ('class', 'writer', 'reader', 'rate(GBps)', 'ci(GBps)')
+        for placement, rate, rate_ci in self.results:
+            print '%-14s %8d %8d %12s %10s' % (placement.name, placement.cpus['writer'], placement.cpus['reader'],
+                                               utils.to_gbps(rate), utils.to_gbps(rate_ci))
+
+
+class PlacementTest(BenchmarkTest):
+    def __init__(self, transfer_size, poll_time, window_size, tolerance, max_samples=None):
+        BenchmarkTest.__init__(self)
+        self.transfer_size = transfer_size
+        self.poll_time = poll_time
+        self.window_size = window_size
+        self.tolerance = tolerance
+        self.max_samples = max_samples
+
+    def run(self, name, factory, data_format, placements, **kw):
+        self.test_started(name=name, **kw)
+
+        for placement in placements:
+            self.pass_started(placement=placement)
+            stream = factory.create(data_format, placement)
+            try:
+                self.measure(placement, stream)
+            finally:
+                stream.terminate()
+
+        self.test_complete()
+
+    def measure(self, placement, stream):
+        window = Averager(self.window_size, self.max_samples)
+
+        stream.transfer_size(self.transfer_size)
+        stream.start()
+
+        sampler = RateSampler(stream.received, self.poll_time, self.idle_tasks)
+        sampler.measure(window, self.tolerance,
+                        lambda now, elapsed, rate: self.sample_added(time=now-sampler.start, rate=rate))
+
+        stream.stop()
+
+        self.pass_complete(placement=placement,
+                           rate=window.mean(),
+                           rate_ci=window.confidence(),
+                           rate_min=window.minimum(),
+                           rate_max=window.maximum())
+
+
+if __name__ == '__main__':
+    transfer_size = 1024*1024
+    poll_time = 0.25
+    window_size = 5
+    tolerance = 0.05
+    max_samples = None
+    interfaces = []
+    transport = 'unix'
+    data_format = 'octet'
+    memory_policies = []
+    memory_nodes = []
+    use_topology = False
+
+    opts, args = getopt.getopt(sys.argv[1:], 'hs:t:w:m:d:', ['help', 'interface=', 'transport=', 'format=', 'memory=',
+                                                             'memory-node=', 'topology'])
+    for key, value in opts:
+        if key in ('-h', '--help'):
+            raise SystemExit(usage)
+        elif key == '-s':
+            transfer_size = utils.from_binary(value)
+        elif key == '-t':
+            poll_time = float(value)
+        elif key == '-w':
+            window_size = int(value)
+        elif key == '-m':
+            max_samples = int(value)
+        elif key == '-d':
+            tolerance = float(value)
+        elif key == '--interface':
+            interfaces.append(value)
+        elif key == '--transport':
+            transport = value
+        elif key == '--format':
+            data_format = value
+        elif key == '--memory':
+            if value not in numa.NumaPlacement.MEMORY_POLICIES:
+                raise SystemExit("invalid memory policy '%s'" % value)
+            memory_policies.append(value)
+        elif key == '--memory-node':
+            if value not in MEMORY_NODES:
+                raise SystemExit("invalid memory node '%s'" % value)
+            memory_nodes.append(value)
+        elif key == '--topology':
+            use_topology = True
+
+    if not interfaces:
+        interfaces = ['raw', 'corba', 'bulkio']
+    if not memory_policies:
+        memory_policies = ['local']
+    if not memory_nodes:
+        memory_nodes = ['own']
+
+    test = PlacementTest(transfer_size, poll_time, window_size, tolerance, max_samples)
+    if use_topology:
+        pairs = topology.find_pairs(topology.get_topology())
+        cpu_placements = []
+        for name in topology.CLASSES:
+            if name in pairs:
+                writer, reader = pairs[name]
+                cpu_placements.append(topology.CpuPlacement(name, writer.id, reader.id))
+            else:
+                print 'No CPU pair for %s on this system' % name
+        test.add_monitor(TopologyDisplay())
+    else:
+        if not numa.is_numactl_available():
+            raise SystemExit('numactl is not available')
+        nodes = numa.get_nodes()
+        test.add_monitor(MatrixDisplay())
+
+    for interface in interfaces:
+        if interface == 'raw':
+            factory = raw.factory(transport)
+        elif interface == 'corba':
+            factory = corba.factory(transport)
+        elif interface == 'bulkio':
+            factory = bulkio.factory(transport)
+        else:
+            raise SystemExit('No interface '+interface)
+
+        if use_topology:
+            test.run(interface, factory, data_format, cpu_placements)
+            continue
+
+        for memory in memory_policies:
+            for memory_node in memory_nodes:
+                # Local allocation always uses the process' own node
+                if memory == 'local':
+                    if memory_node != 'own':
+                        continue
+                    name = '%s (memory local)' % interface
+                else:
+                    name = '%s (memory %s on %s node)' % (interface, memory, memory_node)
+                placements = [numa.NumaPlacement(wnode, rnode, memory, MEMORY_NODES[memory_node](wnode, rnode))
+                              for wnode in nodes for rnode in nodes]
+                test.run(name, factory, data_format, placements, nodes=nodes)
@@ -0,0 +1,216 @@
+#!/usr/bin/python
+#
+# This file is protected by Copyright. Please refer to the COPYRIGHT file
+# distributed with this source distribution.
+#
+# This file is part of REDHAWK throughput.
+#
+# REDHAWK throughput is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# REDHAWK throughput is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+
+import sys
+import getopt
+import multiprocessing
+
+from streams import corba
+from benchmark import utils, numa
+from benchmark.stats import Averager
+from benchmark.sampling import RateSampler
+from benchmark.sweep import powers_of_two
+from benchmark.procinfo import CpuInfo, ProcessSampler
+from benchmark.tests import TestMonitor, BenchmarkTest
+
+usage = """Usage: %s [options]
+Measures how CORBA throughput scales with the number of writer threads pushing
+concurrently to a single reader, for each combination of writer connection
+mode and reader ORB threading model.
+Options:
+\t-s <size>\t\tTransfer size [1M]
+\t-n <num>\t\tMaximum number of pusher threads [CPU count]
+\t-t <time>\t\tTime between samples, in seconds [0.25]
+\t-w <num>\t\tMinimum number of samples per measurement [5]
+\t-m <num>\t\tMaximum number of samples per measurement [10x minimum]
+\t-d <fraction>\t\tStop when the 95%% confidence interval of the mean is
+\t\t\t\twithin this fraction of the mean [0.05]
+\t--transport=<type>\tTransport type ["unix" (default), "tcp"]
+\t--format=<format>\tData format ["octet" (default), "short", "float"]
+\t--push=<mode>\t\tPush operation ["twoway" (default), "oneway"]
+\t--connections=<mode>\tWriter connections ["shared", "separate"]; may be
+\t\t\t\tgiven more than once [all]
+\t--server=<model>\tReader threading model ["connection", "pool"]; may
+\t\t\t\tbe given more than once [all]
+\t--pool-size=<num>\tMaximum reader thread pool size [ORB default]
+\t--numa-distance=<n>\tNumber of NUMA hops between components, if
+\t\t\t\tsupported""" % sys.argv[0]
+
+
+class PusherDisplay(TestMonitor):
+    def test_started(self, name, **kw):
+        self.base_rate = None
+        print 'Measuring', name
+        print '%8s %12s %10s %8s %10s %10s %10s %8s' % ('pushers', 'rate(GBps)', 'ci(GBps)', 'speedup',
+                                                       'efficiency', 'write cpu', 'read cpu', 'threads')
+
+    def pass_started(self, threads, **kw):
+        sys.stdout.write('%8d' % threads)
+        sys.stdout.flush()
+
+    def pass_complete(self, threads, rate, rate_ci, write_cpu, read_cpu, read_threads, **kw):
+        # Speedup is relative to the first (smallest) pusher count
+        if self.base_rate is None:
+            self.base_rate = (threads, rate)
+        base_threads, base_rate = self.base_rate
+        if base_rate > 0.0:
+            speedup = rate / base_rate
+        else:
+            speedup = 0.0
+        efficiency = speedup * base_threads / threads
+        print ' %12s %10s %7.2fx %9.1f%% %9.1f%% %9.1f%% %8d' % (utils.to_gbps(rate), utils.to_gbps(rate_ci),
+                                                                speedup, efficiency * 100.0, write_cpu, read_cpu,
+                                                                read_threads)
+
+
+class PusherTest(BenchmarkTest):
+    def __init__(self, counts, transfer_size, poll_time, window_size, tolerance, max_samples=None):
+        BenchmarkTest.__init__(self)
+        self.counts = counts
+        self.transfer_size = transfer_size
+        self.poll_time = poll_time
+        self.window_size = window_size
+        self.tolerance = tolerance
+        self.max_samples = max_samples
+        self.num_cpus = multiprocessing.cpu_count()
+
+    def run(self, name, transport, data_format, numa_distance, **kw):
+        self.test_started(name=name)
+
+        for threads in self.counts:
+            self.pass_started(threads=threads)
+            factory = corba.factory(transport, threads=threads, **kw)
+            stream = factory.create(data_format, numa.NumaPolicy(numa_distance).next())
+            try:
+                self.measure(threads, stream)
+            finally:
+                stream.terminate()
+
+        self.test_complete()
+
+    def measure(self, threads, stream):
+        window = Averager(self.window_size, self.max_samples)
+        cpu_info = CpuInfo()
+        process_stats = ProcessSampler([stream.get_reader(), stream.get_writer()])
+        write_cpu = []
+        read_cpu = []
+        read_threads = []
+
+        stream.transfer_size(self.transfer_size)
+        stream.start()
+
+        sampler = RateSampler(stream.received, self.poll_time, self.idle_tasks)
+
+        def sample_added(now, elapsed, rate):
+            reader, writer = process_stats.poll()
+            system = cpu_info.poll()
+            sys_cpu = self.num_cpus * 100.0 / sum(system.values())
+            write_cpu.append(writer['cpu'] * sys_cpu)
+            read_cpu.append(reader['cpu'] * sys_cpu)
+            read_threads.append(reader['threads'])
+
+            self.sample_added(time=now-sampler.start, threads=threads, rate=rate)
+
+        sampler.measure(window, self.tolerance, sample_added)
+
+        stream.stop()
+        process_stats.close()
+
+        self.pass_complete(threads=threads,
+                           rate=window.mean(),
+                           rate_ci=window.confidence(),
+                           rate_min=window.minimum(),
+                           rate_max=window.maximum(),
+                           write_cpu=sum(write_cpu) / len(write_cpu),
+                           read_cpu=sum(read_cpu) / len(read_cpu),
+                           read_threads=max(read_threads))
+
+
+if __name__ == '__main__':
+    transfer_size = 1024*1024
+    max_threads = multiprocessing.cpu_count()
+    poll_time = 0.25
+    window_size = 5
+    tolerance = 0.05
+    max_samples = None
+    transport = 'unix'
+    data_format = 'octet'
+    push = 'twoway'
+    connection_modes = []
+    server_modes = []
+    pool_size = None
+    numa_distance = None
+
+    opts, args = getopt.getopt(sys.argv[1:], 'hs:n:t:w:m:d:', ['help', 'transport=', 'format=', 'push=',
+                                                               'connections=', 'server=', 'pool-size=',
+                                                               'numa-distance='])
+    for key, value in opts:
+        if key in ('-h', '--help'):
+            raise SystemExit(usage)
+        elif key == '-s':
+            transfer_size = utils.from_binary(value)
+        elif key == '-n':
+            max_threads = int(value)
+        elif key == '-t':
+            poll_time = float(value)
+        elif key == '-w':
+            window_size = int(value)
+        elif key == '-m':
+            max_samples = int(value)
+        elif key == '-d':
+            tolerance = float(value)
+        elif key == '--transport':
+            transport = value
+        elif key == '--format':
+            data_format = value
+        elif key == '--push':
+            if value not in corba.PUSH_MODES:
+                raise SystemExit("invalid push mode '%s'" % value)
+            push = value
+        elif key == '--connections':
+            if value not in corba.CONNECTION_MODES:
+                raise SystemExit("invalid connection mode '%s'" % value)
+            connection_modes.append(value)
+        elif key == '--server':
+            if value not in corba.SERVER_MODES:
+                raise SystemExit("invalid server model '%s'" % value)
+            server_modes.append(value)
+        elif key == '--pool-size':
+            pool_size = int(value)
+        elif key == '--numa-distance':
+            numa_distance = int(value)
+
+    if not connection_modes:
+        connection_modes = list(corba.CONNECTION_MODES)
+    if not server_modes:
+        server_modes = list(corba.SERVER_MODES)
+
+    test = PusherTest(powers_of_two(max_threads), transfer_size, poll_time, window_size, tolerance, max_samples)
+    test.add_monitor(PusherDisplay())
+
+    for connections in connection_modes:
+        for server in server_modes:
+            if server == 'pool':
+                model = 'thread pool'
+            else:
+                model = 'thread per connection'
+            name = 'CORBA %s (%s connections, %s)' % (push, connections, model)
+            test.run(name, transport, data_format, numa_distance, push=push, connections=connections,
+                     server=server, pool_size=pool_size)
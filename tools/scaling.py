@@ -0,0 +1,232 @@
+#!/usr/bin/python
+#
+# This file is protected by Copyright. Please refer to the COPYRIGHT file
+# distributed with this source distribution.
+#
+# This file is part of REDHAWK throughput.
+#
+# REDHAWK throughput is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# REDHAWK throughput is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+
+import sys
+import getopt
+import numpy
+import multiprocessing
+
+from streams import raw, corba, bulkio
+from streams.aggregate import AggregateStream
+from benchmark import utils, numa
+from benchmark.stats import Averager
+from benchmark.sampling import RateSampler
+from benchmark.sweep import powers_of_two
+from benchmark.procinfo import CpuInfo, ProcessSampler, combine
+from benchmark.tests import TestMonitor, BenchmarkTest
+
+usage = """Usage: %s [options]
+Options:
+\t-s <size>\t\tTransfer size [1M]
+\t-n <num>\t\tMaximum number of parallel streams [CPU count]
+\t-t <time>\t\tTime between samples, in seconds [0.25]
+\t-w <num>\t\tMinimum number of samples per measurement [5]
+\t-m <num>\t\tMaximum number of samples per measurement [10x minimum]
+\t-d <fraction>\t\tStop when the 95%% confidence interval of the mean is
+\t\t\t\twithin this fraction of the mean [0.05]
+\t-j <num>\t\tNumber of streams to launch at once [all]
+\t--launch-timeout=<n>\tSeconds to wait for each stream to start [60]
+\t--interface=<name>\tInterface to measure ["raw", "corba", "bulkio"];
+\t\t\t\tmay be given more than once [all]
+\t--transport=<type>\tTransport type ["unix" (default), "tcp"]
+\t--numa-distance=<n>\tNumber of NUMA hops between components, if
+\t\t\t\tsupported
+\t--format=<format>\tData format ["octet" (default), "short", "float"]""" % sys.argv[0]
+
+def jain_index(rates):
+    # Jain's fairness index: 1.0 when every stream gets an equal share, down
+    # to 1/n when a single stream gets all of the throughput
+    total = numpy.sum(rates)
+    squares = numpy.sum(numpy.square(rates))
+    if squares == 0.0:
+        return 0.0
+    return (total * total) / (len(rates) * squares)
+
+
+class ScalingDisplay(TestMonitor):
+    def test_started(self, name, **kw):
+        print 'Measuring', name
+        print '%8s %12s %10s %12s %12s %12s %8s %8s %10s %10s %9s' % ('streams', 'total(GBps)', 'ci(GBps)',
+                                                                     'mean(GBps)', 'min(GBps)', 'max(GBps)',
+                                                                     'spread', 'fairness', 'write cpu',
+                                                                     'read cpu', 'setup(s)')
+
+    def pass_started(self, count, **kw):
+        sys.stdout.write('%8d' % count)
+        sys.stdout.flush()
+
+    def pass_complete(self, count, rate, rate_ci, stream_rates, spread, fairness, write_cpu, read_cpu, setup_time,
+                      **kw):
+        print ' %12s %10s %12s %12s %12s %7.1f%% %8.3f %9.1f%% %9.1f%% %9.2f' % (
+            utils.to_gbps(rate), utils.to_gbps(rate_ci), utils.to_gbps(numpy.mean(stream_rates)),
+            utils.to_gbps(min(stream_rates)), utils.to_gbps(max(stream_rates)), spread * 100.0, fairness,
+            write_cpu, read_cpu, setup_time)
+
+
+class ScalingTest(BenchmarkTest):
+    def __init__(self, counts, transfer_size, poll_time, window_size, tolerance, max_samples=None,
+                 launch_workers=None, launch_timeout=60.0):
+        BenchmarkTest.__init__(self)
+        self.launch_workers = launch_workers
+        self.launch_timeout = launch_timeout
+        self.counts = counts
+        self.transfer_size = transfer_size
+        self.poll_time = poll_time
+        self.window_size = window_size
+        self.tolerance = tolerance
+        self.max_samples = max_samples
+        self.num_cpus = multiprocessing.cpu_count()
+
+    def run(self, name, factory, data_format, numa_policy):
+        self.test_started(name=name)
+
+        for count in self.counts:
+            self.pass_started(count=count)
+            streams = AggregateStream(factory, data_format, numa_policy, count, self.launch_workers,
+                                      self.launch_timeout)
+            try:
+                self.measure(count, streams)
+            finally:
+                streams.terminate()
+
+        self.test_complete()
+
+    def measure(self, count, streams):
+        window = Averager(self.window_size, self.max_samples)
+        stream_samples = []
+        write_cpu = []
+        read_cpu = []
+
+        # Every reader and writer is polled in one pass, and their CPU usage
+        # totaled, so the cost of the aggregate can be compared across counts
+        cpu_info = CpuInfo()
+        process_stats = ProcessSampler(streams.get_readers() + streams.get_writers())
+
+        streams.transfer_size(self.transfer_size)
+        streams.start()
+
+        # Per-stream throughput over each sample period
+        sampler = RateSampler(lambda: numpy.array(streams.received_by_stream(), dtype=float), self.poll_time,
+                              self.idle_tasks)
+
+        def sample_added(now, elapsed, rates):
+            stream_samples.append(rates)
+
+            results = process_stats.poll()
+            readers = combine(results[:count])
+            writers = combine(results[count:])
+            system = cpu_info.poll()
+            sys_cpu = self.num_cpus * 100.0 / sum(system.values())
+            write_cpu.append(writers['cpu'] * sys_cpu)
+            read_cpu.append(readers['cpu'] * sys_cpu)
+
+            self.sample_added(time=now-sampler.start, count=count, rate=rates.sum(), stream_rates=rates)
+
+        # Wait until the aggregate rate is stable (or it's taken long enough
+        # that we can assume it will never stabilize)
+        try:
+            sampler.measure(window, self.tolerance, sample_added)
+        finally:
+            process_stats.close()
+
+        streams.stop()
+
+        stream_rates = numpy.mean(stream_samples, axis=0)
+        mean_rate = numpy.mean(stream_rates)
+        if mean_rate > 0.0:
+            spread = (stream_rates.max() - stream_rates.min()) / mean_rate
+        else:
+            spread = 0.0
+
+        self.pass_complete(count=count,
+                           rate=window.mean(),
+                           rate_ci=window.confidence(),
+                           rate_min=window.minimum(),
+                           rate_max=window.maximum(),
+                           stream_rates=stream_rates,
+                           spread=spread,
+                           fairness=jain_index(stream_rates),
+                           write_cpu=sum(write_cpu) / len(write_cpu),
+                           read_cpu=sum(read_cpu) / len(read_cpu),
+                           setup_time=streams.setup_time)
+
+
+if __name__ == '__main__':
+    transfer_size = 1024*1024
+    max_streams = multiprocessing.cpu_count()
+    poll_time = 0.25
+    window_size = 5
+    tolerance = 0.05
+    max_samples = None
+    interfaces = []
+    transport = 'unix'
+    numa_distance = None
+    data_format = 'octet'
+    launch_workers = None
+    launch_timeout = 60.0
+
+    opts, args = getopt.getopt(sys.argv[1:], 'hs:n:t:w:m:d:j:', ['help', 'interface=', 'transport=', 'numa-distance=', 'format=', 'launch-timeout='])
+    for key, value in opts:
+        if key in ('-h', '--help'):
+            raise SystemExit(usage)
+        elif key == '-s':
+            transfer_size = utils.from_binary(value)
+        elif key == '-n':
+            max_streams = int(value)
+        elif key == '-t':
+            poll_time = float(value)
+        elif key == '-w':
+            window_size = int(value)
+        elif key == '-m':
+            max_samples = int(value)
+        elif key == '-d':
+            tolerance = float(value)
+        elif key == '-j':
+            launch_workers = int(value)
+        elif key == '--launch-timeout':
+            launch_timeout = float(value)
+        elif key == '--interface':
+            interfaces.append(value)
+        elif key == '--transport':
+            transport = value
+        elif key == '--numa-distance':
+            numa_distance = int(value)
+        elif key == '--format':
+            data_format = value
+
+    if not interfaces:
+        interfaces = ['raw', 'corba', 'bulkio']
+
+    test = ScalingTest(powers_of_two(max_streams), transfer_size, poll_time, window_size, tolerance, max_samples,
+                       launch_workers, launch_timeout)
+    test.add_monitor(ScalingDisplay())
+
+    for interface in interfaces:
+        if interface == 'raw':
+            factory = raw.factory(transport)
+        elif interface == 'corba':
+            factory = corba.factory(transport)
+        elif interface == 'bulkio':
+            factory = bulkio.factory(transport)
+        else:
+            raise SystemExit('No interface '+interface)
+
+        numa_policy = numa.NumaPolicy(numa_distance)
+        test.run(interface, factory, data_format, numa_policy)
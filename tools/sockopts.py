@@ -0,0 +1,282 @@
+#!/usr/bin/python
+#
+# This file is protected by Copyright. Please refer to the COPYRIGHT file
+# distributed with this source distribution.
+#
+# This file is part of REDHAWK throughput.
+#
+# REDHAWK throughput is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# REDHAWK throughput is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/.
+
+import sys
+import getopt
+import multiprocessing
+
+from streams import raw
+from benchmark import utils, numa, sweep
+from benchmark.stats import Averager
+from benchmark.sampling import RateSampler
+from benchmark.procinfo import CpuInfo, ProcessSampler
+from benchmark.tests import TestMonitor, BenchmarkTest
+
+usage = """Usage: %s [options]
+Measures raw stream throughput and CPU usage over loopback TCP and Unix
+sockets for every combination of the swept socket options, at each transfer
+size. Each parameter is a socket option name and a comma-separated list of
+values, with optional binary suffixes; 0 leaves the kernel default. Options
+that only apply to TCP are ignored for Unix sockets; zerocopy is also
+ignored unless the framing is "packet".
+Socket options: sndbuf, rcvbuf, nodelay, busy_poll (usec), zerocopy
+Options:
+\t-s <sizes>\t\tComma-separated transfer sizes [64K,1M,8M]
+\t-t <time>\t\tTime between samples, in seconds [0.25]
+\t-w <num>\t\tMinimum number of samples per measurement [5]
+\t-m <num>\t\tMaximum number of samples per measurement [10x minimum]
+\t-d <fraction>\t\tStop when the 95%% confidence interval of the mean is
+\t\t\t\twithin this fraction of the mean [0.05]
+\t--param=<name>=<values>\tSocket option to sweep; may be given more than
+\t\t\t\tonce [sndbuf=0,4M rcvbuf=0,4M nodelay=0,1]
+\t--transport=<type>\tTransport type ["tcp", "unix"]; may be given more
+\t\t\t\tthan once [all]
+\t--framing=<mode>\tRaw socket framing ["packet" (default), "vector",
+\t\t\t\t"batch"]
+\t--format=<format>\tData format ["octet" (default), "short", "float"]
+\t--numa-distance=<n>\tNumber of NUMA hops between components, if
+\t\t\t\tsupported""" % sys.argv[0]
+
+# Options that have no effect on Unix sockets
+TCP_OPTIONS = ('nodelay', 'zerocopy')
+
+def transport_grid(grid, transport, framing):
+    # Remove settings that do not apply to the transport (zero-copy sends
+    # additionally require packet framing), dropping the combinations that
+    # become duplicates
+    if transport == 'tcp':
+        excluded = () if framing == 'packet' else ('zerocopy',)
+    else:
+        excluded = TCP_OPTIONS
+    result = []
+    for settings in grid:
+        settings = [(name, value) for name, value in settings if name not in excluded]
+        if settings not in result:
+            result.append(settings)
+    return result
+
+
+class SocketDisplay(TestMonitor):
+    def test_started(self, name, **kw):
+        self.best = {}
+        print 'Measuring', name
+        print '%10s %-40s %12s %10s %10s %10s' % ('size', 'settings', 'rate(GBps)', 'ci(GBps)', 'write cpu',
+                                                 'read cpu')
+
+    def pass_started(self, size, settings, **kw):
+        sys.stdout.write('%10s %-40s' % (utils.to_binary(size), sweep.describe(settings) or 'default'))
+        sys.stdout.flush()
+
+    def pass_skipped(self, size, settings, reason, **kw):
+        print ' failed: %s' % reason
+
+    def pass_complete(self, size, settings, rate, rate_ci, write_cpu, read_cpu, **kw):
+        print ' %12s %10s %9.1f%% %9.1f%%' % (utils.to_gbps(rate), utils.to_gbps(rate_ci), write_cpu, read_cpu)
+        if rate > self.best.get(size, (0.0, None))[0]:
+            self.best[size] = (rate, settings)
+
+    def test_complete(self, **kw):
+        for size in sorted(self.best):
+            rate, settings = self.best[size]
+            print 'Best at %s: %s (%s GBps)' % (utils.to_binary(size), sweep.describe(settings) or 'default',
+                                                utils.to_gbps(rate))
+
+
+class TransportComparison(TestMonitor):
+    """
+    Compares the best TCP rate at each transfer size to the best Unix socket
+    rate.
+    """
+    def __init__(self):
+        self.best = {}
+
+    def test_started(self, name, **kw):
+        self.transport = name
+
+    def pass_complete(self, size, rate, **kw):
+        key = (self.transport, size)
+        self.best[key] = max(self.best.get(key, 0.0), rate)
+
+    def report(self):
+        sizes = sorted(set(size for transport, size in self.best))
+        if not all(('tcp', size) in self.best and ('unix', size) in self.best for size in sizes):
+            return
+        print 'Best loopback TCP vs. Unix sockets'
+        print '%10s %12s %12s %8s' % ('size', 'tcp(GBps)', 'unix(GBps)', 'ratio')
+        for size in sizes:
+            tcp = self.best[('tcp', size)]
+            unix = self.best[('unix', size)]
+            if unix > 0.0:
+                ratio = '%7.1f%%' % (tcp * 100.0 / unix)
+            else:
+                ratio = '%8s' % 'n/a'
+            print '%10s %12s %12s %s' % (utils.to_binary(size), utils.to_gbps(tcp), utils.to_gbps(unix), ratio)
+
+
+class StreamExited(Exception):
+    pass
+
+
+class SocketSweepTest(BenchmarkTest):
+    def __init__(self, transfer_sizes, poll_time, window_size, tolerance, max_samples=None):
+        BenchmarkTest.__init__(self)
+        self.transfer_sizes = transfer_sizes
+        self.poll_time = poll_time
+        self.window_size = window_size
+        self.tolerance = tolerance
+        self.max_samples = max_samples
+        self.num_cpus = multiprocessing.cpu_count()
+
+    def run(self, transport, framing, data_format, grid, numa_distance):
+        self.test_started(name=transport)
+
+        for size in self.transfer_sizes:
+            for settings in grid:
+                self.pass_started(size=size, settings=settings)
+                factory = raw.factory(transport, framing, sockopts=dict((name, int(value)) for name, value in settings))
+                stream = factory.create(data_format, numa.NumaPolicy(numa_distance).next())
+                try:
+                    self.measure(size, settings, stream)
+                except StreamExited, exc:
+                    # Usually a socket option the kernel refused (e.g.,
+                    # busy_poll above the sysctl limit without CAP_NET_ADMIN);
+                    # the rest of the grid can still be measured
+                    self.pass_skipped(size=size, settings=settings, reason=str(exc))
+                finally:
+                    stream.terminate()
+
+        self.test_complete()
+
+    def measure(self, size, settings, stream):
+        window = Averager(self.window_size, self.max_samples)
+        cpu_info = CpuInfo()
+        process_stats = ProcessSampler([stream.get_reader(), stream.get_writer()])
+        write_cpu = []
+        read_cpu = []
+
+        stream.transfer_size(size)
+        try:
+            stream.start()
+        except IOError:
+            # The writer has already exited; reported below
+            pass
+        self.check_stream(stream)
+
+        sampler = RateSampler(stream.received, self.poll_time, self.idle_tasks)
+
+        def sample_added(now, elapsed, rate):
+            # A process that has exited delivers nothing, which must not be
+            # mistaken for a measured rate
+            self.check_stream(stream)
+            reader, writer = process_stats.poll()
+            system = cpu_info.poll()
+            sys_cpu = self.num_cpus * 100.0 / sum(system.values())
+            write_cpu.append(writer['cpu'] * sys_cpu)
+            read_cpu.append(reader['cpu'] * sys_cpu)
+
+            self.sample_added(time=now-sampler.start, size=size, settings=settings, rate=rate)
+
+        try:
+            sampler.measure(window, self.tolerance, sample_added)
+        finally:
+            process_stats.close()
+        stream.stop()
+
+        self.pass_complete(size=size,
+                           settings=settings,
+                           rate=window.mean(),
+                           rate_ci=window.confidence(),
+                           rate_min=window.minimum(),
+                           rate_max=window.maximum(),
+                           write_cpu=sum(write_cpu) / len(write_cpu),
+                           read_cpu=sum(read_cpu) / len(read_cpu))
+
+    def check_stream(self, stream):
+        exited = stream.exited()
+        if exited:
+            raise StreamExited(', '.join(exited))
+
+
+if __name__ == '__main__':
+    transfer_sizes = [64*1024, 1024*1024, 8*1024*1024]
+    poll_time = 0.25
+    window_size = 5
+    tolerance = 0.05
+    max_samples = None
+    parameters = []
+    transports = []
+    framing = 'packet'
+    data_format = 'octet'
+    numa_distance = None
+
+    opts, args = getopt.getopt(sys.argv[1:], 'hs:t:w:m:d:', ['help', 'param=', 'transport=', 'framing=', 'format=',
+                                                             'numa-distance='])
+    for key, value in opts:
+        if key in ('-h', '--help'):
+            raise SystemExit(usage)
+        elif key == '-s':
+            transfer_sizes = [utils.from_binary(size) for size in value.split(',')]
+        elif key == '-t':
+            poll_time = float(value)
+        elif key == '-w':
+            window_size = int(value)
+        elif key == '-m':
+            max_samples = int(value)
+        elif key == '-d':
+            tolerance = float(value)
+        elif key == '--param':
+            try:
+                name, values = sweep.parse_parameter(value)
+            except ValueError, exc:
+                raise SystemExit(str(exc))
+            if name not in raw.RawStreamFactory.SOCKET_OPTIONS:
+                raise SystemExit("invalid socket option '%s'" % name)
+            parameters.append((name, [sweep.parse_value(v) for v in values]))
+        elif key == '--transport':
+            if value not in ('tcp', 'unix'):
+                raise SystemExit("invalid transport '%s'" % value)
+            transports.append(value)
+        elif key == '--framing':
+            if value not in raw.RawStreamFactory.FRAMINGS:
+                raise SystemExit("invalid framing '%s'" % value)
+            framing = value
+        elif key == '--format':
+            data_format = value
+        elif key == '--numa-distance':
+            numa_distance = int(value)
+
+    if not parameters:
+        parameters = [('sndbuf', ['0', str(4*1024*1024)]),
+                      ('rcvbuf', ['0', str(4*1024*1024)]),
+                      ('nodelay', ['0', '1'])]
+    if not transports:
+        transports = ['tcp', 'unix']
+
+    grid = sweep.grid(parameters)
+
+    test = SocketSweepTest(transfer_sizes, poll_time, window_size, tolerance, max_samples)
+    test.add_monitor(SocketDisplay())
+    comparison = TransportComparison()
+    test.add_monitor(comparison)
+
+    for transport in transports:
+        test.run(transport, framing, data_format, transport_grid(grid, transport, framing), numa_distance)
+
+    comparison.report()
@@ -30,9 +30,106 @@ from benchmark import utils, numa
 from benchmark.procinfo import CpuInfo, ProcessInfo
 from benchmark.tests import TestMonitor, BenchmarkTest
 from benchmark.csv import CSVOutput
+from benchmark.results import ResultsStore
+from benchmark.stats import t_critical
+
+class SeriesHistory(object):
+    """
+    Fixed-size history of one or more series sampled at the same times, for
+    plotting long runs. The most recent samples are kept at full resolution
+    in a ring buffer; older samples are folded into buckets that keep the
+    minimum and maximum of each series, so that short spikes remain visible.
+    When the buckets fill up, adjacent pairs are merged, halving the
+    resolution of the older history instead of growing without bound.
+    """
+    def __init__(self, columns, recent=1024, buckets=1024):
+        self.times = numpy.zeros(recent)
+        self.values = numpy.zeros((recent, columns))
+        self.count = 0
+
+        # Start and end time, and per-series minimum and maximum, of each
+        # bucket; the last bucket may be partially filled. Merging pairs
+        # requires an even number of buckets.
+        buckets += buckets % 2
+        self.bucket_times = numpy.zeros((buckets, 2))
+        self.bucket_min = numpy.zeros((buckets, columns))
+        self.bucket_max = numpy.zeros((buckets, columns))
+        self.bucket_count = 0
+        self.bucket_size = 1
+        self.bucket_fill = 0
+
+    def add(self, time, values):
+        capacity = len(self.times)
+        index = self.count % capacity
+        if self.count >= capacity:
+            self._decimate(self.times[index], self.values[index])
+        self.times[index] = time
+        self.values[index] = values
+        self.count += 1
+
+    def _decimate(self, time, values):
+        if self.bucket_fill == 0:
+            if self.bucket_count == len(self.bucket_times):
+                self._merge()
+            bucket = self.bucket_count
+            self.bucket_count += 1
+            self.bucket_times[bucket] = time
+            self.bucket_min[bucket] = values
+            self.bucket_max[bucket] = values
+        else:
+            bucket = self.bucket_count - 1
+            self.bucket_times[bucket, 1] = time
+            numpy.minimum(self.bucket_min[bucket], values, self.bucket_min[bucket])
+            numpy.maximum(self.bucket_max[bucket], values, self.bucket_max[bucket])
+        self.bucket_fill = (self.bucket_fill + 1) % self.bucket_size
+
+    def _merge(self):
+        half = len(self.bucket_times) // 2
+        self.bucket_times[:half, 0] = self.bucket_times[0::2, 0]
+        self.bucket_times[:half, 1] = self.bucket_times[1::2, 1]
+        self.bucket_min[:half] = numpy.minimum(self.bucket_min[0::2], self.bucket_min[1::2])
+        self.bucket_max[:half] = numpy.maximum(self.bucket_max[0::2], self.bucket_max[1::2])
+        self.bucket_count = half
+        self.bucket_size *= 2
+
+    def data(self):
+        """
+        Returns the times and an array of values (one column per series) to
+        plot: each bucket contributes its minimum at its start time and its
+        maximum at its end time, followed by the recent samples in order.
+        """
+        buckets = self.bucket_count
+        times = self.bucket_times[:buckets].ravel()
+        values = numpy.empty((2*buckets, self.values.shape[1]))
+        values[0::2] = self.bucket_min[:buckets]
+        values[1::2] = self.bucket_max[:buckets]
+
+        capacity = len(self.times)
+        if self.count <= capacity:
+            order = numpy.arange(self.count)
+        else:
+            order = numpy.arange(self.count, self.count + capacity) % capacity
+        return (numpy.concatenate((times, self.times[order])),
+                numpy.concatenate((values, self.values[order])))
+
+    def maximum(self):
+        recent = self.values[:min(self.count, len(self.times))]
+        maxima = [recent.max()] if len(recent) else [0.0]
+        if self.bucket_count:
+            maxima.append(self.bucket_max[:self.bucket_count].max())
+        return max(maxima)
+
 
 class Speedometer(TestMonitor):
-    def __init__(self, period):
+    # Additional series that may be plotted below the throughput, as the
+    # sample fields and their labels
+    SERIES = {
+        'cpu': ('CPU (%)', (('write_cpu', 'writer'), ('read_cpu', 'reader'))),
+        'faults': ('Page faults', (('write_minflt', 'writer minor'), ('read_minflt', 'reader minor'),
+                                   ('write_majflt', 'writer major'), ('read_majflt', 'reader major'))),
+        }
+
+    def __init__(self, period, history=1024, series=()):
         # Quiet the warning about GTK Tooltip deprecation
         import warnings
         with warnings.catch_warnings():
@@ -41,28 +138,76 @@ class Speedometer(TestMonitor):
 
         self.figure.canvas.set_window_title('REDHAWK Speedometer')
 
-        # Create a line graph of throughput over time
-        self.axes = self.figure.add_subplot(111)
-        self.axes.set_xlabel('Time')
-        self.axes.set_ylabel('Throughput (Bps)')
-
-        self.x = []
-        self.y = []
-        self.line, = self.axes.plot(self.x, self.y)
-        self.axes.set_xlim(xmax=period)
+        # Create a line graph of throughput over time, with any additional
+        # series on their own axes below it
+        self.plots = []
+        axes = self.figure.add_subplot(len(series)+1, 1, 1)
+        axes.set_ylabel('Throughput (Bps)')
+        self._add_plot(axes, (('rate', None),), history)
+        for index, name in enumerate(series):
+            label, fields = self.SERIES[name]
+            axes = self.figure.add_subplot(len(series)+1, 1, index+2, sharex=self.plots[0]['axes'])
+            axes.set_ylabel(label)
+            self._add_plot(axes, fields, history)
+            axes.legend(loc='upper left')
+        axes.set_xlabel('Time')
+        self.plots[0]['axes'].set_xlim(0.0, period)
+
+        # Lines are redrawn over a saved copy of the static background (axes,
+        # ticks and labels), which is captured again after every full redraw
+        self.blit = getattr(self.figure.canvas, 'supports_blit', False)
+        self.background = None
+        self.figure.canvas.mpl_connect('draw_event', self._on_draw)
 
         self.figure.show()
 
+    def _add_plot(self, axes, fields, history):
+        lines = [axes.plot([], [], label=label, animated=True)[0] for field, label in fields]
+        self.plots.append({'axes': axes,
+                           'fields': [field for field, label in fields],
+                           'lines': lines,
+                           'history': SeriesHistory(len(fields), history, history)})
+
+    def _on_draw(self, event):
+        if self.blit:
+            self.background = self.figure.canvas.copy_from_bbox(self.figure.bbox)
+        self._draw_lines()
+
+    def _draw_lines(self):
+        for plot in self.plots:
+            for line in plot['lines']:
+                plot['axes'].draw_artist(line)
+
     def sample_added(self, **stats):
-        self.x.append(stats['time'])
-        self.y.append(stats['rate'])
-        self.line.set_xdata(self.x)
-        self.line.set_ydata(self.y)
-        self.axes.relim()
-        self.axes.autoscale_view(scalex=False)
-        self.figure.canvas.draw()
+        rescale = False
+        for plot in self.plots:
+            history = plot['history']
+            history.add(stats['time'], [stats[field] for field in plot['fields']])
+            times, values = history.data()
+            for column, line in enumerate(plot['lines']):
+                line.set_data(times, values[:, column])
+
+            # Only rescale (and redraw everything) when the data outgrows the
+            # current limits, leaving headroom so that it happens rarely
+            peak = history.maximum()
+            if peak > plot['axes'].get_ylim()[1]:
+                plot['axes'].set_ylim(0.0, peak * 1.25)
+                rescale = True
+
+        if rescale or not self.blit or self.background is None:
+            self.figure.canvas.draw()
+        else:
+            self.figure.canvas.restore_region(self.background)
+            self._draw_lines()
+            self.figure.canvas.blit(self.figure.bbox)
 
     def wait(self):
+        # Leave the final plot with ordinary (non-animated) lines, so that it
+        # survives resizing and saving
+        for plot in self.plots:
+            for line in plot['lines']:
+                line.set_animated(False)
+        self.figure.canvas.draw()
         pyplot.show()
 
     def update(self):
@@ -76,7 +221,7 @@ class ThroughputTest(BenchmarkTest):
         self.run_time = run_time
         self.num_cpus = sum(len(numa.get_cpus(n)) for n in numa.get_nodes())
 
-    def run(self, name, stream):
+    def run(self, name, stream, transfer_size):
         reader_stats = ProcessInfo(stream.get_reader())
         writer_stats = ProcessInfo(stream.get_writer())
 
@@ -84,6 +229,11 @@ class ThroughputTest(BenchmarkTest):
 
         self.test_started(name=name)
 
+        # The entire run is a single pass at one transfer size
+        stream.transfer_size(transfer_size)
+        self.pass_started(size=transfer_size)
+        rates = []
+
         stream.start()
 
         start = time.time()
@@ -95,8 +245,6 @@ class ThroughputTest(BenchmarkTest):
         last_total = 0
 
         while time.time() < end:
-            self.pass_started()
-
             # Allow UI to update, etc.
             self.idle_tasks()
 
@@ -110,9 +258,12 @@ class ThroughputTest(BenchmarkTest):
             elapsed = now - last_time
             last_time = now
 
-            # Set next expected sample time based on the current time, in
-            # case there was an unusually long sample period
-            next = now + self.poll_time
+            # Schedule the next poll a whole period after the last deadline,
+            # so that the time spent sampling does not accumulate; if a poll
+            # was missed entirely, start again from the current time
+            next += self.poll_time
+            if next < now:
+                next = now + self.poll_time
 
             # Calculate average throughput over the sample period
             current_total = stream.received()
@@ -147,10 +298,20 @@ class ThroughputTest(BenchmarkTest):
                       'cpu_softirq': system['softirq'] * sys_cpu,
                       }
             self.sample_added(**sample)
-            self.pass_complete()
+            rates.append(current_rate)
 
         stream.stop()
 
+        if len(rates) > 1:
+            confidence = t_critical(len(rates) - 1) * numpy.std(rates, ddof=1) / numpy.sqrt(len(rates))
+        else:
+            confidence = float('inf')
+        self.pass_complete(size=transfer_size,
+                           rate=numpy.mean(rates),
+                           rate_ci=confidence,
+                           rate_min=min(rates),
+                           rate_max=max(rates))
+
         self.test_complete()
 
 
@@ -160,10 +321,15 @@ if __name__ == '__main__':
     poll_time = 0.25
     run_time = 30.0
     nogui = False
+    rt_priority = None
+    history = 1024
+    series = []
     interface = 'bulkio'
     transfer_size = 1*1024*1024
+    results_file = None
+    label = None
 
-    opts, args = getopt.getopt(sys.argv[1:], 's:t:p:', ['interface=', 'transport=', 'numa-distance=', 'no-gui'])
+    opts, args = getopt.getopt(sys.argv[1:], 's:t:p:', ['interface=', 'transport=', 'numa-distance=', 'no-gui', 'rt-priority=', 'history=', 'series=', 'results=', 'label='])
     for key, value in opts:
         if key == '-s':
             transfer_size = utils.from_binary(value)
@@ -177,16 +343,35 @@ if __name__ == '__main__':
             numa_distance = int(value)
         elif key == '--no-gui':
             nogui = True
+        elif key == '--rt-priority':
+            rt_priority = int(value)
+        elif key == '--history':
+            history = int(value)
+        elif key == '--series':
+            series = value.split(',')
         elif key == '--interface':
             interface = value
+        elif key == '--results':
+            results_file = value
+        elif key == '--label':
+            label = value
 
     test = ThroughputTest(poll_time, run_time)
+    test.set_priority(rt_priority)
+
+    for name in series:
+        if name not in Speedometer.SERIES:
+            raise SystemExit("invalid series '%s'" % name)
 
     from matplotlib import pyplot
-    display = Speedometer(run_time)
+    display = Speedometer(run_time, history, series)
     test.add_idle_task(display.update)
     test.add_monitor(display)
 
+    if results_file:
+        test.add_monitor(ResultsStore(results_file, label=label, transport=transport, numa_distance=numa_distance,
+                                      test='speedometer', poll_time=poll_time, run_time=run_time))
+
     if interface == 'raw':
         factory = raw.factory(transport)
     elif interface == 'corba':
@@ -198,8 +383,7 @@ if __name__ == '__main__':
 
     stream = factory.create('octet', numa_policy.next())
     try:
-        stream.transfer_size(transfer_size)
-        test.run(interface, stream)
+        test.execute(interface, stream, transfer_size)
     finally:
         stream.terminate()
 